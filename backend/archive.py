@@ -0,0 +1,135 @@
+"""
+Archivage chaud/froid des vignettes, paiements et journaux de notification.
+
+Les lignes plus anciennes que l'horizon (ARCHIVE_HORIZON_DAYS, 730 j par
+défaut) passent dans `<table>_archive` (même schéma + archived_at), par
+paquets : INSERT ... SELECT puis DELETE des mêmes ids, un commit par paquet.
+Les tables chaudes et leurs index restent à la taille de l'activité récente.
+
+- Vignettes : seulement non valides, échues avant l'horizon et remplacées
+  par une vignette plus récente du même véhicule (/verify et la liste admin
+  lisent toujours la dernière vignette dans la table chaude). Le paquet
+  incrémente `users.data_version` des titulaires dans sa transaction : la
+  liste du citoyen change, son ETag aussi (httpcache.py).
+- Paiements : créés avant l'horizon. Le rapport des paiements
+  (/api/admin/reports/payments) relit l'archive si la période l'exige.
+- --export DIR : copie aussi chaque paquet déplacé en NDJSON gzip
+  (stockage froid hors base).
+
+Usage (depuis backend/) :
+  python archive.py                      # horizon par défaut
+  python archive.py --days 365 --export /var/backups/vignette
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import DateTime, Table, and_, delete, exists, func, insert, literal, select, update
+from sqlalchemy.orm import Session, aliased
+
+from database import engine
+import models
+
+ARCHIVE_HORIZON_DAYS = int(os.environ.get("ARCHIVE_HORIZON_DAYS", "730"))
+CHUNK_SIZE = 5000
+
+@dataclass(frozen=True)
+class Target:
+    hot: Table
+    archive: Table
+    date_column: str
+    condition: Optional[Callable] = None  # Critère supplémentaire (table chaude) -> expression
+    owner_column: Optional[str] = None  # Citoyen dont les lectures en cache (ETag) changent
+
+def _superseded_sticker(hot: Table):
+    newer = aliased(models.Sticker.__table__)
+    return and_(
+        hot.c.status != "valid",
+        exists().where(newer.c.vehicle_id == hot.c.vehicle_id, newer.c.created_at > hot.c.created_at),
+    )
+
+TARGETS = [
+    Target(models.Sticker.__table__, models.StickerArchive, "end_date", _superseded_sticker, owner_column="user_id"),
+    Target(models.Payment.__table__, models.PaymentArchive, "created_at"),
+    Target(models.NotificationLog.__table__, models.NotificationLogArchive, "sent_at"),
+]
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+def archive_target(db: Session, target: Target, cutoff: datetime, chunk: int = CHUNK_SIZE, export=None) -> int:
+    hot, total = target.hot, 0
+    criteria = [hot.c[target.date_column] < cutoff]
+    if target.condition is not None:
+        criteria.append(target.condition(hot))
+    columns = [c.name for c in hot.columns]
+    while True:
+        ids = db.execute(
+            select(hot.c.id).where(*criteria).order_by(hot.c[target.date_column]).limit(chunk)
+        ).scalars().all()
+        if not ids:
+            return total
+        if export is not None:
+            for row in db.execute(select(hot).where(hot.c.id.in_(ids))).mappings():
+                export.write(json.dumps(dict(row), default=_json_default, ensure_ascii=False) + "\n")
+        archived_at = datetime.now(timezone.utc)
+        db.execute(insert(target.archive).from_select(
+            [*columns, "archived_at"], select(*hot.c, literal(archived_at, DateTime())).where(hot.c.id.in_(ids))
+        ))
+        if target.owner_column is not None:
+            owners = select(hot.c[target.owner_column]).where(hot.c.id.in_(ids)).distinct()
+            db.execute(update(models.User).where(models.User.id.in_(owners)).values(
+                data_version=models.User.data_version + 1
+            ))
+        db.execute(delete(hot).where(hot.c.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+
+def archive_all(db: Session, days: int = ARCHIVE_HORIZON_DAYS, chunk: int = CHUNK_SIZE,
+                export_dir: Optional[str] = None) -> dict:
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    moved = {}
+    for target in TARGETS:
+        export = None
+        if export_dir:
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+            export = gzip.open(os.path.join(export_dir, f"{target.hot.name}-{stamp}.ndjson.gz"), "wt", encoding="utf-8")
+        try:
+            moved[target.hot.name] = archive_target(db, target, cutoff, chunk, export)
+        finally:
+            if export is not None:
+                export.close()
+    return moved
+
+def archive_watermark(db: Session, archive: Table, date_column: str) -> Optional[datetime]:
+    """Date la plus récente de l'archive (None si vide) : au-delà, inutile de la lire."""
+    return db.execute(select(func.max(archive.c[date_column]))).scalar()
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivage des vignettes, paiements et notifications anciens")
+    parser.add_argument("--days", type=int, default=ARCHIVE_HORIZON_DAYS, help="Horizon en jours")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="Lignes par transaction")
+    parser.add_argument("--export", metavar="DIR", help="Copie NDJSON gzip des lignes déplacées")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    try:
+        if args.export:
+            os.makedirs(args.export, exist_ok=True)
+        with Session(engine) as db:
+            moved = archive_all(db, args.days, args.chunk, args.export)
+    except Exception as e:
+        print(f"❌ ERREUR : {e}")
+        raise SystemExit(1)
+    for table, count in moved.items():
+        print(f"   ↳ {count} lignes : {table} → {table}_archive")
+    print(f"✅  Archivage terminé en {time.perf_counter() - started:.1f} s (horizon {args.days} j)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Benchmark hermétique de l'API.
+
+Mode in-process (défaut) : base SQLite locale (ou --database-url), chargée
+par datagen.py à l'échelle --scale, puis les scénarios sont joués via un client ASGI httpx contre
+`server.app`, sans réseau ni serveur externe.
+
+Mode HTTP (--url) : mêmes scénarios contre un serveur en marche, façon
+locust (N utilisateurs virtuels concurrents). Le serveur doit pointer vers
+une base seedée avec les comptes connus de datagen.py (--seed-only pour la préparer)
+et tourner avec RATE_LIMIT_ENABLED=0.
+
+Sortie : JSON (p50/p95/p99 en ms, débit, erreurs) ; --compare signale les
+régressions par rapport à une baseline et sort en code 1.
+
+Usage (depuis backend/) :
+  python -m bench.api --scale smoke --output results.json
+  python -m bench.api --scale smoke --compare bench/baseline.json
+  python -m bench.api --database-url postgresql://... --seed-only --scale national
+  python -m bench.api --url http://localhost:8000 --no-seed
+  FAST_SERIALIZATION=1 python -m bench.api --scenarios my_vehicles,my_stickers,admin_vehicles,admin_stickers
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+DEFAULT_REQUESTS = {
+    "verify": 2000, "login": 20, "purchase": 200, "dashboard": 100,
+    "my_vehicles": 500, "my_stickers": 500, "admin_vehicles": 200, "admin_stickers": 200,
+}
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+async def run_scenario(client, request_fn, total: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await request_fn(client, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+    }
+
+async def login(client, path: str, payload: dict) -> dict:
+    response = await client.post(path, json=payload)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def build_scenarios(client, n_vehicles: int, purchase_pool: list):
+    from datagen import ADMIN_USERNAME, CITIZEN_PHONE, PASSWORD, plate
+    citizen = await login(client, "/api/auth/login", {"phone": CITIZEN_PHONE, "password": PASSWORD})
+    admin = await login(client, "/api/auth/admin/login", {"username": ADMIN_USERNAME, "password": PASSWORD})
+    rng = random.Random(7)
+    pool = iter(purchase_pool)
+
+    async def purchase(c, i):
+        return await c.post("/api/stickers/purchase", headers=citizen,
+                            json={"vehicle_id": next(pool), "validity_years": 1, "payment_method": "mobile_money"})
+
+    return {
+        "verify": lambda c, i: c.get(f"/api/verify/{plate(rng.randrange(n_vehicles))}"),
+        "login": lambda c, i: c.post("/api/auth/login", json={"phone": CITIZEN_PHONE, "password": PASSWORD}),
+        "purchase": purchase,
+        "dashboard": lambda c, i: c.get("/api/admin/dashboard", headers=admin),
+        "my_vehicles": lambda c, i: c.get("/api/vehicles", headers=citizen),
+        "my_stickers": lambda c, i: c.get("/api/stickers", headers=citizen),
+        "admin_vehicles": lambda c, i: c.get("/api/admin/vehicles?limit=50", headers=admin),
+        "admin_stickers": lambda c, i: c.get("/api/admin/stickers?limit=100", headers=admin),
+    }
+
+def purchasable_vehicle_ids() -> list:
+    from database import SessionLocal
+    from datagen import CITIZEN_PHONE
+    import models
+    db = SessionLocal()
+    try:
+        rows = db.query(models.Vehicle.id).join(models.User, models.User.id == models.Vehicle.user_id).outerjoin(
+            models.Sticker, models.Sticker.vehicle_id == models.Vehicle.id
+        ).filter(models.User.phone == CITIZEN_PHONE, models.Sticker.id.is_(None)).all()
+        return [r.id for r in rows]
+    finally:
+        db.close()
+
+def prepare_database(args) -> int:
+    """Crée le schéma et seed ; retourne le nombre de véhicules seedés."""
+    from datagen import SCALES, generate
+    from database import SessionLocal, engine
+    import models
+    sizes = SCALES[args.scale]
+    if not args.no_seed:
+        models.Base.metadata.drop_all(bind=engine)
+        models.Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            # Historiques datés du jour : vignettes en cours et échues comme en production
+            today = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+            generate(db, **sizes, seed=args.seed, now=today, accounts=True, purchase_pool=args.requests_purchase)
+            print(f"🌱 Seed '{args.scale}' en {time.perf_counter() - started:.1f} s", file=sys.stderr)
+        finally:
+            db.close()
+    return sizes["vehicles"]
+
+async def run(args) -> dict:
+    import httpx
+    n_vehicles = prepare_database(args)
+    if args.seed_only:
+        return {}
+    selected = args.scenarios.split(",") if args.scenarios else list(DEFAULT_REQUESTS)
+    counts = dict(DEFAULT_REQUESTS, purchase=args.requests_purchase)
+    if args.requests:
+        counts = {name: args.requests for name in counts}
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from server import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    purchase_pool = purchasable_vehicle_ids()
+    counts["purchase"] = min(counts["purchase"], len(purchase_pool))
+
+    results = {}
+    async with client:
+        scenarios = await build_scenarios(client, n_vehicles, purchase_pool)
+        for name in selected:
+            results[name] = await run_scenario(client, scenarios[name], counts[name], args.concurrency)
+            print(f"   {name:<15} p50 {results[name]['p50_ms']:>8} ms | p95 {results[name]['p95_ms']:>8} ms | "
+                  f"p99 {results[name]['p99_ms']:>8} ms | {results[name]['throughput_rps']:>8} req/s", file=sys.stderr)
+    return {
+        "meta": {
+            "mode": "http" if args.url else "asgi",
+            "scale": args.scale,
+            "concurrency": args.concurrency,
+            "database": os.environ["DATABASE_URL"].split("://")[0],
+            "fast_serialization": os.environ.get("FAST_SERIALIZATION", "0") == "1",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "scenarios": results,
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: débit {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: erreurs {base['errors']} -> {current['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hermétique de l'API")
+    parser.add_argument("--scale", default="smoke", choices=["smoke", "medium", "national"])
+    parser.add_argument("--database-url", help="Par défaut : SQLite temporaire")
+    parser.add_argument("--url", help="Mode HTTP contre un serveur en marche")
+    parser.add_argument("--scenarios", help="Liste séparée par des virgules (défaut : tous)")
+    parser.add_argument("--requests", type=int, help="Requêtes par scénario (remplace les défauts)")
+    parser.add_argument("--requests-purchase", type=int, default=DEFAULT_REQUESTS["purchase"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-seed", action="store_true", help="Réutilise la base existante")
+    parser.add_argument("--seed-only", action="store_true")
+    parser.add_argument("--output", help="Fichier JSON de résultats (défaut : stdout)")
+    parser.add_argument("--compare", help="Baseline JSON à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Écart toléré (0.2 = 20 %)")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Doit précéder tout import de `database` (l'engine est créé à l'import)
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tempfile.gettempdir(), "vignette_bench.db")
+    # Tout le trafic vient d'une seule IP : le limiteur fausserait la mesure
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    results = asyncio.run(run(args))
+    if args.seed_only:
+        return
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ Régression {line}", file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+        print("✅ Aucune régression au-delà de la tolérance", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
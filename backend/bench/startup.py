@@ -0,0 +1,109 @@
+"""
+Benchmark de démarrage à froid d'un worker API.
+
+Chaque essai lance un interpréteur neuf qui importe `server` (comme le fait
+uvicorn pour chaque worker) et mesure :
+  - process_ms : temps total du processus (interpréteur + import de l'app)
+  - import_ms  : temps d'import de `server` seul
+  - rss_mb     : mémoire résidente maximale du worker après import
+
+`--importtime` produit en plus un profil d'import (équivalent lisible de
+`python -X importtime -c "import server"`) trié par temps cumulé.
+
+Usage (depuis backend/) : python -m bench.startup --runs 10 [--json] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = (
+    "import time; t0 = time.perf_counter(); import server; "
+    "t1 = time.perf_counter(); import resource; "
+    "print((t1 - t0) * 1000, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+def measure_once() -> dict:
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=BACKEND_DIR,
+        capture_output=True, text=True, check=True,
+    )
+    process_ms = (time.perf_counter() - start) * 1000
+    import_ms, maxrss_kb = out.stdout.strip().splitlines()[-1].split()
+    return {"process_ms": process_ms, "import_ms": float(import_ms), "rss_mb": int(maxrss_kb) / 1024}
+
+def import_profile(top: int, max_depth: int = 1) -> list:
+    """Top des modules par temps d'import cumulé (µs), via -X importtime.
+
+    Seuls les modules jusqu'à `max_depth` niveaux d'imbrication sont gardés
+    (0 = `server`, 1 = ce qu'importe directement `server`), pour éviter de
+    compter deux fois un même sous-arbre.
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"], cwd=BACKEND_DIR,
+        capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        head, cumulative_us, name = line.split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth > max_depth:
+            continue
+        rows.append({
+            "module": name.strip(),
+            "self_us": int(head.split(":")[1]),
+            "cumulative_us": int(cumulative_us),
+        })
+    return sorted(rows, key=lambda r: r["cumulative_us"], reverse=True)[:top]
+
+def summarize(values: list) -> dict:
+    values = sorted(values)
+    return {
+        "min": round(values[0], 1),
+        "median": round(statistics.median(values), 1),
+        "max": round(values[-1], 1),
+    }
+
+def run(runs: int) -> dict:
+    samples = [measure_once() for _ in range(runs)]
+    return {
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "process_ms": summarize([s["process_ms"] for s in samples]),
+        "import_ms": summarize([s["import_ms"] for s in samples]),
+        "rss_mb": summarize([s["rss_mb"] for s in samples]),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de démarrage à froid d'un worker")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Sortie JSON brute")
+    parser.add_argument("--importtime", action="store_true", help="Ajoute le profil d'import")
+    parser.add_argument("--top", type=int, default=15, help="Nombre de modules du profil d'import")
+    args = parser.parse_args()
+
+    report = run(args.runs)
+    if args.importtime:
+        report["imports"] = import_profile(args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"🚀 Démarrage à froid ({report['runs']} essais, Python {report['python']})")
+    for key, unit in (("process_ms", "ms"), ("import_ms", "ms"), ("rss_mb", "Mo")):
+        s = report[key]
+        print(f"   {key:<11} min {s['min']:>7} {unit} | médiane {s['median']:>7} {unit} | max {s['max']:>7} {unit}")
+    if "imports" in report:
+        print("📦 Imports les plus coûteux (cumulé) :")
+        for r in report["imports"]:
+            print(f"   {r['cumulative_us'] / 1000:>8.1f} ms  {r['module']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import csv
+import io
+from sqlalchemy import Table, and_, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+def _copy_value(value):
+    # En CSV COPY, un champ vide non quoté vaut NULL
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+def bulk_insert(db: Session, table: Table, rows: list) -> int:
+    """Insère `rows` (liste de dicts) dans la transaction courante de `db`.
+
+    Sur PostgreSQL on passe par COPY FROM STDIN (un seul aller-retour, pas de
+    parsing SQL par ligne) ; sur les autres moteurs, un executemany classique.
+    """
+    if not rows:
+        return 0
+    columns = [c.name for c in table.columns if c.name in rows[0]]
+    conn = db.connection()
+    if conn.dialect.name != "postgresql":
+        conn.execute(table.insert(), rows)
+        return len(rows)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row.get(c)) for c in columns])
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+    return len(rows)
+
+def increment_counters(db: Session, table: Table, key_columns: list, rows: list):
+    """Upsert additif : les colonnes hors clé sont ajoutées aux valeurs existantes."""
+    if not rows:
+        return
+    conn = db.connection()
+    counters = [c for c in rows[0] if c not in key_columns]
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(conn.dialect.name)
+    if dialect is None:
+        _increment_each(conn, table, key_columns, counters, rows)
+        return
+    stmt = dialect.insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={c: table.c[c] + stmt.excluded[c] for c in counters},
+    )
+    conn.execute(stmt, rows)
+
+def _increment_each(conn, table: Table, key_columns: list, counters: list, rows: list):
+    """Moteurs sans ON CONFLICT : UPDATE additif, puis INSERT des clés encore absentes."""
+    key = and_(*(table.c[c] == bindparam(f"key_{c}") for c in key_columns))
+    stmt = table.update().where(key).values({c: table.c[c] + bindparam(f"add_{c}") for c in counters})
+    for row in rows:
+        params = {**{f"key_{c}": row[c] for c in key_columns}, **{f"add_{c}": row[c] for c in counters}}
+        if conn.execute(stmt, params).rowcount == 0:
+            conn.execute(table.insert(), row)
@@ -0,0 +1,109 @@
+"""
+Compression négociée des réponses (ASGI pur).
+
+- `br` si le module brotli est installé et accepté par le client, sinon `gzip`.
+- Seules les réponses d'un seul bloc, au-dessus de COMPRESS_MIN_SIZE et de
+  type texte/JSON sont compressées : une vérification de plaque (~300 octets)
+  part telle quelle, sans coût CPU.
+- Les réponses en flux (plusieurs blocs, text/event-stream) et celles déjà
+  encodées passent sans modification.
+- Un ETag fort devient faible (W/) sur un corps compressé : l'identité et
+  ses versions gzip/br ne sont pas identiques octet pour octet. La
+  comparaison If-None-Match reste faible (httpcache.not_modified).
+"""
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # Dépendance optionnelle
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "5"))
+COMPRESSIBLE_TYPES = (b"application/json", b"text/plain", b"text/html", b"text/csv")
+
+def parse_accept_encoding(value: str) -> set:
+    accepted = set()
+    for part in value.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+def choose_encoding(accept_encoding: str):
+    accepted = parse_accept_encoding(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def weak_etag(value: bytes) -> bytes:
+    return value if value.startswith(b"W/") else b"W/" + value
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                if b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message  # Retenu jusqu'au premier bloc du corps
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            passthrough = True  # Décision prise sur le premier bloc
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+            compressed = compress(body, encoding)
+            headers = [(k, weak_etag(v) if k == b"etag" else v) for k, v in start.get("headers", []) if k != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,4 +1,10 @@
-from sqlalchemy import create_engine
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from itertools import count
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -12,15 +18,104 @@ SQLALCHEMY_DATABASE_URL = os.getenv(
     "postgresql://user_mycar:password_mycar@db:5432/mycar_db"
 )
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Pool par worker : workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) doit rester sous max_connections.
+# Le threadpool des handlers synchrones est dimensionné sur cette capacité (cf. server.lifespan).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Secondes ; -1 : jamais
+POOL_CAPACITY = DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Readiness paresseuse : vérifiée au premier appel, puis mémorisée.
+# Le schéma est géré par `python migrate.py`, jamais au démarrage d'un worker.
+_ready = False
+
+def check_ready() -> bool:
+    global _ready
+    if _ready:
+        return True
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        if not inspect(conn).has_table("users"):
+            return False
+    _ready = True
+    return True
+
+class SessionGate:
+    """Au plus `capacity` sessions de requête par worker, attendues dans la boucle et non
+    dans un thread : FastAPI sérialise les réponses des handlers synchrones dans le
+    threadpool, session encore ouverte. Si des threads attendaient le pool pendant que
+    les détenteurs de connexions attendent un thread, tout resterait bloqué jusqu'à
+    DB_POOL_TIMEOUT.
+
+    L'attente mesurée ici sert de signal de délestage (ratelimit.LoadShedder) : un
+    pool plein mais qui tourne n'attend que quelques millisecondes. Toute connexion
+    prise par une requête passe par ici (get_db, /health/ready, flux SSE).
+
+    Sémaphore créé paresseusement, par processus : jamais dans le maître gunicorn
+    (preload_app) dont les workers hériteraient la copie.
+    """
+    HALF_LIFE = 1.0  # secondes : décroissance de la dernière attente observée
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._semaphore, self._pid = None, None
+        self._waiters = OrderedDict()  # Ordre d'arrivée : le premier est le plus ancien
+        self._ids = count()
+        self._last_wait, self._last_at = 0.0, 0.0
+
+    def _slots(self) -> asyncio.Semaphore:
+        if self._pid != os.getpid():
+            self._semaphore, self._pid = asyncio.Semaphore(self.capacity), os.getpid()
+            self._waiters.clear()
+        return self._semaphore
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _recent_wait(self, now: float) -> float:
+        return self._last_wait * 0.5 ** ((now - self._last_at) / self.HALF_LIFE)
+
+    def wait_seconds(self) -> float:
+        """Attente en cours la plus longue, ou attentes récentes (décroissantes)."""
+        now = time.monotonic()
+        oldest = next(iter(self._waiters.values()), now)
+        return max(now - oldest, self._recent_wait(now))
+
+    @asynccontextmanager
+    async def slot(self):
+        semaphore = self._slots()
+        key, started = next(self._ids), time.monotonic()
+        self._waiters[key] = started
+        try:
+            await semaphore.acquire()
+        finally:
+            del self._waiters[key]
+        now = time.monotonic()
+        self._last_wait, self._last_at = max(now - started, self._recent_wait(now)), now
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+session_gate = SessionGate(POOL_CAPACITY)
+
 # Dépendance pour récupérer la session DB
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+async def get_db():
+    from starlette.concurrency import run_in_threadpool
+
+    async with session_gate.slot():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
\ No newline at end of file
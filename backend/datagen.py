@@ -0,0 +1,324 @@
+"""
+Générateur de données synthétiques réalistes (parc automobile nigérien).
+
+Produit Users, Vehicles (répartition par région et par type), historiques de
+vignettes sur plusieurs années, Payments, Inspections géolocalisées et
+AuditLogs. Tout est chargé par COPY (bulk.py) en flux, par paquets : la
+mémoire reste bornée quel que soit le volume. Les identifiants et valeurs
+sont dérivés de --seed et --now : deux exécutions identiques donnent les
+mêmes lignes.
+
+Seule source de données de test : le benchmark (bench/api.py) charge l'une
+des échelles SCALES avec les comptes connus (--accounts) et un lot de
+véhicules sans vignette, achetables par ses scénarios (--purchase-pool).
+
+Usage (depuis backend/, après `python migrate.py`) :
+  python datagen.py --users 500000 --vehicles 1000000 --inspections 2000000 --seed 42
+  python datagen.py --vehicles 10000 --truncate --now 2026-10-01
+  python datagen.py --scale smoke --accounts --purchase-pool 200
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from bulk import bulk_insert
+from database import engine
+from geo import geocell_for, record_cell_stats
+from plates import normalize_plate
+import models
+
+# Parts approximatives du parc par région, et centre (lat, lon) du chef-lieu
+REGIONS = {
+    "Niamey": (0.30, 13.512, 2.112),
+    "Maradi": (0.15, 13.500, 7.101),
+    "Zinder": (0.13, 13.805, 8.988),
+    "Tahoua": (0.11, 14.889, 5.266),
+    "Dosso": (0.09, 13.049, 3.194),
+    "Tillabéri": (0.09, 14.212, 1.453),
+    "Agadez": (0.08, 16.974, 7.986),
+    "Diffa": (0.05, 13.316, 12.611),
+}
+VEHICLE_TYPES = {
+    "motorcycle": (0.42, ["Haojue", "Yamaha", "Honda", "Sanya"], (1, 4), 10000),
+    "car": (0.43, ["Toyota", "Peugeot", "Nissan", "Hyundai", "Mercedes"], (4, 15), 25000),
+    "truck": (0.10, ["Mercedes", "Renault", "MAN", "Iveco"], (10, 40), 50000),
+    "bus": (0.05, ["Toyota", "Mercedes", "King Long"], (8, 25), 50000),
+}
+MODELS = {"Toyota": ["Corolla", "Hilux", "Land Cruiser", "Coaster"], "Peugeot": ["206", "307", "406"],
+          "Nissan": ["Patrol", "Almera"], "Hyundai": ["Accent", "Tucson"]}
+PAYMENT_METHODS = (["mobile_money"] * 6) + ["card", "cash", "bank_transfer"]
+AUDIT_ACTIONS = [("CREATE", "vehicles"), ("LOGIN", "auth"), ("PURCHASE", "stickers"), ("UPDATE", "users")]
+PASSWORD = "datagen123"
+REFERENCE_DATE = "2026-01-01"
+# Comptes connus (--accounts), mot de passe PASSWORD. Le citoyen est le premier généré.
+CITIZEN_PHONE = "+22790000000"
+ADMIN_USERNAME, SUPERVISOR_USERNAME = "datagen_admin", "datagen_sup"
+
+SCALES = {
+    "smoke": {"users": 1_000, "vehicles": 2_000, "inspections": 2_000, "audit_logs": 1_000},
+    "medium": {"users": 50_000, "vehicles": 100_000, "inspections": 200_000, "audit_logs": 50_000},
+    "national": {"users": 500_000, "vehicles": 1_000_000, "inspections": 2_000_000, "audit_logs": 500_000},
+}
+
+def plate(i: int) -> str:
+    letters = "ABCDEFGHJKLMNPRSTUVWXYZ"
+    return f"{i % 9 + 1}{letters[(i // 9) % 23]}-{i // 207:05d}-NE"
+
+class Generator:
+    def __init__(self, db: Session, seed: int, chunk: int, now: datetime, qr_code: str):
+        self.db = db
+        self.seed = seed
+        self.chunk = chunk
+        self.now = now
+        self.qr_code = qr_code
+        self.rng = random.Random(seed)
+        self.counts = {}
+        self.region_names = list(REGIONS)
+        self.region_weights = [REGIONS[r][0] for r in self.region_names]
+        self.type_names = list(VEHICLE_TYPES)
+        self.type_weights = [VEHICLE_TYPES[t][0] for t in self.type_names]
+
+    def uid(self, kind: str, i: int) -> str:
+        digest = hashlib.blake2b(f"{self.seed}:{kind}:{i}".encode(), digest_size=16).digest()
+        return str(uuid.UUID(bytes=digest, version=4))
+
+    def flush(self, model, rows: list, after=None):
+        if not rows:
+            return
+        bulk_insert(self.db, model.__table__, rows)
+        if after:
+            after(self.db, rows)
+        self.db.commit()
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + len(rows)
+        rows.clear()
+
+    def users(self, n: int, hashed: str):
+        rows = []
+        for i in range(n):
+            rows.append({
+                "id": self.uid("user", i), "phone": f"+227{90000000 + i}", "hashed_password": hashed,  # 0 : CITIZEN_PHONE
+                "first_name": f"Prenom{i}", "last_name": f"Nom{i}", "email": None, "national_id": f"NE{i:09d}",
+                "role": "citizen", "language": self.rng.choice(["fr", "fr", "fr", "ha"]), "loyalty_points": 0,
+                "created_at": self.now - timedelta(days=self.rng.randint(0, 5 * 365)),
+            })
+            if len(rows) >= self.chunk: self.flush(models.User, rows)
+        self.flush(models.User, rows)
+
+    def agent_ids(self, per_region: int) -> list:
+        return [self.uid("agent", i) for i in range(len(self.region_names) * per_region)]
+
+    def agents(self, per_region: int, hashed: str) -> list:
+        rows, agents = [], []
+        ids = iter(self.agent_ids(per_region))
+        for region in self.region_names:
+            for k in range(per_region):
+                agent_id = next(ids)
+                agents.append((agent_id, region))
+                rows.append({
+                    "id": agent_id, "username": f"agent_{region.lower()}_{k}", "hashed_password": hashed,
+                    "role": "agent", "first_name": "Agent", "last_name": f"{region} {k}", "region": region,
+                    "created_at": self.now,
+                })
+        self.flush(models.AdminUser, rows)
+        return agents
+
+    def admin_ids(self) -> list:
+        return [self.uid("admin", 0), self.uid("admin", 1)]
+
+    def admins(self, hashed: str):
+        """Super admin national et superviseur de Niamey (ADMIN_USERNAME, SUPERVISOR_USERNAME)."""
+        admin_id, supervisor_id = self.admin_ids()
+        self.flush(models.AdminUser, [
+            {"id": admin_id, "username": ADMIN_USERNAME, "hashed_password": hashed, "role": "super_admin",
+             "first_name": "Datagen", "last_name": "Admin", "region": None, "created_at": self.now},
+            {"id": supervisor_id, "username": SUPERVISOR_USERNAME, "hashed_password": hashed, "role": "supervisor",
+             "first_name": "Datagen", "last_name": "Superviseur", "region": "Niamey", "created_at": self.now},
+        ])
+
+    def vehicles_and_history(self, n: int, n_users: int, years: int):
+        """Véhicules, puis pour chacun son historique de vignettes et paiements."""
+        vehicles, stickers, payments = [], [], []
+        for i in range(n):
+            rng = self.rng
+            region = rng.choices(self.region_names, self.region_weights)[0]
+            vtype = rng.choices(self.type_names, self.type_weights)[0]
+            _, makes, power, price = VEHICLE_TYPES[vtype]
+            make = rng.choice(makes)
+            vehicle_id, user_id, reg = self.uid("vehicle", i), self.uid("user", rng.randrange(n_users)), plate(i)
+            registered = self.now - timedelta(days=rng.randint(30, years * 365))
+            vehicles.append({
+                "id": vehicle_id, "registration_number": reg, "plate_normalized": normalize_plate(reg),
+                "user_id": user_id, "vehicle_type": vtype,
+                "make": make, "model": rng.choice(MODELS.get(make, ["Standard"])),
+                "energy_type": "diesel" if vtype in ("truck", "bus") else rng.choice(["gasoline", "gasoline", "diesel"]),
+                "engine_power": rng.randint(*power), "chassis_number": f"CH{i:012d}",
+                "year_of_manufacture": rng.randint(1990, self.now.year), "region": region, "created_at": registered,
+            })
+
+            # Une vignette par an depuis l'immatriculation, avec des trous (oublis, non-paiement)
+            start = registered
+            s = 0
+            while start < self.now:
+                if rng.random() < 0.8:
+                    validity = 2 if rng.random() < 0.1 else 1
+                    end = start + timedelta(days=365 * validity)
+                    sticker_id, txn = self.uid(f"sticker:{i}", s), f"TXN-{self.seed}-{i}-{s}"
+                    amount = float(price * validity)
+                    method = rng.choice(PAYMENT_METHODS)
+                    stickers.append({
+                        "id": sticker_id, "vehicle_id": vehicle_id, "user_id": user_id, "registration_number": reg,
+                        "status": "valid" if end > self.now else "expired", "start_date": start, "end_date": end,
+                        "amount_paid": amount, "payment_method": method, "transaction_id": txn, "qr_code": self.qr_code,
+                        "loyalty_points": int(amount / 1000), "region": region, "created_at": start,
+                    })
+                    if rng.random() < 0.05:  # Tentative échouée avant le paiement réussi
+                        payments.append({
+                            "id": self.uid(f"payment-failed:{i}", s), "user_id": user_id, "sticker_id": None,
+                            "amount": amount, "payment_method": method, "status": "failed",
+                            "transaction_ref": f"{txn}-F", "region": region, "created_at": start - timedelta(minutes=5),
+                        })
+                    payments.append({
+                        "id": self.uid(f"payment:{i}", s), "user_id": user_id, "sticker_id": sticker_id,
+                        "amount": amount, "payment_method": method, "status": "completed",
+                        "transaction_ref": txn, "region": region, "created_at": start,
+                    })
+                    start = end
+                else:
+                    start += timedelta(days=rng.randint(30, 365))
+                s += 1
+
+            if len(vehicles) >= self.chunk:
+                self.flush(models.Vehicle, vehicles)
+            if len(stickers) >= self.chunk:
+                self.flush(models.Vehicle, vehicles)  # Les vignettes référencent des véhicules déjà insérés
+                self.flush(models.Sticker, stickers)
+            if len(payments) >= self.chunk:
+                self.flush(models.Payment, payments)
+        self.flush(models.Vehicle, vehicles)
+        self.flush(models.Sticker, stickers)
+        self.flush(models.Payment, payments)
+
+    def purchase_pool(self, n: int, first: int):
+        """Véhicules sans vignette du citoyen CITIZEN_PHONE, numérotés après le parc."""
+        rows = []
+        for i in range(first, first + n):
+            reg = plate(i)
+            rows.append({
+                "id": self.uid("vehicle", i), "registration_number": reg, "plate_normalized": normalize_plate(reg),
+                "user_id": self.uid("user", 0), "vehicle_type": "car", "make": "Toyota", "model": "Corolla",
+                "energy_type": "gasoline", "engine_power": 8, "chassis_number": f"CH{i:012d}",
+                "year_of_manufacture": 2020, "region": "Niamey", "created_at": self.now,
+            })
+            if len(rows) >= self.chunk: self.flush(models.Vehicle, rows)
+        self.flush(models.Vehicle, rows)
+
+    def inspections(self, n: int, n_vehicles: int, agents: list, days: int):
+        rows = []
+        for i in range(n):
+            rng = self.rng
+            agent_id, region = rng.choice(agents)
+            _, lat, lon = REGIONS[region]
+            latitude, longitude = lat + rng.gauss(0, 0.08), lon + rng.gauss(0, 0.08)
+            rows.append({
+                "id": self.uid("inspection", i), "agent_id": agent_id,
+                "vehicle_registration": plate(rng.randrange(n_vehicles)),
+                "status_at_control": rng.choices(["valid", "invalid", "inactive"], [0.7, 0.2, 0.1])[0],
+                "latitude": latitude, "longitude": longitude, "notes": None,
+                "geocell": geocell_for(latitude, longitude), "region": region,
+                "timestamp": self.now - timedelta(seconds=rng.randint(0, days * 86400)),
+            })
+            if len(rows) >= self.chunk: self.flush(models.Inspection, rows, after=record_cell_stats)
+        self.flush(models.Inspection, rows, after=record_cell_stats)
+
+    def audit_logs(self, n: int, n_users: int):
+        rows = []
+        for i in range(n):
+            action, module = self.rng.choice(AUDIT_ACTIONS)
+            rows.append({
+                "id": self.uid("audit", i), "user_id": self.uid("user", self.rng.randrange(n_users)),
+                "action": action, "module": module, "details": json.dumps({"seq": i}),
+                "timestamp": self.now - timedelta(seconds=self.rng.randint(0, 365 * 86400)),
+            })
+            if len(rows) >= self.chunk: self.flush(models.AuditLog, rows)
+        self.flush(models.AuditLog, rows)
+
+# Tables vidées par --truncate (les comptes admin réels sont conservés)
+TRUNCATE_ORDER = [
+    "inspection_cell_stats", "inspections", "audit_logs", "loyalty_entries", "payments", "payments_archive",
+    "stickers", "stickers_archive", "vehicles", "users",
+]
+
+def truncate(db: Session, admin_ids: list):
+    if db.bind.dialect.name == "postgresql":
+        db.execute(text(f"TRUNCATE {', '.join(TRUNCATE_ORDER)}"))
+    else:
+        for table in TRUNCATE_ORDER:
+            db.execute(text(f"DELETE FROM {table}"))
+    db.query(models.AdminUser).filter(models.AdminUser.id.in_(admin_ids)).delete(synchronize_session=False)
+    db.commit()
+
+def generate(db: Session, users: int, vehicles: int, inspections: int, audit_logs: int, years: int = 6,
+             inspection_days: int = 90, agents_per_region: int = 20, seed: int = 42, chunk: int = 20000,
+             now: datetime = None, truncate_first: bool = False, accounts: bool = False,
+             purchase_pool: int = 0) -> Generator:
+    from server import hash_password, generate_qr_code
+    gen = Generator(db, seed, chunk, now or datetime.fromisoformat(REFERENCE_DATE),
+                    qr_code=generate_qr_code("NIGER-VIGNETTE|DATAGEN"))  # Taille réaliste, générée une fois
+    if truncate_first:
+        truncate(db, gen.agent_ids(agents_per_region) + gen.admin_ids())
+    hashed = hash_password(PASSWORD)  # Un seul bcrypt pour tous les comptes
+    gen.users(max(1, users), hashed)
+    agents = gen.agents(agents_per_region, hashed)
+    if accounts:
+        gen.admins(hashed)
+    gen.vehicles_and_history(vehicles, max(1, users), years)
+    gen.purchase_pool(purchase_pool, first=vehicles)
+    gen.inspections(inspections, max(1, vehicles), agents, inspection_days)
+    gen.audit_logs(audit_logs, max(1, users))
+    return gen
+
+def main():
+    parser = argparse.ArgumentParser(description="Générateur de données synthétiques")
+    parser.add_argument("--scale", choices=list(SCALES), help="Volumes prédéfinis (remplacent les quatre suivants)")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--vehicles", type=int, default=10000)
+    parser.add_argument("--inspections", type=int, default=20000)
+    parser.add_argument("--audit-logs", type=int, default=20000)
+    parser.add_argument("--years", type=int, default=6, help="Profondeur de l'historique de vignettes")
+    parser.add_argument("--inspection-days", type=int, default=90)
+    parser.add_argument("--agents-per-region", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk", type=int, default=20000, help="Lignes par COPY")
+    parser.add_argument("--now", default=REFERENCE_DATE, help="Date de référence (ISO) des historiques")
+    parser.add_argument("--accounts", action="store_true", help=f"Crée {ADMIN_USERNAME} et {SUPERVISOR_USERNAME}")
+    parser.add_argument("--purchase-pool", type=int, default=0, help="Véhicules sans vignette du citoyen CITIZEN_PHONE")
+    parser.add_argument("--truncate", action="store_true",
+                        help="DESTRUCTIF : vide citoyens, véhicules, vignettes, paiements, inspections et logs avant chargement")
+    args = parser.parse_args()
+    sizes = SCALES[args.scale] if args.scale else {
+        "users": args.users, "vehicles": args.vehicles, "inspections": args.inspections, "audit_logs": args.audit_logs,
+    }
+
+    started = time.perf_counter()
+    with Session(engine) as db:
+        gen = generate(
+            db, **sizes, years=args.years, inspection_days=args.inspection_days,
+            agents_per_region=args.agents_per_region, seed=args.seed, chunk=args.chunk,
+            now=datetime.fromisoformat(args.now), truncate_first=args.truncate, accounts=args.accounts,
+            purchase_pool=args.purchase_pool,
+        )
+
+    elapsed = time.perf_counter() - started
+    total = sum(gen.counts.values())
+    print(f"✅  {total} lignes en {elapsed:.1f} s ({total / elapsed:,.0f} lignes/s)")
+    for table, count in gen.counts.items():
+        print(f"   {table:<22} {count:>12,}")
+
+if __name__ == "__main__":
+    main()
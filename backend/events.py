@@ -0,0 +1,177 @@
+"""
+Deltas du tableau de bord admin en direct (Server-Sent Events).
+
+Les routes d'écriture publient, après commit, l'effet de la transaction sur
+les compteurs de /api/admin/dashboard (ex. {"total_vehicles": 1}). Le client
+charge le tableau de bord une fois, puis applique les deltas reçus sur
+/api/admin/events : plus de rechargements répétés des agrégats.
+
+- Diffusion en mémoire : chaque événement est encodé une seule fois, puis
+  le même bloc d'octets est déposé dans la file de chaque abonné (filtre par
+  région). Un abonné trop lent (file pleine) reçoit `resync` et est fermé :
+  le client recharge le tableau de bord et se réabonne.
+- EVENTS_BACKEND=postgres (défaut sur PostgreSQL) : publication par NOTIFY
+  dans la transaction de l'écriture (délivré au commit seulement), un thread
+  LISTEN par worker ayant des abonnés rediffuse localement (plusieurs workers
+  ou machines). La diffusion en mémoire (défaut ailleurs) ne voit que les
+  écritures de son propre worker.
+- Abonnement par ticket à usage unique (POST /api/admin/events/ticket) : le
+  JWT ne passe jamais dans l'URL, donc ni dans les journaux d'accès.
+- Arrêt du worker : dès SIGTERM/SIGINT, chaque abonné reçoit `resync` et son
+  flux se termine, sans quoi uvicorn attendrait la fin de flux infinis
+  avant de s'arrêter. Le client se reconnecte à un autre worker.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import select
+import signal
+import threading
+import time
+from contextlib import closing
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# memory, postgres ; la mémoire ne diffuse qu'au sein d'un worker
+EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND") or ("postgres" if engine.dialect.name == "postgresql" else "memory")
+EVENTS_CHANNEL = "vignette_events"
+SUBSCRIBER_QUEUE = int(os.environ.get("EVENTS_SUBSCRIBER_QUEUE", "100"))
+HEARTBEAT_SECONDS = 15
+
+class Subscription:
+    def __init__(self, region: Optional[str], maxsize: int):
+        self.region = region
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+class Broadcaster:
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE):
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._loop = None
+        self._ids = itertools.count(1)
+        self._listener = None
+
+    def subscribe(self, region: Optional[str] = None) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(region, self.maxsize)
+        self._subscribers.add(subscription)
+        if EVENTS_BACKEND == "postgres" and (self._listener is None or not self._listener.is_alive()):
+            self._listener = threading.Thread(target=self._listen, name="events-listen", daemon=True)
+            self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, region: Optional[str], delta: dict):
+        """Depuis n'importe quel thread ; sans abonné, ne coûte rien."""
+        loop = self._loop
+        if not self._subscribers or loop is None:
+            return
+        payload = json.dumps({"region": region, "delta": delta}, separators=(",", ":"))
+        message = f"id: {next(self._ids)}\nevent: delta\ndata: {payload}\n\n".encode()
+        try:
+            loop.call_soon_threadsafe(self._fan_out, region, message)
+        except RuntimeError:  # Boucle fermée (arrêt du worker)
+            pass
+
+    def close(self):
+        """Termine tous les flux (boucle du worker) : `resync` puis fin de réponse."""
+        for subscription in list(self._subscribers):
+            subscription.overflowed = True
+            try:
+                subscription.queue.put_nowait(b"")  # Réveille le flux en attente
+            except asyncio.QueueFull:
+                pass
+
+    def close_on_exit(self):
+        """Ferme les flux dès le signal d'arrêt, avant l'attente des connexions ouvertes."""
+        if threading.current_thread() is not threading.main_thread():
+            return  # Signaux réservés au thread principal (TestClient, serveur dans un thread)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(sig)  # Gestionnaire d'uvicorn : on le chaîne
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.close)
+                if callable(previous):
+                    previous(signum, frame)
+            signal.signal(sig, handler)
+
+    def _fan_out(self, region: Optional[str], message: bytes):
+        for subscription in list(self._subscribers):
+            if subscription.region is not None and subscription.region != region:
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+
+    def _listen(self):
+        import psycopg2
+
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while self._subscribers:
+            try:
+                # Hors pool : la connexion reste ouverte, et fermée même sur erreur
+                with closing(psycopg2.connect(dsn)) as conn:
+                    conn.autocommit = True
+                    conn.cursor().execute(f"LISTEN {EVENTS_CHANNEL}")
+                    while self._subscribers:
+                        if select.select([conn], [], [], 5) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            data = json.loads(conn.notifies.pop(0).payload)
+                            self.publish(data.get("region"), data.get("delta", {}))
+            except Exception as e:
+                logger.warning(f"Écoute {EVENTS_CHANNEL} interrompue, reprise dans 5 s : {e}")
+                time.sleep(5)
+
+broadcaster = Broadcaster()
+
+def publish_after_commit(db: Session, region: Optional[str], **delta):
+    """Publie `delta` pour `region` quand (et si) la transaction de `db` est validée."""
+    if EVENTS_BACKEND == "postgres":
+        payload = json.dumps({"region": region, "delta": delta}, separators=(",", ":"))
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": EVENTS_CHANNEL, "payload": payload})
+    else:
+        db.info.setdefault("pending_events", []).append((region, delta))
+
+@event.listens_for(SessionLocal, "after_commit")
+def _flush_pending_events(session: Session):
+    for region, delta in session.info.pop("pending_events", ()):
+        broadcaster.publish(region, delta)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _drop_pending_events(session: Session):
+    session.info.pop("pending_events", None)
+
+async def stream(subscription: Subscription, request):
+    """Corps text/event-stream d'un abonné, avec battement de cœur."""
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield b": ping\n\n"
+                continue
+            if message:
+                yield message
+            if subscription.overflowed and subscription.queue.empty():
+                yield b"event: resync\ndata: {}\n\n"
+                return
+    finally:
+        broadcaster.unsubscribe(subscription)
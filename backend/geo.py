@@ -0,0 +1,73 @@
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+
+from bulk import increment_counters
+import models
+
+# Précision stockée : 6 caractères ≈ 1,2 km x 0,6 km à l'équateur.
+# Les heatmaps plus grossières regroupent par préfixe.
+GEOCELL_PRECISION = 6
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOCELL_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+def geohash_decode(cell: str) -> Tuple[float, float]:
+    """Centre (lat, lon) de la cellule."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1: rng[0] = mid
+            else: rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+def geocell_for(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return geohash_encode(latitude, longitude)
+
+def hour_bucket(ts: datetime) -> datetime:
+    # Les agrégats sont stockés en UTC naïf, comme les autres colonnes DateTime
+    return ts.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+def record_cell_stats(db: Session, rows: list):
+    """Met à jour les agrégats (cellule, heure, région) pour des lignes d'inspection déjà insérées.
+
+    La région fait partie de la clé : un superviseur ne lit que les agrégats de la sienne.
+    """
+    counts = Counter()
+    for row in rows:
+        if row.get("geocell") is None:
+            continue
+        key = (row["geocell"], hour_bucket(row["timestamp"]), row.get("region") or "")
+        counts[key + ("valid_count" if row["status_at_control"] == "valid" else "invalid_count",)] += 1
+    deltas = {}
+    for (cell, bucket, region, column), n in counts.items():
+        deltas.setdefault((cell, bucket, region), {
+            "cell": cell, "bucket": bucket, "region": region, "valid_count": 0, "invalid_count": 0
+        })[column] += n
+    increment_counters(db, models.InspectionCellStat.__table__, ["bucket", "cell", "region"], list(deltas.values()))
@@ -0,0 +1,61 @@
+"""
+Point d'entrée de production : gunicorn + workers uvicorn.
+
+  python migrate.py && gunicorn server:app     # lit ce fichier (répertoire courant)
+
+- WEB_CONCURRENCY workers (défaut : nombre de CPU). Les handlers synchrones
+  (bcrypt, PIL, psycopg2) tournent dans le threadpool de chaque worker,
+  dimensionné sur son pool DB (THREADPOOL_SIZE, défaut DB_POOL_SIZE +
+  DB_MAX_OVERFLOW, cf. database.py). Connexions PostgreSQL au plus :
+  workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW), à garder sous max_connections.
+- preload_app : l'application et les modules chargés paresseusement par
+  server.py (qrcode/PIL, passlib, jose) sont importés une fois dans le
+  maître puis partagés en copie sur écriture ; gc.freeze() évite que le
+  ramasse-miettes des workers ne recopie ces pages.
+- Plusieurs workers : les deltas du tableau de bord passent par
+  PostgreSQL (EVENTS_BACKEND, cf. events.py) ; avec la diffusion en mémoire,
+  un abonné ne verrait que les écritures de son worker (avertissement).
+- Arrêt (SIGTERM) : les flux SSE sont fermés aussitôt (events.py), les
+  requêtes en cours ont GRACEFUL_TIMEOUT secondes pour finir, puis le pool
+  DB est libéré (server.lifespan).
+
+Mesures : README.md, section « Production : workers gunicorn ».
+"""
+import gc
+import importlib
+import os
+
+from uvicorn_worker import UvicornWorker
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+preload_app = True
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+keepalive = 5
+accesslog = os.environ.get("ACCESS_LOG")  # Ex. "-" ; désactivé par défaut (Server-Timing et /metrics suffisent)
+
+WARM_IMPORTS = ("qrcode", "PIL.Image", "PIL.PngImagePlugin", "passlib.context", "passlib.handlers.bcrypt", "jose.jwt")
+
+class Worker(UvicornWorker):
+    # Sans délai, uvicorn attend indéfiniment les connexions ouvertes avant le lifespan d'arrêt
+    CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, "timeout_graceful_shutdown": max(1, graceful_timeout - 5)}
+
+worker_class = Worker
+
+def when_ready(server):
+    # Maître, après le préchargement de l'application et avant le premier fork
+    for name in WARM_IMPORTS:
+        importlib.import_module(name)
+    import server as app_module
+    import events
+    app_module.get_pwd_context()
+    if workers > 1 and events.EVENTS_BACKEND == "memory":
+        server.log.warning(f"EVENTS_BACKEND=memory avec {workers} workers : deltas du tableau de bord incomplets")
+    gc.freeze()
+    server.log.info(f"{workers} workers, threadpool {app_module.THREADPOOL_SIZE} par worker")
+
+def post_fork(server, worker):
+    # Les connexions éventuellement ouvertes par le maître ne doivent pas être partagées
+    from database import engine
+    engine.dispose(close=False)
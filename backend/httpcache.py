@@ -0,0 +1,38 @@
+"""
+GET conditionnels pour les lectures propres à un citoyen.
+
+L'ETag dérive de `users.data_version`, incrémenté dans la même transaction
+que chaque écriture touchant les données du citoyen. La version est lue
+avec l'utilisateur courant par `get_current_user` : la comparaison
+If-None-Match ne coûte aucune requête supplémentaire et reste juste quel que
+soit le worker qui a traité l'écriture (pas d'état en mémoire).
+
+L'ETag est faible (W/) : il désigne une version des données, pas des octets
+précis (projections ?fields=, compression gzip/br, cf. compression.py).
+"""
+from typing import Optional
+from fastapi import Request, Response
+
+import models
+
+def bump_data_version(user) -> None:
+    """À appeler avant le commit d'une écriture visible par le citoyen."""
+    if isinstance(user, models.User):
+        user.data_version = models.User.data_version + 1
+
+def user_etag(user) -> Optional[str]:
+    if not isinstance(user, models.User):
+        return None  # Comptes admin : pas de version, pas de cache
+    return f'W/"{user.id}.{user.data_version or 0}"'
+
+def not_modified(request: Request, response: Response, user) -> Optional[Response]:
+    """304 si le client a déjà la version courante ; sinon pose ETag/Cache-Control sur `response`."""
+    etag = user_etag(user)
+    if etag is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    candidates = request.headers.get("if-none-match", "")
+    if etag.removeprefix("W/") in [tag.strip().removeprefix("W/") for tag in candidates.split(",")] or candidates.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
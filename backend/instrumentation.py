@@ -0,0 +1,163 @@
+"""
+Instrumentation par requête : nombre de requêtes SQL, temps DB et temps total.
+
+- Les hooks SQLAlchemy (`instrument_engine`) cumulent dans les stats de la
+  requête HTTP en cours (ContextVar, propagée au threadpool des handlers sync).
+- `InstrumentationMiddleware` (ASGI pur) ajoute l'en-tête `Server-Timing`,
+  alimente les histogrammes par route et signale les N+1 probables.
+- `render_metrics()` expose le tout au format texte Prometheus.
+
+Les métriques sont par processus : avec plusieurs workers, chaque scrape
+ne voit que le worker qui répond.
+"""
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "20"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+# ===================== HOOKS SQL =====================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+# ===================== METRIQUES =====================
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> list:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.total}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.total}")
+        return lines
+
+class Registry:
+    HISTOGRAMS = {
+        "http_request_duration_seconds": ("Durée totale de la requête", BUCKETS),
+        "http_request_db_seconds": ("Temps passé en base par requête", BUCKETS),
+        "http_request_queries": ("Requêtes SQL par requête HTTP", QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in self.HISTOGRAMS}
+        self._requests = {}
+
+    def observe(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            for name, value in (
+                ("http_request_duration_seconds", duration),
+                ("http_request_db_seconds", stats.db_time),
+                ("http_request_queries", stats.queries),
+            ):
+                series = self._histograms[name]
+                if key not in series:
+                    series[key] = Histogram(self.HISTOGRAMS[name][1])
+                series[key].observe(value)
+            counter_key = (method, route, status)
+            self._requests[counter_key] = self._requests.get(counter_key, 0) + 1
+
+    def render(self) -> str:
+        lines = ["# HELP http_requests_total Requêtes HTTP traitées", "# TYPE http_requests_total counter"]
+        with self._lock:
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), histogram in sorted(self._histograms[name].items()):
+                    lines += histogram.render(name, f'method="{method}",route="{route}"')
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+def render_metrics() -> str:
+    return registry.render()
+
+# ===================== MIDDLEWARE =====================
+
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                    f"app;dur={elapsed_ms:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.observe(scope["method"], route, status_code, time.perf_counter() - started, stats)
+            if stats.queries > QUERY_BUDGET:
+                logger.warning(
+                    f"N+1 probable : {scope['method']} {route} a exécuté {stats.queries} requêtes SQL "
+                    f"(budget {QUERY_BUDGET}, {stats.db_time * 1000:.1f} ms en base)"
+                )
@@ -0,0 +1,71 @@
+"""
+Cycle de vie des vignettes : passe en "expired" les vignettes "valid" échues.
+
+Mises à jour ensemblistes par paquets (--chunk) validées une à une : aucun
+verrou long sur `stickers`, et le job peut être interrompu sans dommage.
+Chaque paquet incrémente `users.data_version` des titulaires (ETag, cf.
+httpcache.py) et publie, au commit, la baisse de `active_stickers` par région
+(tableau de bord en direct, cf. events.py). Les lectures gardent leur borne
+`end_date > now` : entre deux passages, une vignette échue mais encore
+"valid" n'est jamais comptée active.
+
+Usage (depuis backend/) :
+  python lifecycle.py                       # un passage (cron)
+  python lifecycle.py --loop --interval 900 # service permanent
+"""
+import argparse
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+import events
+import models
+
+def expire_stickers(db: Session, now: datetime, chunk: int = 5000) -> int:
+    sticker, total = models.Sticker, 0
+    while True:
+        rows = db.query(sticker.id, sticker.user_id, sticker.region).filter(
+            models.STICKER_ACTIVE, sticker.end_date <= now
+        ).limit(chunk).all()  # Servi par ix_stickers_active_end_date
+        if not rows:
+            return total
+        db.query(sticker).filter(sticker.id.in_([r.id for r in rows])).update(
+            {sticker.status: "expired"}, synchronize_session=False
+        )
+        db.query(models.User).filter(models.User.id.in_({r.user_id for r in rows})).update(
+            {models.User.data_version: models.User.data_version + 1}, synchronize_session=False
+        )
+        for region, expired in Counter(r.region for r in rows).items():
+            events.publish_after_commit(db, region, active_stickers=-expired)
+        db.commit()
+        total += len(rows)
+
+def run_once(chunk: int) -> int:
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        # Naïf UTC : comme les dates écrites par l'API et comparées par SQLite
+        expired = expire_stickers(db, datetime.now(timezone.utc).replace(tzinfo=None), chunk)
+    print(f"✅  {expired} vignettes expirées en {time.perf_counter() - started:.1f} s")
+    return expired
+
+def main():
+    parser = argparse.ArgumentParser(description="Expiration des vignettes échues")
+    parser.add_argument("--chunk", type=int, default=5000, help="Vignettes par transaction")
+    parser.add_argument("--loop", action="store_true", help="Tourne en continu")
+    parser.add_argument("--interval", type=int, default=900, help="Secondes entre deux passages (--loop)")
+    args = parser.parse_args()
+    while True:
+        try:
+            run_once(args.chunk)
+        except Exception as e:
+            print(f"❌ ERREUR : {e}")
+            if not args.loop:
+                raise SystemExit(1)
+        if not args.loop:
+            return
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Stratégie de chargement des relations.
+
+- Les collections (User.vehicles, User.stickers, User.payments,
+  Vehicle.stickers) sont en `raise_on_sql` : non bornées, elles ne se
+  chargent que via un `selectinload` explicite dans la route.
+- Les many-to-one restent paresseuses (souvent servies par l'identity map).
+- STRICT_LOADING=1 (tests, bench) : tout chargement paresseux qui émettrait
+  du SQL lève une erreur, pour qu'une liste de 10k lignes garde un nombre de
+  requêtes constant. Désactivé, aucun hook n'est installé.
+"""
+import os
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, raiseload
+from database import SessionLocal
+
+STRICT_LOADING = os.environ.get("STRICT_LOADING", "0") == "1"
+
+def _raise_on_lazy_load(state: ORMExecuteState):
+    if state.is_select and not state.is_column_load and not state.is_relationship_load:
+        # Les options explicites de la route (selectinload, joinedload) priment sur le joker
+        state.statement = state.statement.options(raiseload("*", sql_only=True))
+
+if STRICT_LOADING:
+    event.listen(SessionLocal, "do_orm_execute", _raise_on_lazy_load)
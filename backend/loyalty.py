@@ -0,0 +1,101 @@
+"""
+Points de fidélité : journal append-only + solde en cache.
+
+Chaque mouvement est une ligne de `loyalty_entries` (earn, redeem, adjust),
+jamais modifiée ni supprimée. `users.loyalty_points` n'est qu'un cache du
+total, mis à jour dans la même transaction par un UPDATE atomique
+(`loyalty_points = loyalty_points + n`) : lecture du solde en O(1), sans
+perte de mise à jour entre deux achats concurrents.
+
+Rapprochement (cache vs journal), depuis backend/ :
+  python loyalty.py          # signale les écarts
+  python loyalty.py --fix    # réaligne le cache sur le journal (qui fait foi)
+"""
+import argparse
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from database import engine
+import models
+
+EARN, REDEEM, ADJUST = "earn", "redeem", "adjust"
+FCFA_PER_POINT = 1000
+
+class InsufficientPoints(Exception):
+    pass
+
+class UnknownUser(LookupError):
+    """Pas de citoyen `user_id` (compte admin ou supprimé) : aucun solde à mouvementer."""
+
+def points_for(amount: float) -> int:
+    return int(amount / FCFA_PER_POINT)
+
+def record(db: Session, user_id: str, kind: str, points: int, sticker_id: Optional[str] = None,
+           payment_id: Optional[str] = None, reason: Optional[str] = None) -> models.LoyaltyEntry:
+    """Ajoute l'écriture et répercute `points` (signé) sur le solde, sans commit."""
+    balance = func.coalesce(models.User.loyalty_points, 0)
+    statement = update(models.User).where(models.User.id == user_id).values(loyalty_points=balance + points)
+    if points < 0:
+        # Garde dans le même UPDATE : deux débits concurrents ne peuvent pas passer sous zéro
+        statement = statement.where(balance + points >= 0)
+    if db.execute(statement.execution_options(synchronize_session=False)).rowcount != 1:
+        # Ligne non touchée : débit refusé par la garde, ou citoyen inexistant
+        if points < 0 and db.query(models.User.id).filter(models.User.id == user_id).first():
+            raise InsufficientPoints(user_id)
+        raise UnknownUser(user_id)
+    entry = models.LoyaltyEntry(
+        id=str(uuid.uuid4()), user_id=user_id, kind=kind, points=points, sticker_id=sticker_id,
+        payment_id=payment_id, reason=reason, created_at=datetime.now(timezone.utc)
+    )
+    db.add(entry)
+    return entry
+
+def earn(db: Session, user_id: str, points: int, sticker_id: str, payment_id: str) -> models.LoyaltyEntry:
+    return record(db, user_id, EARN, points, sticker_id=sticker_id, payment_id=payment_id)
+
+def redeem(db: Session, user_id: str, points: int, reason: str) -> models.LoyaltyEntry:
+    return record(db, user_id, REDEEM, -abs(points), reason=reason)
+
+def adjust(db: Session, user_id: str, points: int, reason: str) -> models.LoyaltyEntry:
+    return record(db, user_id, ADJUST, points, reason=reason)
+
+def find_drift(db: Session) -> list:
+    """(user_id, solde en cache, total du journal) pour chaque solde divergent."""
+    ledger = db.query(
+        models.LoyaltyEntry.user_id, func.sum(models.LoyaltyEntry.points).label("total")
+    ).group_by(models.LoyaltyEntry.user_id).subquery()
+    cached, total = func.coalesce(models.User.loyalty_points, 0), func.coalesce(ledger.c.total, 0)
+    return db.query(models.User.id, cached.label("cached"), total.label("ledger")).outerjoin(
+        ledger, ledger.c.user_id == models.User.id
+    ).filter(cached != total).all()
+
+def fix_drift(db: Session, drift: list) -> int:
+    for row in drift:
+        db.execute(update(models.User).where(models.User.id == row.id).values(
+            loyalty_points=row.ledger, data_version=models.User.data_version + 1
+        ))
+    db.commit()
+    return len(drift)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapprochement des soldes de points de fidélité")
+    parser.add_argument("--fix", action="store_true", help="Réaligne les soldes sur le journal")
+    args = parser.parse_args()
+    with Session(engine) as db:
+        drift = find_drift(db)
+        for row in drift[:20]:
+            print(f"   ⚠️  {row.id} : solde {row.cached}, journal {row.ledger}")
+        if not drift:
+            print("✅  Soldes conformes au journal.")
+        elif args.fix:
+            print(f"✅  {fix_drift(db, drift)} soldes réalignés sur le journal.")
+        else:
+            print(f"❌ {len(drift)} soldes divergents (relancer avec --fix)")
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Gestion explicite du schéma.
+À lancer une fois par déploiement (et non par worker) : python migrate.py
+
+Sous PostgreSQL, la migration prend un verrou consultatif : des réplicas
+lancés ensemble (CMD du Dockerfile) migrent l'un après l'autre, les suivants
+ne trouvant plus rien à faire, au lieu de se disputer les verrous DDL.
+
+create_all ne crée que les tables absentes : les colonnes et index ajoutés
+depuis sur des tables existantes sont rattrapés ici, puis les backfills
+remplissent les nouvelles colonnes des lignes historiques.
+"""
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from sqlalchemy import exists, func, inspect, text
+from sqlalchemy.orm import Session
+from bulk import bulk_insert
+from database import engine
+from geo import geocell_for, record_cell_stats
+from plates import normalize_plate
+import models
+
+BATCH_SIZE = 5000
+MIGRATION_LOCK_ID = 0x56494E47  # Clé pg_advisory_lock propre à ce schéma
+
+@contextmanager
+def migration_lock():
+    """Une seule migration à la fois sur la base (verrou de session, relâché même en cas d'erreur)."""
+    if engine.dialect.name != "postgresql":
+        yield  # SQLite : fichier local, un seul processus migre
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_ID})
+
+def add_missing_columns(conn):
+    inspector = inspect(conn)
+    for table in models.Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            if column.server_default is not None:
+                col_type += f" DEFAULT '{column.server_default.arg}'"
+            print(f"   + {table.name}.{column.name} ({col_type})")
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+
+def drop_stale_foreign_keys(conn):
+    """FK retirées des modèles (loyalty_entries → stickers/payments, lignes archivables)."""
+    if conn.dialect.name != "postgresql":
+        return  # SQLite ne sait pas supprimer une contrainte (et ne les applique pas par défaut)
+    inspector = inspect(conn)
+    for table in models.Base.metadata.sorted_tables:
+        declared = {fk.parent.name for fk in table.foreign_keys}
+        for fk in inspector.get_foreign_keys(table.name):
+            if fk["name"] and not set(fk["constrained_columns"]) <= declared:
+                print(f"   - {table.name}.{fk['name']}")
+                conn.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT "{fk["name"]}"'))
+
+def create_missing_indexes(conn):
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def drop_unscoped_cell_stats(conn):
+    """Agrégats d'inspection antérieurs à la région dans la clé : supprimés (cf. rebuild_cell_stats)."""
+    table = models.InspectionCellStat.__table__
+    inspector = inspect(conn)
+    if not inspector.has_table(table.name) or "region" in inspector.get_pk_constraint(table.name)["constrained_columns"]:
+        return
+    print(f"   - {table.name} (clé sans région)")
+    table.drop(conn)
+
+def rebuild_cell_stats(db: Session):
+    """Agrégats (cellule, heure, région) des inspections déjà géolocalisées, si la table est vide."""
+    inspection, last_id = models.Inspection, ""
+    if db.query(models.InspectionCellStat.bucket).first() is not None:
+        return
+    while True:
+        rows = db.query(
+            inspection.id, inspection.geocell, inspection.status_at_control, inspection.timestamp, inspection.region
+        ).filter(inspection.geocell.isnot(None), inspection.id > last_id).order_by(inspection.id).limit(BATCH_SIZE).all()
+        if not rows:
+            return
+        record_cell_stats(db, [row._asdict() for row in rows])
+        db.commit()
+        last_id = rows[-1].id
+        print(f"   ↳ {len(rows)} inspections agrégées")
+
+def backfill_geocells(db: Session):
+    """Géocellules des inspections antérieures + agrégats correspondants."""
+    inspection = models.Inspection
+    while True:
+        rows = db.query(
+            inspection.id, inspection.latitude, inspection.longitude,
+            inspection.status_at_control, inspection.timestamp, inspection.region
+        ).filter(
+            inspection.geocell.is_(None), inspection.latitude.isnot(None), inspection.longitude.isnot(None)
+        ).limit(BATCH_SIZE).all()
+        if not rows:
+            return
+        updates = [
+            {"id": r.id, "geocell": geocell_for(r.latitude, r.longitude),
+             "status_at_control": r.status_at_control, "timestamp": r.timestamp, "region": r.region}
+            for r in rows
+        ]
+        db.bulk_update_mappings(inspection, [{"id": u["id"], "geocell": u["geocell"]} for u in updates])
+        record_cell_stats(db, updates)
+        db.commit()
+        print(f"   ↳ {len(updates)} inspections géolocalisées")
+
+def backfill_regions(db: Session):
+    """Région dénormalisée des vignettes, paiements et inspections historiques."""
+    targets = [
+        ("stickers", "vehicles", "vehicle_id"),
+        ("payments", "stickers", "sticker_id"),
+        ("inspections", "admin_users", "agent_id"),
+    ]
+    for table, source, fk in targets:
+        source_region = f"SELECT src.region FROM {source} src WHERE src.id = {table}.{fk} AND src.region IS NOT NULL"
+        statement = f"UPDATE {table} SET region = ({source_region}) WHERE region IS NULL AND EXISTS ({source_region})"
+        result = db.execute(text(statement))
+        db.commit()
+        if result.rowcount:
+            print(f"   ↳ {result.rowcount} lignes : {table}.region")
+
+def backfill_plates(db: Session):
+    """Plaques normalisées (recherche approchée) des véhicules historiques."""
+    vehicle = models.Vehicle
+    while True:
+        rows = db.query(vehicle.id, vehicle.registration_number).filter(
+            vehicle.plate_normalized.is_(None), vehicle.registration_number.isnot(None)
+        ).limit(BATCH_SIZE).all()
+        if not rows:
+            return
+        db.bulk_update_mappings(vehicle, [
+            {"id": r.id, "plate_normalized": normalize_plate(r.registration_number)} for r in rows
+        ])
+        db.commit()
+        print(f"   ↳ {len(rows)} plaques normalisées")
+
+def backfill_loyalty_openings(db: Session):
+    """Écriture d'ouverture (adjust) pour les soldes antérieurs au journal de fidélité."""
+    user, entry = models.User, models.LoyaltyEntry
+    now = datetime.now(timezone.utc)
+    while True:
+        rows = db.query(user.id, user.loyalty_points).filter(
+            func.coalesce(user.loyalty_points, 0) != 0, ~exists().where(entry.user_id == user.id)
+        ).limit(BATCH_SIZE).all()
+        if not rows:
+            return
+        bulk_insert(db, entry.__table__, [
+            {"id": str(uuid.uuid4()), "user_id": r.id, "kind": "adjust", "points": r.loyalty_points,
+             "sticker_id": None, "payment_id": None, "reason": "Solde d'ouverture", "created_at": now}
+            for r in rows
+        ])
+        db.commit()
+        print(f"   ↳ {len(rows)} soldes de fidélité ouverts au journal")
+
+# Régions d'abord : clé des agrégats d'inspection. Agrégats recalculés avant le
+# backfill des géocellules, qui ajoute ensuite ceux des inspections qu'il localise.
+BACKFILLS = [backfill_regions, rebuild_cell_stats, backfill_geocells, backfill_plates, backfill_loyalty_openings]
+
+def migrate():
+    with migration_lock():
+        apply_schema()
+
+def apply_schema():
+    print("🔄 Application du schéma...")
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))  # ix_vehicles_plate_trgm
+    with engine.begin() as conn:
+        drop_unscoped_cell_stats(conn)
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        add_missing_columns(conn)
+        drop_stale_foreign_keys(conn)
+        create_missing_indexes(conn)
+    with Session(engine) as db:
+        for backfill in BACKFILLS:
+            backfill(db)
+    with engine.begin() as conn:
+        # Statistiques à jour pour les nouveaux index : sans elles, SQLite choisit par exemple
+        # ix_stickers_region_end_date plutôt que ix_stickers_vehicle_end_date (search.py)
+        conn.execute(text("ANALYZE"))
+    print("✅  Schéma à jour.")
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print(f"❌ ERREUR : {e}")
+        raise SystemExit(1)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Boolean, Text, Index, Table, func, literal, literal_column
+from sqlalchemy.orm import relationship, deferred
 from database import Base
+from scoping import RegionScoped
 import datetime
 
 # --- UTILISATEURS ---
@@ -16,11 +17,24 @@ class User(Base):
     role = Column(String, default="citizen")
     language = Column(String, default="fr")
     loyalty_points = Column(Integer, default=0)
+    data_version = Column(Integer, default=0, server_default="0") # ETag des lectures citoyen (httpcache.py)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
-    vehicles = relationship("Vehicle", back_populates="owner")
-    stickers = relationship("Sticker", back_populates="user")
-    payments = relationship("Payment", back_populates="user")
+    # Collections : chargement explicite uniquement (cf. loading.py)
+    vehicles = relationship("Vehicle", back_populates="owner", lazy="raise_on_sql")
+    stickers = relationship("Sticker", back_populates="user", lazy="raise_on_sql")
+    payments = relationship("Payment", back_populates="user", lazy="raise_on_sql")
+
+def text_document(*columns):
+    """tsvector 'simple' des colonnes : expression identique dans l'index GIN et dans la
+    requête (search.py), sinon PostgreSQL n'utilise pas l'index."""
+    text = func.coalesce(columns[0], literal(""))
+    for column in columns[1:]:
+        text = text.op("||")(literal(" ")).op("||")(func.coalesce(column, literal("")))
+    return func.to_tsvector(literal("simple"), text)
+
+OWNER_TEXT = text_document(User.first_name, User.last_name)
+Index("ix_users_name_fts", OWNER_TEXT, postgresql_using="gin").ddl_if(dialect="postgresql")
 
 class AdminUser(Base):
     __tablename__ = "admin_users"
@@ -34,10 +48,11 @@ class AdminUser(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
 # --- VÉHICULES & VIGNETTES ---
-class Vehicle(Base):
+class Vehicle(RegionScoped, Base):
     __tablename__ = "vehicles"
     id = Column(String, primary_key=True, index=True)
     registration_number = Column(String, unique=True, index=True)
+    plate_normalized = Column(String, index=True)  # plates.normalize_plate(registration_number)
     user_id = Column(String, ForeignKey("users.id"))
     vehicle_type = Column(String)
     make = Column(String)
@@ -50,29 +65,62 @@ class Vehicle(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     owner = relationship("User", back_populates="vehicles")
-    stickers = relationship("Sticker", back_populates="vehicle")
+    stickers = relationship("Sticker", back_populates="vehicle", lazy="raise_on_sql")
+
+    __table_args__ = (
+        Index("ix_vehicles_region_created_at", "region", "created_at"),
+        # Recherche admin (search.py) : pagination par (created_at, id), filtres type et propriétaire
+        Index("ix_vehicles_created_at_id", "created_at", "id"),
+        Index("ix_vehicles_type_created_at", "vehicle_type", "created_at"),
+        Index("ix_vehicles_user_created_at", "user_id", "created_at"),
+        # Recherche approchée (plates.suggest_plates) : extension pg_trgm, PostgreSQL seulement
+        Index("ix_vehicles_plate_trgm", "plate_normalized", postgresql_using="gin",
+              postgresql_ops={"plate_normalized": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
 
-class Sticker(Base):
+VEHICLE_TEXT = text_document(Vehicle.make, Vehicle.model)
+Index("ix_vehicles_make_model_fts", VEHICLE_TEXT, postgresql_using="gin").ddl_if(dialect="postgresql")
+
+class Sticker(RegionScoped, Base):
     __tablename__ = "stickers"
     id = Column(String, primary_key=True, index=True)
     vehicle_id = Column(String, ForeignKey("vehicles.id"))
     user_id = Column(String, ForeignKey("users.id"))
     registration_number = Column(String)
-    status = Column(String) # valid, expired
+    status = Column(String) # valid, expired, revoked
     start_date = Column(DateTime)
     end_date = Column(DateTime)
     amount_paid = Column(Float)
     payment_method = Column(String)
     transaction_id = Column(String)
-    qr_code = Column(Text)
+    qr_code = deferred(Column(Text)) # PNG base64 (~1 Ko) : chargé seulement à la demande
     loyalty_points = Column(Integer)
+    region = Column(String, nullable=True) # Copie de Vehicle.region (filtrage régional)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     vehicle = relationship("Vehicle", back_populates="stickers")
     user = relationship("User", back_populates="stickers")
 
+    __table_args__ = (
+        Index("ix_stickers_region_end_date", "region", "end_date"),
+        # Recherche admin (search.py) et dernière échéance par véhicule
+        Index("ix_stickers_created_at_id", "created_at", "id"),
+        Index("ix_stickers_region_created_at", "region", "created_at"),
+        Index("ix_stickers_status_created_at", "status", "created_at"),
+        Index("ix_stickers_vehicle_end_date", "vehicle_id", "end_date"),
+        Index("ix_stickers_transaction_id", "transaction_id"),
+    )
+
+# Vignettes non expirées par le job de cycle de vie (lifecycle.py). Littéral et non
+# paramètre lié : SQLite et Postgres n'utilisent un index partiel que si la requête
+# reprend son prédicat tel quel.
+STICKER_ACTIVE = Sticker.status == literal_column("'valid'")
+Index("ix_stickers_active_end_date", Sticker.end_date, postgresql_where=STICKER_ACTIVE, sqlite_where=STICKER_ACTIVE)
+Index("ix_stickers_active_vehicle", Sticker.vehicle_id, Sticker.end_date,
+      postgresql_where=STICKER_ACTIVE, sqlite_where=STICKER_ACTIVE)
+
 # --- FINANCE & LOGS ---
-class Payment(Base):
+class Payment(RegionScoped, Base):
     __tablename__ = "payments"
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id"))
@@ -81,10 +129,66 @@ class Payment(Base):
     payment_method = Column(String)
     status = Column(String)
     transaction_ref = Column(String)
+    region = Column(String, nullable=True) # Copie de Vehicle.region (filtrage régional)
+    reconciliation_run_id = Column(String, nullable=True) # Dernier rapprochement qui l'a retrouvé
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     
     user = relationship("User", back_populates="payments")
 
+    __table_args__ = (
+        Index("ix_payments_region_created_at", "region", "created_at"),
+        # Rapprochement : égalité seule, index hash sous PostgreSQL (B-tree ailleurs)
+        Index("ix_payments_transaction_ref", "transaction_ref", postgresql_using="hash"),
+    )
+
+# Journal append-only des points de fidélité ; User.loyalty_points en est le cache (loyalty.py)
+class LoyaltyEntry(Base):
+    __tablename__ = "loyalty_entries"
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False) # earn, redeem, adjust
+    points = Column(Integer, nullable=False) # Signé : négatif pour un débit
+    sticker_id = Column(String, nullable=True) # Sans FK : vignettes et paiements anciens partent en archive
+    payment_id = Column(String, nullable=True)
+    reason = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_loyalty_entries_user_created_at", "user_id", "created_at"),
+    )
+
+# Rapprochement des relevés opérateurs (reconciliation.py)
+class ReconciliationRun(Base):
+    __tablename__ = "reconciliation_runs"
+    id = Column(String, primary_key=True, index=True)
+    filename = Column(String)
+    payment_method = Column(String, nullable=True) # Opérateur du relevé (filtre des paiements attendus)
+    status = Column(String, default="running") # running, done, failed
+    lines = Column(Integer, default=0)
+    matched = Column(Integer, default=0)
+    issues = Column(Integer, default=0)
+    period_start = Column(DateTime, nullable=True)
+    period_end = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, default=datetime.datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class ReconciliationIssue(Base):
+    __tablename__ = "reconciliation_issues"
+    id = Column(String, primary_key=True, index=True)
+    run_id = Column(String, ForeignKey("reconciliation_runs.id"), nullable=False)
+    kind = Column(String, nullable=False) # unknown_reference, amount_mismatch, date_mismatch, status_mismatch, duplicate, missing_settlement, invalid_line
+    transaction_ref = Column(String, nullable=True)
+    payment_id = Column(String, nullable=True)
+    settlement_amount = Column(Float, nullable=True)
+    payment_amount = Column(Float, nullable=True)
+    settlement_date = Column(DateTime, nullable=True)
+    line = Column(Integer, nullable=True) # Ligne du fichier (en-tête = 1)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_reconciliation_issues_run_kind", "run_id", "kind"),
+    )
+
 class TaxConfig(Base):
     __tablename__ = "tax_configs"
     id = Column(String, primary_key=True, index=True)
@@ -96,16 +200,23 @@ class TaxConfig(Base):
     status = Column(String, default="active")
     effective_date = Column(DateTime, default=datetime.datetime.utcnow)
 
+# Tickets d'abonnement SSE à usage unique (EventSource ne pose pas d'en-tête Authorization)
+class StreamTicket(Base):
+    __tablename__ = "stream_tickets"
+    id = Column(String, primary_key=True) # SHA-256 du ticket : le ticket lui-même n'est jamais stocké
+    admin_id = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String)
     action = Column(String)
     module = Column(String)
-    details = Column(Text)
+    details = deferred(Column(Text))
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
-class Inspection(Base):
+class Inspection(RegionScoped, Base):
     __tablename__ = "inspections"
     id = Column(String, primary_key=True, index=True)
     agent_id = Column(String)
@@ -114,8 +225,25 @@ class Inspection(Base):
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
     notes = Column(Text, nullable=True)
+    geocell = Column(String(12), nullable=True) # geohash calculé à l'insertion (geo.py)
+    region = Column(String, nullable=True) # Région de l'agent au moment du contrôle
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_inspections_agent_timestamp", "agent_id", "timestamp"),
+        Index("ix_inspections_geocell_timestamp", "geocell", "timestamp"),
+        Index("ix_inspections_region_timestamp", "region", "timestamp"),
+    )
+
+# Agrégats incrémentaux (cellule geohash x heure x région) alimentés à l'ingestion
+class InspectionCellStat(RegionScoped, Base):
+    __tablename__ = "inspection_cell_stats"
+    bucket = Column(DateTime, primary_key=True)
+    cell = Column(String(12), primary_key=True)
+    region = Column(String, primary_key=True, default="") # Région de l'agent ; "" : compte national
+    valid_count = Column(Integer, default=0, nullable=False)
+    invalid_count = Column(Integer, default=0, nullable=False)
+
 class NotificationLog(Base):
     __tablename__ = "notification_logs"
     id = Column(String, primary_key=True, index=True)
@@ -125,4 +253,17 @@ class NotificationLog(Base):
     channel = Column(String)
     recipient = Column(String)
     status = Column(String)
-    sent_at = Column(DateTime, default=datetime.datetime.utcnow)
\ No newline at end of file
+    sent_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# --- ARCHIVES (archive.py) ---
+def archive_of(table: Table, *indexes) -> Table:
+    """Table froide de même schéma, sans FK ni index de la table chaude."""
+    columns = [Column(c.name, c.type, primary_key=c.primary_key) for c in table.columns]
+    return Table(
+        f"{table.name}_archive", Base.metadata, *columns, Column("archived_at", DateTime),
+        *(Index(f"ix_{table.name}_archive_{'_'.join(cols)}", *cols) for cols in indexes)
+    )
+
+StickerArchive = archive_of(Sticker.__table__, ("vehicle_id",), ("end_date",))
+PaymentArchive = archive_of(Payment.__table__, ("created_at",), ("region", "created_at"), ("transaction_ref",))
+NotificationLogArchive = archive_of(NotificationLog.__table__, ("sent_at",))
@@ -0,0 +1,73 @@
+"""
+Plaques normalisées et recherche approchée (« vouliez-vous dire »).
+
+Forme normalisée : majuscules, alphanumérique seulement (espaces, tirets,
+points retirés), O→0 et I→1. « ab-12 3o » et « AB1230 » ont la même clé :
+c'est la colonne `vehicles.plate_normalized`, indexée.
+
+Suggestions :
+- PostgreSQL : similarité de trigrammes pg_trgm (`%` + `similarity`),
+  servie par l'index GIN ix_vehicles_plate_trgm.
+- Autres moteurs (SQLite en dev/tests) : candidats dont la moitié gauche ou
+  droite de la clé est identique (une faute de frappe laisse l'autre moitié
+  intacte), classés en Python avec la même similarité de trigrammes.
+
+Recherche nationale, comme /verify : un agent contrôle aussi les véhicules
+immatriculés hors de sa région (skip_region_scope, cf. scoping.py).
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+import models
+
+_NOT_ALNUM = re.compile(r"[^A-Z0-9]")
+_CONFUSABLES = str.maketrans({"O": "0", "I": "1"})
+MIN_SIMILARITY = 0.3  # Seuil par défaut de pg_trgm
+FALLBACK_CANDIDATES = 2000
+
+def normalize_plate(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return _NOT_ALNUM.sub("", value.upper()).translate(_CONFUSABLES)
+
+def trigrams(value: str) -> set:
+    """Trigrammes au sens de pg_trgm : deux espaces devant, un derrière."""
+    padded = f"  {value.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def similarity(a: str, b: str) -> float:
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+
+def suggest_plates(db: Session, query: str, limit: int = 5) -> List[dict]:
+    """Véhicules les plus proches de `query`, du plus au moins similaire."""
+    key = normalize_plate(query)
+    if not key:
+        return []
+    vehicle = models.Vehicle
+    columns = (vehicle.registration_number, vehicle.plate_normalized, vehicle.vehicle_type, vehicle.make, vehicle.model)
+    if db.bind.dialect.name == "postgresql":
+        score = func.similarity(vehicle.plate_normalized, key)
+        rows = db.query(*columns, score.label("similarity")).filter(
+            vehicle.plate_normalized.op("%")(key)
+        ).order_by(score.desc(), vehicle.registration_number).limit(limit).execution_options(
+            skip_region_scope=True
+        ).all()
+        return [{**row._asdict(), "similarity": round(row.similarity, 3)} for row in rows]
+
+    half = len(key) // 2
+    conditions = [vehicle.plate_normalized.op("GLOB")(key[:max(half, 1)] + "*")]  # Préfixe : indexé
+    if len(key) > 1:
+        conditions.append(vehicle.plate_normalized.op("GLOB")("*" + key[half:]))
+    rows = db.query(*columns).filter(or_(*conditions)).limit(FALLBACK_CANDIDATES).execution_options(
+        skip_region_scope=True
+    ).all()
+    scored = [(similarity(key, row.plate_normalized), row) for row in rows]
+    scored = sorted(
+        ((s, row) for s, row in scored if s >= MIN_SIMILARITY),
+        key=lambda item: (-item[0], item[1].registration_number)
+    )[:limit]
+    return [{**row._asdict(), "similarity": round(s, 3)} for s, row in scored]
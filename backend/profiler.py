@@ -0,0 +1,84 @@
+"""
+Profileur statistique à la demande, pour un worker en production.
+
+Un thread démon échantillonne `sys._current_frames()` à intervalle fixe
+pendant N secondes, puis s'arrête. Chaque pile est attribuée à la route dont
+le handler apparaît dans la pile (les threads inactifs sont ignorés) et le
+résultat est agrégé au format « collapsed stacks » (flamegraph.pl, speedscope).
+
+Désactivé, il ne coûte rien : aucun thread, aucun hook. Une seule session
+à la fois par worker, avec un délai minimal entre deux sessions.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "0") == "1"
+PROFILER_COOLDOWN = float(os.environ.get("PROFILER_COOLDOWN", "60"))
+MAX_SECONDS = 30
+
+class ProfilerBusy(Exception):
+    pass
+
+class ProfilerCoolingDown(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    def __init__(self, cooldown: float = PROFILER_COOLDOWN):
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._last_finished = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = Counter()
+
+    def start(self, interval: float, endpoints: dict):
+        """`endpoints` : {code objet du handler: chemin de la route}."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        wait = self._last_finished + self.cooldown - time.monotonic()
+        if wait > 0:
+            self._lock.release()
+            raise ProfilerCoolingDown(wait)
+        self.samples = Counter()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval, endpoints), name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        self._last_finished = time.monotonic()
+        self._lock.release()
+        return self.samples
+
+    def _run(self, interval: float, endpoints: dict):
+        own = threading.get_ident()
+        while not self._stop.wait(interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack, route = [], None
+                while frame is not None:
+                    code = frame.f_code
+                    if route is None and code in endpoints:
+                        route = endpoints[code]
+                    stack.append(_frame_label(code))
+                    frame = frame.f_back
+                if route is not None:
+                    stack.append(route)
+                    self.samples[";".join(reversed(stack))] += 1
+
+def collapsed(samples: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+profiler = SamplingProfiler()
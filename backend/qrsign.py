@@ -0,0 +1,141 @@
+"""
+Charge utile signée des QR de vignette, vérifiable sans base de données.
+
+Format binaire (v1), encodé en base32 sans padding derrière le préfixe
+`NV:` : uniquement des caractères du mode alphanumérique QR, ~70 caractères
+pour une plaque courante, soit un QR version 4-M au lieu de 5-M en mode octet.
+
+    version (1) | sticker uuid (16) | expiration en jours depuis 2020-01-01 (2)
+    | longueur plaque (1) | plaque ASCII | HMAC-SHA256 tronqué (10)
+
+HMAC plutôt qu'Ed25519 : 10 octets de tag contre 64 de signature. La clé
+doit donc rester côté serveur et terminaux d'agents provisionnés.
+La révocation passe par un filtre de Bloom diffusable aux terminaux.
+"""
+import base64
+import hashlib
+import hmac
+import math
+import struct
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+
+PREFIX = "NV:"
+VERSION = 1
+EPOCH = date(2020, 1, 1)
+TAG_SIZE = 10
+MAX_PLATE = 32
+LEGACY_PREFIX = "NIGER-VIGNETTE|"
+
+class InvalidPayload(ValueError):
+    pass
+
+@dataclass(frozen=True)
+class StickerClaim:
+    sticker_id: str
+    registration_number: str
+    valid_until: date
+
+@dataclass(frozen=True)
+class ScanResult:
+    status: str  # valid, expired, revoked, invalid, legacy
+    claim: Optional[StickerClaim] = None
+    reason: Optional[str] = None
+
+def _b32encode(raw: bytes) -> str:
+    return base64.b32encode(raw).decode("ascii").rstrip("=")
+
+def _b32decode(text: str) -> bytes:
+    return base64.b32decode(text + "=" * (-len(text) % 8))
+
+class QRSigner:
+    def __init__(self, key: bytes):
+        # Clé dédiée dérivée : le secret JWT éventuel n'est jamais utilisé tel quel
+        self._key = hmac.new(key, b"niger-vignette-qr", hashlib.sha256).digest()
+
+    def _tag(self, body: bytes) -> bytes:
+        return hmac.new(self._key, body, hashlib.sha256).digest()[:TAG_SIZE]
+
+    def sign(self, sticker_id: str, registration_number: str, valid_until: date) -> str:
+        plate = registration_number.upper().encode("ascii")
+        if len(plate) > MAX_PLATE:
+            raise ValueError("Plaque trop longue pour le QR")
+        days = (valid_until - EPOCH).days
+        body = struct.pack(">B16sHB", VERSION, uuid.UUID(sticker_id).bytes, days, len(plate)) + plate
+        return PREFIX + _b32encode(body + self._tag(body))
+
+    def decode(self, payload: str) -> StickerClaim:
+        """Vérifie la signature et retourne le contenu ; InvalidPayload sinon."""
+        if not payload.startswith(PREFIX):
+            raise InvalidPayload("Préfixe inconnu")
+        try:
+            raw = _b32decode(payload[len(PREFIX):].strip().upper())
+        except ValueError:
+            raise InvalidPayload("Encodage invalide")
+        if len(raw) < 20 + TAG_SIZE:
+            raise InvalidPayload("Charge utile tronquée")
+        body, tag = raw[:-TAG_SIZE], raw[-TAG_SIZE:]
+        if not hmac.compare_digest(tag, self._tag(body)):
+            raise InvalidPayload("Signature invalide")
+        version, sticker_bytes, days, plate_len = struct.unpack_from(">B16sHB", body)
+        if version != VERSION or len(body) != 20 + plate_len:
+            raise InvalidPayload("Version ou longueur invalide")
+        return StickerClaim(
+            sticker_id=str(uuid.UUID(bytes=sticker_bytes)),
+            registration_number=body[20:].decode("ascii"),
+            valid_until=EPOCH + timedelta(days=days),
+        )
+
+    def verify(self, payload: str, today: date, revoked: Optional["BloomFilter"] = None) -> ScanResult:
+        if payload.startswith(LEGACY_PREFIX):
+            # Ancien QR en clair : non signé, à confirmer par /api/verify/{plaque}
+            parts = payload.split("|")
+            plate = parts[1] if len(parts) > 1 else None
+            return ScanResult("legacy", reason=f"QR non signé ({plate})" if plate else "QR non signé")
+        try:
+            claim = self.decode(payload)
+        except InvalidPayload as e:
+            return ScanResult("invalid", reason=str(e))
+        if revoked is not None and claim.sticker_id in revoked:
+            # Faux positifs possibles (taux borné) : un agent peut confirmer en ligne
+            return ScanResult("revoked", claim)
+        return ScanResult("valid" if claim.valid_until >= today else "expired", claim)
+
+    def verify_many(self, payloads: Iterable[str], today: date, revoked: Optional["BloomFilter"] = None) -> List[ScanResult]:
+        return [self.verify(p, today, revoked) for p in payloads]
+
+class BloomFilter:
+    """Filtre de Bloom des vignettes révoquées (double hachage blake2b)."""
+
+    def __init__(self, size_bits: int, hashes: int, bits: Optional[bytearray] = None):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.001) -> "BloomFilter":
+        capacity = max(1, capacity)
+        size_bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hashes = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, hashes)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack(">QQ", digest)
+        return ((h1 + i * h2) % self.size_bits for i in range(self.hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def to_dict(self) -> dict:
+        return {"size_bits": self.size_bits, "hashes": self.hashes, "bits": base64.b64encode(bytes(self.bits)).decode()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BloomFilter":
+        return cls(data["size_bits"], data["hashes"], bytearray(base64.b64decode(data["bits"])))
@@ -0,0 +1,226 @@
+"""
+Limitation de débit et délestage (ASGI pur).
+- Seaux à jetons par règle : clé = compte terrain/admin (JWT valide) ou IP
+  (citoyens et anonymes : l'inscription est libre). Les règles couvrent les
+  routes publiques coûteuses : /verify et /qr/verify (scraping) et les
+  connexions (bcrypt, force brute).
+- Backend en mémoire par défaut (par worker) ; RATE_LIMIT_REDIS_URL active
+  un backend partagé entre workers (redis.asyncio importé à la demande : aucun
+  aller-retour bloquant dans la boucle). En cas de panne Redis, la requête
+  passe (fail-open).
+- Délestage : quand l'attente d'une session DB (database.SessionGate) ou le
+  retard de la boucle d'événements dépasse son seuil, les requêtes anonymes et
+  citoyennes reçoivent un 503 avec Retry-After ; les comptes terrain et admin
+  (agents en tête) passent toujours. Un pool simplement plein n'est pas une
+  surcharge : ses requêtes n'attendent que quelques millisecondes.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL")
+TRUST_PROXY = os.environ.get("TRUST_PROXY", "0") == "1"  # X-Forwarded-For posé par le reverse proxy
+SHED_DB_WAIT = float(os.environ.get("SHED_DB_WAIT", "0.5"))  # secondes d'attente d'une session DB
+SHED_LOOP_LAG = float(os.environ.get("SHED_LOOP_LAG", "0.25"))  # secondes
+PRIORITY_ROLES = ("agent", "supervisor", "admin", "super_admin")
+EXEMPT_PATHS = ("/health", "/metrics")
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    prefix: str
+    per_minute: float
+    burst: int
+    # Limite propre à un compte PRIORITY_ROLES authentifié (agents derrière un même NAT)
+    principal_per_minute: Optional[float] = None
+    principal_burst: Optional[int] = None
+
+RULES = (
+    Rule("verify", "/api/verify/", per_minute=float(os.environ.get("RATE_LIMIT_VERIFY", "120")), burst=30,
+         principal_per_minute=600, principal_burst=120),
+    Rule("qr-verify", "/api/qr/verify", per_minute=float(os.environ.get("RATE_LIMIT_VERIFY", "120")), burst=30,
+         principal_per_minute=600, principal_burst=120),
+    Rule("login", "/api/auth/login", per_minute=float(os.environ.get("RATE_LIMIT_LOGIN", "10")), burst=5),
+    Rule("admin-login", "/api/auth/admin/login", per_minute=float(os.environ.get("RATE_LIMIT_LOGIN", "10")), burst=5),
+    Rule("register", "/api/auth/register", per_minute=10, burst=5),
+)
+
+# ===================== BACKENDS =====================
+
+class MemoryBackend:
+    """Seaux par worker, bornés en nombre (LRU)."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Consomme un jeton ; retourne 0 si autorisé, sinon l'attente en secondes."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+_TAKE_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+local last = tonumber(redis.call('HGET', KEYS[1], 'l') or ARGV[3])
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'l', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+class RedisBackend:
+    """Seaux partagés entre workers ; même interface que MemoryBackend."""
+
+    def __init__(self, url: str):
+        from redis import asyncio as redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            return float(await self._take(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()]))
+        except Exception as e:
+            logger.warning(f"Rate limit Redis indisponible, requête autorisée : {e}")
+            return 0.0
+
+def default_backend():
+    return RedisBackend(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryBackend()
+
+# ===================== DÉLESTAGE =====================
+
+class LoadShedder:
+    """Signaux de surcharge : attente d'une session DB et retard de la boucle."""
+
+    def __init__(self, gate=None, max_db_wait: float = SHED_DB_WAIT, max_lag: float = SHED_LOOP_LAG):
+        self.gate = gate
+        self.max_db_wait = max_db_wait
+        self.max_lag = max_lag
+        self.loop_lag = 0.0
+        self._monitor = None
+        self._shedding = False
+
+    def start(self):
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.get_running_loop().create_task(self._watch_loop())
+
+    async def _watch_loop(self, interval: float = 0.1):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = time.monotonic() - started - interval
+            # Monte immédiatement, redescend progressivement
+            self.loop_lag = lag if lag > self.loop_lag else (self.loop_lag + lag) / 2
+
+    def db_wait(self) -> float:
+        return self.gate.wait_seconds() if self.gate is not None else 0.0
+
+    def overloaded(self) -> bool:
+        db_wait = self.db_wait()
+        overloaded = self.loop_lag > self.max_lag or db_wait > self.max_db_wait
+        if overloaded != self._shedding:
+            self._shedding = overloaded
+            logger.warning(
+                f"Délestage {'activé' if overloaded else 'levé'} : retard boucle {self.loop_lag * 1000:.0f} ms, "
+                f"attente session DB {db_wait * 1000:.0f} ms ({self.gate.waiting if self.gate else 0} en file)"
+            )
+        return overloaded
+
+# ===================== MIDDLEWARE =====================
+
+def _header(scope, name: bytes) -> str:
+    return next((v.decode("latin-1") for k, v in scope["headers"] if k == name), "")
+
+class RateLimitMiddleware:
+    def __init__(self, app, secret_key: str, algorithm: str, backend=None, shedder: Optional[LoadShedder] = None,
+                 rules=RULES, enabled: bool = RATE_LIMIT_ENABLED):
+        self.app = app
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.backend = backend or default_backend()
+        self.shedder = shedder or LoadShedder()
+        self.rules = rules
+        self.enabled = enabled
+
+    def client_ip(self, scope) -> str:
+        if TRUST_PROXY:
+            forwarded = _header(scope, b"x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def principal(self, scope) -> Optional[dict]:
+        """Claims du JWT s'il est valide (signature vérifiée : le rôle donne la priorité)."""
+        auth = _header(scope, b"authorization")
+        if not auth.lower().startswith("bearer "):
+            return None
+        from jose import jwt, JWTError
+        try:
+            return jwt.decode(auth[7:], self.secret_key, algorithms=[self.algorithm])
+        except JWTError:
+            return None
+
+    async def reject(self, send, status: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if not self.enabled or scope["type"] != "http" or scope["method"] == "OPTIONS" or path.startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+        self.shedder.start()
+        overloaded = self.shedder.overloaded()
+        rule = next((r for r in self.rules if path.startswith(r.prefix)), None)
+        if rule is None and not overloaded:
+            await self.app(scope, receive, send)
+            return
+
+        # JWT décodé seulement si une règle ou le délestage s'applique
+        claims = self.principal(scope)
+        if overloaded and (claims is None or claims.get("role") not in PRIORITY_ROLES):
+            await self.reject(send, 503, "Service surchargé, réessayez dans un instant", 1)
+            return
+
+        if rule is not None:
+            # Seau par principal réservé aux comptes terrain/admin : un compte citoyen
+            # (inscription libre) ne doit pas multiplier le budget d'une IP
+            if claims is not None and claims.get("role") in PRIORITY_ROLES and rule.principal_per_minute:
+                key, per_minute, burst = f"{rule.name}:p:{claims.get('sub')}", rule.principal_per_minute, rule.principal_burst
+            else:
+                key, per_minute, burst = f"{rule.name}:ip:{self.client_ip(scope)}", rule.per_minute, rule.burst
+            wait = await self.backend.take(key, per_minute / 60, burst)
+            if wait > 0:
+                await self.reject(send, 429, "Trop de requêtes", wait)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,209 @@
+"""
+Rapprochement des paiements avec les relevés des opérateurs (mobile money...).
+
+Le relevé CSV est lu en flux, par paquets de --chunk lignes : un paquet =
+une requête `transaction_ref IN (...)` (index ix_payments_transaction_ref),
+les écarts écrits dans `reconciliation_issues`, puis commit. La mémoire ne
+dépend que de la taille du paquet, jamais de celle du fichier. Les références
+absentes de la table chaude sont cherchées dans `payments_archive` (index
+sur transaction_ref) : un paiement archivé (archive.py) reste connu.
+
+Écarts signalés :
+- unknown_reference : ligne du relevé sans paiement correspondant
+- amount_mismatch / date_mismatch : montant ou date hors tolérance
+- status_mismatch : succès côté opérateur, paiement non « completed » (ou l'inverse)
+- duplicate : référence déjà rapprochée par ce relevé
+- missing_settlement : paiement « completed » de la période absent du relevé
+- invalid_line : ligne illisible (montant, date ou référence)
+
+Usage (depuis backend/) :
+  python reconciliation.py releve_orange.csv --payment-method mobile_money
+"""
+import argparse
+import csv
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import IO, Iterator, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from bulk import bulk_insert
+from database import engine
+import models
+
+CHUNK_SIZE = 5000
+AMOUNT_TOLERANCE = float(os.environ.get("RECONCILE_AMOUNT_TOLERANCE", "0.01"))
+DATE_WINDOW = timedelta(hours=float(os.environ.get("RECONCILE_DATE_WINDOW_HOURS", "48")))
+SUCCESS_STATUSES = {"success", "successful", "succes", "succès", "completed", "ok", "paid"}
+
+# En-têtes reconnus, par champ (les exports diffèrent d'un opérateur à l'autre)
+COLUMNS = {
+    "reference": ("transaction_ref", "reference", "ref", "transaction_id", "external_id"),
+    "amount": ("amount", "montant"),
+    "date": ("date", "created_at", "timestamp", "transaction_date"),
+    "status": ("status", "statut"),
+}
+
+class SettlementFormatError(ValueError):
+    pass
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def _resolve_columns(header) -> dict:
+    normalized = {name.strip().lower(): name for name in header or []}
+    resolved = {}
+    for field, aliases in COLUMNS.items():
+        resolved[field] = next((normalized[a] for a in aliases if a in normalized), None)
+    missing = [f for f in ("reference", "amount", "date") if resolved[f] is None]
+    if missing:
+        raise SettlementFormatError(f"Colonnes manquantes : {', '.join(missing)}")
+    return resolved
+
+def read_settlement(stream: IO[str]) -> Iterator[tuple]:
+    """(numéro de ligne, référence, montant, date, succès) ; valeurs None si illisibles."""
+    reader = csv.DictReader(stream)
+    columns = _resolve_columns(reader.fieldnames)
+    for row in reader:
+        line = reader.line_num
+        reference = (row.get(columns["reference"]) or "").strip() or None
+        try:
+            amount = float((row.get(columns["amount"]) or "").replace(" ", "").replace(",", "."))
+            date = _naive_utc(datetime.fromisoformat((row.get(columns["date"]) or "").strip()))
+        except ValueError:
+            amount = date = None
+        status = (row.get(columns["status"]) or "success").strip().lower() if columns["status"] else "success"
+        yield line, reference, amount, date, status in SUCCESS_STATUSES
+
+def _issue(run_id: str, kind: str, line=None, reference=None, payment=None, amount=None, date=None) -> dict:
+    return {
+        "id": str(uuid.uuid4()), "run_id": run_id, "kind": kind, "transaction_ref": reference,
+        "payment_id": payment.id if payment is not None else None,
+        "settlement_amount": amount, "payment_amount": payment.amount if payment is not None else None,
+        "settlement_date": date, "line": line, "created_at": datetime.now(timezone.utc),
+    }
+
+def _payments_by_ref(table, refs: set):
+    return select(
+        table.c.id, table.c.transaction_ref, table.c.amount, table.c.created_at, table.c.status,
+        table.c.reconciliation_run_id
+    ).where(table.c.transaction_ref.in_(refs))
+
+def _match_chunk(db: Session, run: models.ReconciliationRun, lines: list) -> tuple:
+    payment = models.Payment
+    refs = {reference for _, reference, _, _, _ in lines if reference}
+    found = {}
+    for table in (payment.__table__, models.PaymentArchive):
+        for p in db.execute(_payments_by_ref(table, refs)):
+            # Référence partagée (tentative échouée + paiement) : le paiement abouti l'emporte
+            if p.transaction_ref not in found or p.status == "completed":
+                found[p.transaction_ref] = p
+        # Archive lue seulement pour les références sans paiement abouti dans la table chaude
+        refs = {ref for ref in refs if ref not in found or found[ref].status != "completed"}
+        if not refs:
+            break
+
+    issues, matched_ids = [], set()
+    for line, reference, amount, date, success in lines:
+        if reference is None or amount is None or date is None:
+            issues.append(_issue(run.id, "invalid_line", line, reference))
+            continue
+        run.period_start = min(run.period_start or date, date)
+        run.period_end = max(run.period_end or date, date)
+        p = found.get(reference)
+        if p is None:
+            issues.append(_issue(run.id, "unknown_reference", line, reference, amount=amount, date=date))
+            continue
+        if p.reconciliation_run_id == run.id or p.id in matched_ids:
+            issues.append(_issue(run.id, "duplicate", line, reference, p, amount, date))
+            continue
+        matched_ids.add(p.id)
+        if abs((p.amount or 0) - amount) > AMOUNT_TOLERANCE:
+            issues.append(_issue(run.id, "amount_mismatch", line, reference, p, amount, date))
+        if p.created_at is None or abs(_naive_utc(p.created_at) - date) > DATE_WINDOW:
+            issues.append(_issue(run.id, "date_mismatch", line, reference, p, amount, date))
+        if success != (p.status == "completed"):
+            issues.append(_issue(run.id, "status_mismatch", line, reference, p, amount, date))
+
+    if matched_ids:
+        for table in (payment.__table__, models.PaymentArchive):
+            db.execute(update(table).where(table.c.id.in_(matched_ids)).values(reconciliation_run_id=run.id))
+    bulk_insert(db, models.ReconciliationIssue.__table__, issues)
+    return len(matched_ids), len(issues)
+
+def _flag_missing(db: Session, run: models.ReconciliationRun, chunk: int) -> int:
+    """Paiements aboutis de la période du relevé qu'aucune ligne n'a retrouvés."""
+    if run.period_start is None:
+        return 0
+    total = 0
+    for table in (models.Payment.__table__, models.PaymentArchive):
+        query = select(table.c.id, table.c.transaction_ref, table.c.amount).where(
+            table.c.status == "completed", table.c.created_at.between(run.period_start, run.period_end),
+            or_(table.c.reconciliation_run_id.is_(None), table.c.reconciliation_run_id != run.id)
+        )
+        if run.payment_method:
+            query = query.where(table.c.payment_method == run.payment_method)
+        last_id = ""
+        while True:
+            rows = db.execute(query.where(table.c.id > last_id).order_by(table.c.id).limit(chunk)).all()
+            if not rows:
+                break
+            bulk_insert(db, models.ReconciliationIssue.__table__, [
+                _issue(run.id, "missing_settlement", reference=r.transaction_ref, payment=r) for r in rows
+            ])
+            db.commit()
+            total, last_id = total + len(rows), rows[-1].id
+    return total
+
+def reconcile(db: Session, stream: IO[str], filename: str, payment_method: Optional[str] = None,
+              chunk: int = CHUNK_SIZE) -> models.ReconciliationRun:
+    run = models.ReconciliationRun(
+        id=str(uuid.uuid4()), filename=filename, payment_method=payment_method, status="running",
+        lines=0, matched=0, issues=0, started_at=datetime.now(timezone.utc)
+    )
+    db.add(run)
+    db.commit()
+    try:
+        lines = read_settlement(stream)
+        while True:
+            batch = list(islice(lines, chunk))
+            if not batch:
+                break
+            matched, issues = _match_chunk(db, run, batch)
+            run.lines += len(batch)
+            run.matched += matched
+            run.issues += issues
+            db.commit()
+        run.issues += _flag_missing(db, run, chunk)
+        run.status = "done"
+    except Exception:
+        db.rollback()
+        run.status = "failed"
+        raise
+    finally:
+        run.finished_at = datetime.now(timezone.utc)
+        db.commit()
+    return run
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapprochement d'un relevé opérateur avec les paiements")
+    parser.add_argument("path", help="Relevé CSV (en-têtes : reference, amount, date[, status])")
+    parser.add_argument("--payment-method", help="Moyen de paiement couvert par le relevé")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="Lignes par transaction")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    try:
+        with open(args.path, newline="", encoding="utf-8-sig") as stream, Session(engine) as db:
+            run = reconcile(db, stream, os.path.basename(args.path), args.payment_method, args.chunk)
+            print(f"✅  {run.lines} lignes, {run.matched} rapprochées, {run.issues} écarts "
+                  f"en {time.perf_counter() - started:.1f} s (run {run.id})")
+    except Exception as e:
+        print(f"❌ ERREUR : {e}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
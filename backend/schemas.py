@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import datetime, date
 
 class ORMBaseModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -40,6 +40,7 @@ class UserResponse(UserBase):
     id: str
     created_at: datetime
     loyalty_points: Optional[int] = 0
+    region: Optional[str] = None  # Admins régionaux (superviseurs, agents)
 
 # --- TOKENS ---
 class Token(BaseModel):
@@ -69,6 +70,12 @@ class VehicleResponse(VehicleBase):
     user_id: str
     created_at: datetime
 
+class AdminVehicleResponse(VehicleResponse):
+    owner_name: Optional[str] = None
+    owner_phone: Optional[str] = None
+    sticker_status: Optional[str] = None
+    valid_until: Optional[datetime] = None
+
 # --- STICKERS ---
 class StickerBase(ORMBaseModel):
     validity_years: int = 1
@@ -91,6 +98,20 @@ class StickerResponse(ORMBaseModel):
     qr_code: str
     created_at: datetime
 
+class AdminStickerResponse(ORMBaseModel):
+    id: str
+    vehicle_id: str
+    user_id: str
+    registration_number: str
+    status: str
+    start_date: datetime
+    end_date: datetime
+    amount_paid: float
+    payment_method: str
+    transaction_id: str
+    region: Optional[str] = None
+    created_at: datetime
+
 # --- OTHERS ---
 class VerificationResult(BaseModel):
     registration_number: str
@@ -103,14 +124,143 @@ class VerificationResult(BaseModel):
     make: str
     model: str
 
+class LoyaltyEntryResponse(ORMBaseModel):
+    id: str
+    kind: str  # earn, redeem, adjust
+    points: int
+    sticker_id: Optional[str] = None
+    payment_id: Optional[str] = None
+    reason: Optional[str] = None
+    created_at: datetime
+
+class LoyaltyBalance(BaseModel):
+    points: int
+    entries: List[LoyaltyEntryResponse]
+
+class LoyaltyAdjustment(BaseModel):
+    user_id: str
+    points: int
+    reason: str
+
+class StreamTicketResponse(BaseModel):
+    ticket: str
+    expires_in: int
+
+class StickerRevocation(BaseModel):
+    reason: str = Field(..., min_length=1, max_length=500)
+
+class PlateSuggestion(BaseModel):
+    registration_number: str
+    plate_normalized: str
+    vehicle_type: Optional[str] = None
+    make: Optional[str] = None
+    model: Optional[str] = None
+    similarity: float
+
 class DashboardStats(BaseModel):
     total_vehicles: int
     active_stickers: int
     total_revenue: float
     daily_revenue: float
+    region: Optional[str] = None
     
 class TaxConfigResponse(ORMBaseModel):
     id: str
     vehicle_category: str
     base_amount: float
-    status: str
\ No newline at end of file
+    status: str
+
+# --- INSPECTIONS ---
+class InspectionCreate(BaseModel):
+    vehicle_registration: str = Field(min_length=1, max_length=32)
+    status_at_control: Optional[str] = None  # Indicatif : le serveur recalcule le statut
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+    notes: Optional[str] = Field(default=None, max_length=1000)
+    timestamp: Optional[datetime] = None  # Heure du contrôle (saisie hors ligne)
+
+class InspectionBatch(BaseModel):
+    inspections: List[InspectionCreate] = Field(min_length=1, max_length=1000)
+
+class InspectionBatchResult(BaseModel):
+    accepted: int
+
+class InspectionResponse(ORMBaseModel):
+    id: str
+    agent_id: str
+    vehicle_registration: str
+    status_at_control: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    notes: Optional[str] = None
+    timestamp: datetime
+
+class ReconciliationRunResponse(ORMBaseModel):
+    id: str
+    filename: Optional[str] = None
+    payment_method: Optional[str] = None
+    status: str
+    lines: int
+    matched: int
+    issues: int
+    period_start: Optional[datetime] = None
+    period_end: Optional[datetime] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+class ReconciliationIssueResponse(ORMBaseModel):
+    id: str
+    kind: str
+    transaction_ref: Optional[str] = None
+    payment_id: Optional[str] = None
+    settlement_amount: Optional[float] = None
+    payment_amount: Optional[float] = None
+    settlement_date: Optional[datetime] = None
+    line: Optional[int] = None
+
+class PaymentMethodTotal(BaseModel):
+    count: int
+    total: float
+
+class ReportTransaction(BaseModel):
+    id: str
+    transaction_ref: Optional[str] = None
+    amount: float
+    payment_method: Optional[str] = None
+    status: Optional[str] = None
+    region: Optional[str] = None
+    created_at: datetime
+
+class PaymentReport(BaseModel):
+    region: str
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    total_amount: float
+    total_transactions: int
+    by_payment_method: Dict[str, PaymentMethodTotal]
+    transactions: List[ReportTransaction]
+    includes_archive: bool
+
+class HeatmapCell(BaseModel):
+    cell: str
+    latitude: float
+    longitude: float
+    valid: int
+    invalid: int
+
+# --- QR SIGNÉS ---
+class QRVerifyBatch(BaseModel):
+    payloads: List[str] = Field(min_length=1, max_length=500)
+
+class QRScanResult(BaseModel):
+    status: str  # valid, expired, revoked, invalid, legacy
+    sticker_id: Optional[str] = None
+    registration_number: Optional[str] = None
+    valid_until: Optional[date] = None
+    reason: Optional[str] = None
+
+class RevocationFilter(BaseModel):
+    size_bits: int
+    hashes: int
+    bits: str  # base64
+    count: int
@@ -0,0 +1,47 @@
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import Column, String, event
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+from database import SessionLocal
+
+# Rôles dont la visibilité est bornée à la région portée par le JWT / AdminUser
+SCOPED_ROLES = ("supervisor", "agent")
+
+class RegionScoped:
+    """Mixin des modèles ayant une colonne `region` filtrée par principal.
+
+    La colonne est redéclarée par chaque modèle ; elle existe ici pour que le
+    critère `cls.region == ...` puisse être analysé sur le mixin.
+    """
+    region = Column(String, nullable=True)
+
+def scope_session(db: Session, principal, requested_region: Optional[str] = None) -> Optional[str]:
+    """Fixe la région de la session : celle du principal s'il est régional,
+    sinon la région demandée explicitement (filtre admin national). Retourne
+    la région effective (None = national). Un compte régional sans région
+    n'a aucun accès (403), jamais l'accès national."""
+    region = db.info.get("region_scope")
+    if region is None and getattr(principal, "role", None) in SCOPED_ROLES:
+        region = getattr(principal, "region", None)
+        if not region: raise HTTPException(status_code=403, detail="Compte régional sans région")
+    if region is None:
+        region = requested_region
+    if region:
+        db.info["region_scope"] = region
+    return region
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _apply_region_scope(state: ORMExecuteState):
+    region = state.session.info.get("region_scope")
+    if (
+        region is None
+        or not state.is_select
+        or state.is_column_load
+        or state.is_relationship_load
+        or state.execution_options.get("skip_region_scope", False)
+    ):
+        return
+    # Le critère s'applique aussi aux jointures, sous-requêtes et relations chargées
+    state.statement = state.statement.options(
+        with_loader_criteria(RegionScoped, lambda cls: cls.region == region, include_aliases=True)
+    )
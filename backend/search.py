@@ -0,0 +1,111 @@
+"""
+Recherche admin des véhicules et vignettes (/api/admin/vehicles, /api/admin/stickers).
+
+- Pagination par curseur (keyset) sur (created_at, id) décroissants : chaque
+  page est une descente d'index, quelle que soit sa profondeur (OFFSET relit
+  et jette toutes les lignes précédentes). Le curseur suivant est renvoyé
+  dans l'en-tête X-Next-Cursor, le corps reste une liste.
+- Total approximatif (X-Total-Count) : estimation du planificateur
+  PostgreSQL (EXPLAIN), recomptée exactement si elle est petite ; ailleurs,
+  comptage borné à COUNT_EXACT_LIMIT. X-Total-Count-Approximate l'indique.
+- Texte libre : plaque contenue dans `plate_normalized` (index trigramme
+  sous PostgreSQL), ou marque/modèle/nom du propriétaire par recherche
+  plein texte (index GIN sur tsvector, models.VEHICLE_TEXT / OWNER_TEXT).
+  Hors PostgreSQL : LIKE sur les mêmes colonnes.
+"""
+import base64
+import json
+import re
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, literal_column, or_, select, tuple_
+from sqlalchemy.orm import Query, Session
+
+import models
+from plates import normalize_plate
+
+COUNT_EXACT_LIMIT = 10000
+MIN_PLATE_CHARS = 3  # En dessous, un trigramme ne filtre rien
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+
+def keyset_page(query: Query, model, cursor: Optional[str], limit: int) -> Query:
+    """Page suivant `cursor` ; une ligne de plus que `limit` indique une page suivante."""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+def split_page(rows: list, limit: int, headers) -> list:
+    """Retire la ligne sentinelle et pose X-Next-Cursor (clé en fin de ligne)."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1][-2], rows[-1][-1])
+    return rows
+
+def _words(term: str) -> list:
+    return re.findall(r"\w+", term.lower())
+
+def _tsquery(term: str) -> str:
+    # Préfixes : « toy cor » trouve Toyota Corolla pendant la saisie
+    return " & ".join(f"{word}:*" for word in _words(term))
+
+def _text_match(db: Session, document, columns, term: str):
+    if db.get_bind().dialect.name == "postgresql":
+        return document.op("@@")(func.to_tsquery(literal_column("'simple'"), _tsquery(term)))
+    return and_(*(
+        or_(*(func.lower(column).like(f"%{word}%") for column in columns)) for word in _words(term)
+    ))
+
+def vehicle_search(db: Session, term: str):
+    """Critère sur Vehicle : plaque, marque/modèle ou nom du propriétaire."""
+    criteria = []
+    plate = normalize_plate(term)
+    if len(plate) >= MIN_PLATE_CHARS:
+        criteria.append(models.Vehicle.plate_normalized.contains(plate, autoescape=True))
+    if _words(term):
+        criteria.append(_text_match(db, models.VEHICLE_TEXT, (models.Vehicle.make, models.Vehicle.model), term))
+        owners = select(models.User.id).where(
+            _text_match(db, models.OWNER_TEXT, (models.User.first_name, models.User.last_name), term)
+        )
+        criteria.append(models.Vehicle.user_id.in_(owners))
+    return or_(*criteria) if criteria else literal_column("1") == 1
+
+def sticker_search(term: str):
+    """Critère sur Sticker : numéro de transaction exact ou plaque du véhicule."""
+    criteria = [models.Sticker.transaction_id == term.strip().upper()]
+    plate = normalize_plate(term)
+    if len(plate) >= MIN_PLATE_CHARS:
+        vehicles = select(models.Vehicle.id).where(models.Vehicle.plate_normalized.contains(plate, autoescape=True))
+        criteria.append(models.Sticker.vehicle_id.in_(vehicles))
+    return or_(*criteria)
+
+def _planner_estimate(db: Session, statement) -> int:
+    compiled = statement.compile(dialect=db.get_bind().dialect)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def approximate_count(db: Session, query: Query) -> Tuple[int, bool]:
+    """(total, approximatif). `query` : requête filtrée sur la seule clé, sans tri ni pagination."""
+    statement = query.statement
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = _planner_estimate(db, statement)
+        if estimate > COUNT_EXACT_LIMIT:
+            return estimate, True
+    capped = db.execute(
+        select(func.count()).select_from(statement.limit(COUNT_EXACT_LIMIT + 1).subquery())
+    ).scalar()
+    return min(capped, COUNT_EXACT_LIMIT), capped > COUNT_EXACT_LIMIT
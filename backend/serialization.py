@@ -0,0 +1,106 @@
+"""
+Sérialisation rapide des listes (opt-in : FAST_SERIALIZATION=1).
+
+Les routes de liste sélectionnent seulement les colonnes du schéma de réponse
+(`RowSerializer.columns`) et obtiennent des dicts, pas des entités ORM : plus
+de validation `from_attributes` objet par objet ni d'identity map.
+
+- Mode par défaut : les dicts repassent par `response_model` (validation
+  pydantic, sortie identique à l'historique).
+- FAST_SERIALIZATION=1 : les dicts sont encodés directement par orjson
+  (json en repli s'il n'est pas installé), sans revalidation.
+- `?fields=a,b` (sparse fieldset) : seules ces colonnes sont lues et
+  renvoyées ; la réponse partielle contourne toujours `response_model`.
+"""
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Iterable, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Dépendance optionnelle
+    orjson = None
+
+FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "0") == "1"
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # OPT_UTC_Z : même rendu que pydantic pour les datetimes UTC
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class RowSerializer:
+    """Projection des colonnes d'un schéma de réponse sur un modèle, construite une fois.
+
+    `extra` remplace ou complète les colonnes (jointures, sous-requêtes) ;
+    les champs sans colonne prennent la valeur par défaut du schéma.
+    """
+
+    def __init__(self, schema, model, **extra):
+        self.fields = list(schema.model_fields)
+        self.names, self.columns, self.constants = [], [], {}
+        self.partial = False
+        self._subsets = {}
+        for name, field in schema.model_fields.items():
+            column = extra.pop(name, None)
+            if column is None:
+                column = getattr(model, name, None)
+            if column is None:
+                self.constants[name] = field.get_default()
+            else:
+                self.names.append(name)
+                self.columns.append(column)
+        # Colonnes supplémentaires hors schéma (calculs côté route)
+        for name, column in extra.items():
+            self.names.append(name)
+            self.columns.append(column)
+
+    def only(self, fields: Optional[str]) -> "RowSerializer":
+        """Sous-ensemble demandé par `?fields=` (400 si un champ est inconnu)."""
+        wanted = frozenset(f.strip() for f in (fields or "").split(",") if f.strip())
+        if not wanted:
+            return self
+        unknown = wanted - set(self.fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Champs inconnus : {', '.join(sorted(unknown))}")
+        subset = self._subsets.get(wanted)
+        if subset is None:
+            subset = RowSerializer.__new__(RowSerializer)
+            subset.fields = [f for f in self.fields if f in wanted]
+            subset.names = [n for n in self.names if n in wanted]
+            subset.columns = [c for n, c in zip(self.names, self.columns) if n in wanted]
+            subset.constants = {k: v for k, v in self.constants.items() if k in wanted}
+            subset.partial = True
+            subset._subsets = {}
+            self._subsets[wanted] = subset
+        return subset
+
+    def dicts(self, rows: Iterable) -> List[dict]:
+        names, constants = self.names, self.constants
+        if constants:
+            return [{**dict(zip(names, row)), **constants} for row in rows]
+        return [dict(zip(names, row)) for row in rows]
+
+def respond(items: List[dict], partial: bool = False, headers=None):
+    """Retour d'une route de liste : encodage direct en mode rapide ou pour une
+    réponse partielle (incomplète pour `response_model`), response_model sinon.
+
+    `headers` : en-têtes posés sur la `Response` injectée (ETag...), que
+    FastAPI ne fusionne pas quand la route renvoie elle-même une réponse.
+    """
+    if FAST_SERIALIZATION or partial:
+        return FastJSONResponse(items, headers=dict(headers) if headers else None)
+    return items
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Request, Response, UploadFile, File, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, or_
+from sqlalchemy import and_, func, desc, or_, select, union_all
 from typing import List, Optional
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 import os
 import logging
 import uuid
@@ -12,52 +14,123 @@ import io
 import base64
 import random
 import string
-import resend
-from passlib.context import CryptContext
-from jose import jwt, JWTError
-import qrcode
+import hashlib
+import secrets
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import anyio
 from dotenv import load_dotenv
 
 # --- IMPORTS LOCAUX ---
-from database import engine, get_db
+from database import engine, get_db, check_ready, SessionLocal, POOL_CAPACITY, session_gate
+from cache import TTLCache
+from scoping import scope_session, SCOPED_ROLES
+import loading  # noqa: F401 (enregistre le mode STRICT_LOADING)
+from instrumentation import InstrumentationMiddleware, instrument_engine, render_metrics
+from bulk import bulk_insert
+from geo import geocell_for, geohash_decode, record_cell_stats, GEOCELL_PRECISION
+from serialization import RowSerializer, respond
+from httpcache import bump_data_version, not_modified
+from compression import CompressionMiddleware
+from ratelimit import RateLimitMiddleware, LoadShedder
+from qrsign import QRSigner, BloomFilter
+from plates import normalize_plate, suggest_plates
+from search import vehicle_search, sticker_search, keyset_page, split_page, approximate_count
+import loyalty
+from reconciliation import reconcile, SettlementFormatError
+from archive import archive_watermark
+import events
+from profiler import profiler, collapsed, ProfilerBusy, ProfilerCoolingDown, PROFILER_ENABLED, MAX_SECONDS
 import models
 import schemas
 
 load_dotenv()
 
 # Config
-resend.api_key = os.environ.get('RESEND_API_KEY')
+# NB : qrcode/PIL, resend, passlib et jose sont importés à la première utilisation
+# pour alléger le démarrage des workers (cf. `python -m bench.startup --importtime`).
+RESEND_API_KEY = os.environ.get('RESEND_API_KEY')
 SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
 SECRET_KEY = os.environ.get('JWT_SECRET', 'secret_key_provisoire_niger_2026')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+VERIFY_CACHE_TTL = float(os.environ.get('VERIFY_CACHE_TTL', '60'))
+TAX_CONFIG_MAX_AGE = int(os.environ.get('TAX_CONFIG_MAX_AGE', '300'))
+INSPECTION_ROLES = ["super_admin", "admin", "supervisor", "agent"]
+REVOCATION_TTL = float(os.environ.get('REVOCATION_TTL', '300'))
+STREAM_TICKET_TTL = 30  # Secondes entre l'émission du ticket SSE et l'ouverture du flux
+# Threads des handlers synchrones : au-delà du pool DB, ils attendraient une connexion
+THREADPOOL_SIZE = int(os.environ.get('THREADPOOL_SIZE', '0')) or POOL_CAPACITY
 security = HTTPBearer()
-
-# Init DB
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Niger Digital Vehicle Sticker (Windows/PostgreSQL)")
+# Résultats de /verify par plaque, réutilisés par l'ingestion des inspections
+verification_cache = TTLCache(maxsize=50000, ttl=VERIFY_CACHE_TTL)
+qr_signer = QRSigner(os.environ.get('QR_SIGNING_KEY', SECRET_KEY).encode())
+revocation_cache = TTLCache(maxsize=1, ttl=REVOCATION_TTL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    events.broadcaster.close_on_exit()
+    yield
+    events.broadcaster.close()
+    engine.dispose()
+
+app = FastAPI(title="Niger Digital Vehicle Sticker (Windows/PostgreSQL)", lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+instrument_engine(engine)
+
+# Projections des routes de liste (cf. serialization.py)
+# Dernière échéance du véhicule : sous-requête corrélée (ix_stickers_vehicle_end_date),
+# évaluée pour les seules lignes de la page et non agrégée sur toute la table.
+# Une vignette révoquée ne donne aucune validité, quelle que soit son échéance.
+STICKER_NOT_REVOKED = models.Sticker.status != "revoked"
+LAST_STICKER_END = select(func.max(models.Sticker.end_date)).where(
+    models.Sticker.vehicle_id == models.Vehicle.id, STICKER_NOT_REVOKED
+).correlate(models.Vehicle).scalar_subquery()
+HAS_REVOKED_STICKER = select(models.Sticker.id).where(
+    models.Sticker.vehicle_id == models.Vehicle.id, models.Sticker.status == "revoked"
+).correlate(models.Vehicle).exists()
+VEHICLE_ROWS = RowSerializer(schemas.VehicleResponse, models.Vehicle)
+STICKER_ROWS = RowSerializer(schemas.StickerResponse, models.Sticker)
+ADMIN_STICKER_ROWS = RowSerializer(schemas.AdminStickerResponse, models.Sticker)
+ADMIN_VEHICLE_ROWS = RowSerializer(
+    schemas.AdminVehicleResponse, models.Vehicle, owner_phone=models.User.phone,
+    valid_until=LAST_STICKER_END.label("valid_until"), revoked=HAS_REVOKED_STICKER.label("revoked"),
+    first_name=models.User.first_name, last_name=models.User.last_name,
+)
 
 # ===================== HELPERS =====================
 
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache(maxsize=None)
+def get_mailer():
+    import resend
+    resend.api_key = RESEND_API_KEY
+    return resend
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return get_pwd_context().verify(plain, hashed)
 
 def create_token(data: dict) -> str:
+    from jose import jwt
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    from jose import jwt, JWTError
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
@@ -68,13 +141,17 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         if user: return user
         
         admin = db.query(models.AdminUser).filter(models.AdminUser.id == user_id).first()
-        if admin: return admin
+        if admin:
+            # Superviseurs et agents ne lisent que leur région (critère SQL, cf. scoping.py)
+            scope_session(db, admin)
+            return admin
             
         raise HTTPException(status_code=401, detail="Utilisateur introuvable")
     except JWTError:
         raise HTTPException(status_code=401, detail="Token invalide")
 
 def generate_qr_code(data: str) -> str:
+    import qrcode
     qr = qrcode.QRCode(version=1, box_size=10, border=5)
     qr.add_data(data)
     qr.make(fit=True)
@@ -86,6 +163,15 @@ def generate_qr_code(data: str) -> str:
 def generate_transaction_id() -> str:
     return f"TXN-{''.join(random.choices(string.ascii_uppercase + string.digits, k=12))}"
 
+def as_utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+def sticker_status(end_date: Optional[datetime], at: datetime, revoked: bool = False) -> str:
+    """`end_date` : dernière échéance non révoquée ; `revoked` : une vignette révoquée existe."""
+    if end_date is not None and as_utc(end_date) > at: return "valid"
+    if revoked: return "revoked"
+    return "inactive" if end_date is None else "invalid"
+
 def log_audit(db: Session, user_id: str, action: str, module: str, details: dict):
     try:
         new_log = models.AuditLog(
@@ -137,42 +223,52 @@ def admin_login(data: schemas.AdminLogin, db: Session = Depends(get_db)):
     # Mapping "phone" -> "username" pour satisfaire le frontend
     user_response = {
         "id": user.id, "phone": user.username, "username": user.username, "status": "active",
-        "first_name": user.first_name, "last_name": user.last_name, "role": user.role,
+        "first_name": user.first_name, "last_name": user.last_name, "role": user.role, "region": user.region,
         "created_at": user.created_at, "email": None, "national_id": None, "language": "fr"
     }
     return {"access_token": token, "token_type": "bearer", "user": user_response}
 
 @api_router.get("/auth/me", response_model=schemas.UserResponse)
-def get_me(current_user = Depends(get_current_user)):
+def get_me(request: Request, response: Response, current_user = Depends(get_current_user)):
     if hasattr(current_user, "username"):
         return {
             "id": current_user.id, "phone": current_user.username, "username": current_user.username,
             "status": "active", "first_name": current_user.first_name, "last_name": current_user.last_name,
-            "role": current_user.role, "created_at": current_user.created_at, "email": None,
-            "national_id": None, "language": "fr"
+            "role": current_user.role, "region": current_user.region, "created_at": current_user.created_at,
+            "email": None, "national_id": None, "language": "fr"
         }
-    return current_user
+    return not_modified(request, response, current_user) or current_user
 
 # ===================== VEHICULES & VIGNETTES =====================
 
 @api_router.post("/vehicles", response_model=schemas.VehicleResponse)
 def create_vehicle(data: schemas.VehicleCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    existing = db.query(models.Vehicle).filter(models.Vehicle.registration_number == data.registration_number.upper()).first()
+    existing = db.query(models.Vehicle.id).filter(models.Vehicle.registration_number == data.registration_number.upper()).first()
     if existing: raise HTTPException(status_code=400, detail="Véhicule déjà enregistré")
     
     new_vehicle = models.Vehicle(
         id=str(uuid.uuid4()), user_id=current_user.id, registration_number=data.registration_number.upper(),
-        **data.model_dump(exclude={'registration_number'}), created_at=datetime.now(timezone.utc)
+        plate_normalized=normalize_plate(data.registration_number), **data.model_dump(exclude={'registration_number'}), created_at=datetime.now(timezone.utc)
     )
     db.add(new_vehicle)
+    bump_data_version(current_user)
+    events.publish_after_commit(db, new_vehicle.region, total_vehicles=1)
     db.commit()
     db.refresh(new_vehicle)
+    verification_cache.pop(new_vehicle.registration_number)
     log_audit(db, current_user.id, "CREATE", "vehicles", {"vehicle_id": new_vehicle.id})
     return new_vehicle
 
 @api_router.get("/vehicles", response_model=List[schemas.VehicleResponse])
-def get_vehicles(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    return db.query(models.Vehicle).filter(models.Vehicle.user_id == current_user.id).all()
+def get_vehicles(
+    request: Request, response: Response, fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules"),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    view = VEHICLE_ROWS.only(fields)
+    cached = not_modified(request, response, current_user)
+    if cached: return cached
+    rows = db.query(*view.columns).filter(models.Vehicle.user_id == current_user.id).all()
+    return respond(view.dicts(rows), view.partial, response.headers)
 
 @api_router.get("/vehicles/{vehicle_id}", response_model=schemas.VehicleResponse)
 def get_vehicle_detail(vehicle_id: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -185,75 +281,268 @@ def purchase_sticker(data: schemas.StickerPurchase, db: Session = Depends(get_db
     vehicle = db.query(models.Vehicle).filter(models.Vehicle.id == data.vehicle_id, models.Vehicle.user_id == current_user.id).first()
     if not vehicle: raise HTTPException(status_code=404, detail="Véhicule non trouvé")
     
-    active = db.query(models.Sticker).filter(
-        models.Sticker.vehicle_id == vehicle.id, models.Sticker.status == "valid",
+    active = db.query(models.Sticker.id).filter(
+        models.Sticker.vehicle_id == vehicle.id, models.STICKER_ACTIVE,
         models.Sticker.end_date > datetime.now(timezone.utc)
     ).first()
     if active: raise HTTPException(status_code=400, detail="Vignette déjà valide")
 
     base_price = 10000 if vehicle.vehicle_type == "motorcycle" else 50000 if vehicle.vehicle_type == "truck" else 25000
     amount = base_price * data.validity_years
-    points = int(amount / 1000)
+    points = loyalty.points_for(amount)
     
     sticker_id = str(uuid.uuid4())
     start = datetime.now(timezone.utc)
     end = start + timedelta(days=365 * data.validity_years)
     txn_id = generate_transaction_id()
-    qr_data = f"NIGER-VIGNETTE|{vehicle.registration_number}|{sticker_id}|{end.date()}"
+    try:
+        qr_data = qr_signer.sign(sticker_id, vehicle.registration_number, end.date())
+    except ValueError:  # Plaque hors format QR compact : ancien format en clair
+        qr_data = f"NIGER-VIGNETTE|{vehicle.registration_number}|{sticker_id}|{end.date()}"
     
     new_sticker = models.Sticker(
         id=sticker_id, vehicle_id=vehicle.id, user_id=current_user.id,
         registration_number=vehicle.registration_number, status="valid", start_date=start, end_date=end,
         amount_paid=amount, payment_method=data.payment_method, transaction_id=txn_id,
-        qr_code=generate_qr_code(qr_data), loyalty_points=points, created_at=datetime.now(timezone.utc)
+        qr_code=generate_qr_code(qr_data), loyalty_points=points, region=vehicle.region,
+        created_at=datetime.now(timezone.utc)
     )
     new_payment = models.Payment(
         id=str(uuid.uuid4()), user_id=current_user.id, sticker_id=sticker_id, amount=amount,
         payment_method=data.payment_method, status="completed", transaction_ref=txn_id,
-        created_at=datetime.now(timezone.utc)
+        region=vehicle.region, created_at=datetime.now(timezone.utc)
     )
-    if hasattr(current_user, 'loyalty_points'):
-        current_user.loyalty_points = (current_user.loyalty_points or 0) + points
-
     db.add(new_sticker)
     db.add(new_payment)
+    if isinstance(current_user, models.User):  # Fidélité réservée aux citoyens
+        loyalty.earn(db, current_user.id, points, sticker_id=sticker_id, payment_id=new_payment.id)
+    bump_data_version(current_user)
+    events.publish_after_commit(db, vehicle.region, active_stickers=1, total_revenue=amount, daily_revenue=amount)
     db.commit()
-    db.refresh(new_sticker)
+    # Une seule relecture, qr_code (différé) compris : la réponse le renvoie
+    db.refresh(new_sticker, attribute_names=STICKER_ROWS.names)
+    verification_cache.pop(new_sticker.registration_number)
     return new_sticker
 
 @api_router.get("/stickers", response_model=List[schemas.StickerResponse])
-def get_my_stickers(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    return db.query(models.Sticker).filter(models.Sticker.user_id == current_user.id).order_by(desc(models.Sticker.created_at)).all()
+def get_my_stickers(
+    request: Request, response: Response, fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules"),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    view = STICKER_ROWS.only(fields)
+    cached = not_modified(request, response, current_user)
+    if cached: return cached
+    rows = db.query(*view.columns).filter(models.Sticker.user_id == current_user.id).order_by(desc(models.Sticker.created_at)).all()
+    return respond(view.dicts(rows), view.partial, response.headers)
+
+# ===================== FIDÉLITÉ =====================
+
+@api_router.get("/loyalty/points", response_model=schemas.LoyaltyBalance)
+def get_loyalty_points(
+    request: Request, response: Response, limit: int = Query(20, ge=0, le=200),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    if hasattr(current_user, "username"): return {"points": 0, "entries": []}
+    cached = not_modified(request, response, current_user)
+    if cached: return cached
+    entries = db.query(models.LoyaltyEntry).filter(models.LoyaltyEntry.user_id == current_user.id).order_by(
+        desc(models.LoyaltyEntry.created_at)
+    ).limit(limit).all()
+    return {"points": current_user.loyalty_points or 0, "entries": entries}
+
+@api_router.post("/admin/loyalty/adjust", response_model=schemas.LoyaltyEntryResponse)
+def adjust_loyalty_points(data: schemas.LoyaltyAdjustment, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if current_user.role not in ["super_admin", "admin"]: raise HTTPException(status_code=403, detail="Interdit")
+    user = db.get(models.User, data.user_id)
+    if not user: raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    try:
+        entry = loyalty.adjust(db, data.user_id, data.points, data.reason)
+    except loyalty.InsufficientPoints:
+        raise HTTPException(status_code=400, detail="Solde de points insuffisant")
+    except loyalty.UnknownUser:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    bump_data_version(user)
+    db.commit()
+    db.refresh(entry)
+    log_audit(db, current_user.id, "ADJUST", "loyalty", {"user_id": data.user_id, "points": data.points})
+    return entry
 
-# ===================== VERIFICATION & ADMIN =====================
+# ===================== VERIFICATION =====================
 
 @api_router.get("/verify/{registration_number}", response_model=schemas.VerificationResult)
 def verify_vehicle(registration_number: str, db: Session = Depends(get_db)):
     reg_num = registration_number.upper()
-    vehicle = db.query(models.Vehicle).filter(models.Vehicle.registration_number == reg_num).first()
+    cached = verification_cache.get(reg_num)
+    if cached is not None and (cached.status != "valid" or as_utc(cached.valid_until) > datetime.now(timezone.utc)):
+        return cached
+
+    query = db.query(
+        models.Vehicle.id, models.Vehicle.registration_number, models.Vehicle.vehicle_type, models.Vehicle.make,
+        models.Vehicle.model, models.User.first_name, models.User.last_name
+    ).outerjoin(models.User, models.User.id == models.Vehicle.user_id)
+    vehicle = query.filter(models.Vehicle.registration_number == reg_num).first()
+    if not vehicle:
+        # Saisie approximative (espaces, tirets, O/0, I/1) : retenue seulement si elle est univoque
+        matches = query.filter(models.Vehicle.plate_normalized == normalize_plate(reg_num)).limit(2).all()
+        vehicle = matches[0] if len(matches) == 1 else None
     
     if not vehicle:
-        return schemas.VerificationResult(
+        result = schemas.VerificationResult(
             registration_number=reg_num, owner_name="Non trouvé", status="inactive", status_color="red",
             vehicle_type="unknown", make="N/A", model="N/A"
         )
+        verification_cache.set(reg_num, result)
+        return result
     
-    sticker = db.query(models.Sticker).filter(models.Sticker.vehicle_id == vehicle.id).order_by(desc(models.Sticker.created_at)).first()
+    sticker = db.query(models.Sticker.start_date, models.Sticker.end_date, models.Sticker.status).filter(models.Sticker.vehicle_id == vehicle.id).order_by(desc(models.Sticker.created_at)).first()
     status_v, color, valid_from, valid_until = "inactive", "red", None, None
     
     if sticker:
-        now = datetime.now(timezone.utc)
-        s_end = sticker.end_date.replace(tzinfo=timezone.utc) if sticker.end_date.tzinfo is None else sticker.end_date
-        if s_end > now: status_v, color = "valid", "green"
-        else: status_v, color = "invalid", "orange"
+        revoked = sticker.status == "revoked"
+        status_v = "invalid" if revoked else sticker_status(sticker.end_date, datetime.now(timezone.utc))
+        color = "green" if status_v == "valid" else "orange"
         valid_from, valid_until = sticker.start_date, sticker.end_date
 
-    owner = db.query(models.User).filter(models.User.id == vehicle.user_id).first()
-    return schemas.VerificationResult(
-        registration_number=reg_num, owner_name=f"{owner.first_name} {owner.last_name}" if owner else "Inconnu",
+    result = schemas.VerificationResult(
+        registration_number=vehicle.registration_number, owner_name=f"{vehicle.first_name} {vehicle.last_name}" if vehicle.first_name else "Inconnu",
         status=status_v, status_color=color, valid_from=valid_from, valid_until=valid_until,
         vehicle_type=vehicle.vehicle_type, make=vehicle.make, model=vehicle.model
     )
+    # Révoquée : pas de cache, son valid_until futur passerait pour valide à l'ingestion
+    if not (sticker and revoked): verification_cache.set(reg_num, result)
+    return result
+
+@api_router.get("/verify/{registration_number}/suggestions", response_model=List[schemas.PlateSuggestion])
+def get_plate_suggestions(
+    registration_number: str, limit: int = Query(5, ge=1, le=20),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    if current_user.role not in INSPECTION_ROLES: raise HTTPException(status_code=403, detail="Interdit")
+    return suggest_plates(db, registration_number, limit)
+
+def get_revocation_filter(db: Session) -> tuple:
+    """(filtre de Bloom, nombre) des vignettes révoquées, reconstruit toutes les REVOCATION_TTL s."""
+    cached = revocation_cache.get("revoked")
+    if cached is None:
+        ids = [row.id for row in db.query(models.Sticker.id).filter(
+            models.Sticker.status == "revoked"
+        ).execution_options(skip_region_scope=True)]
+        bloom = BloomFilter.for_capacity(max(1000, len(ids) * 2))
+        for sticker_id in ids:
+            bloom.add(sticker_id)
+        cached = (bloom, len(ids))
+        revocation_cache.set("revoked", cached)
+    return cached
+
+@api_router.post("/qr/verify", response_model=List[schemas.QRScanResult])
+def verify_qr_batch(data: schemas.QRVerifyBatch, db: Session = Depends(get_db)):
+    """Vérification hors base des QR signés (la liste de révocation est en cache)."""
+    revoked, _ = get_revocation_filter(db)
+    today = datetime.now(timezone.utc).date()
+    results = []
+    for scan in qr_signer.verify_many(data.payloads, today, revoked):
+        claim = scan.claim
+        results.append(schemas.QRScanResult(
+            status=scan.status, reason=scan.reason,
+            sticker_id=claim.sticker_id if claim else None,
+            registration_number=claim.registration_number if claim else None,
+            valid_until=claim.valid_until if claim else None,
+        ))
+    return results
+
+@api_router.get("/qr/revocations", response_model=schemas.RevocationFilter)
+def get_qr_revocations(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Filtre de révocation à embarquer sur les terminaux d'agents (vérification hors ligne)."""
+    if current_user.role not in INSPECTION_ROLES: raise HTTPException(status_code=403, detail="Interdit")
+    bloom, count = get_revocation_filter(db)
+    return {**bloom.to_dict(), "count": count}
+
+# ===================== INSPECTIONS (AGENTS) =====================
+
+def get_sticker_end_dates(db: Session, plates: set) -> dict:
+    """Fin de validité connue par plaque (None = pas de vignette / véhicule inconnu).
+
+    Le cache de vérification est consulté d'abord : un agent vient en général
+    de scanner la plaque. Les plaques manquantes sont résolues en une seule requête.
+    """
+    end_dates, missing = {}, []
+    for plate in plates:
+        cached = verification_cache.get(plate)
+        if cached is not None: end_dates[plate] = cached.valid_until
+        else: missing.append(plate)
+    if missing:
+        rows = db.query(models.Vehicle.registration_number, func.max(models.Sticker.end_date)).outerjoin(
+            models.Sticker, and_(models.Sticker.vehicle_id == models.Vehicle.id, STICKER_NOT_REVOKED)
+        ).filter(models.Vehicle.registration_number.in_(missing)).group_by(
+            models.Vehicle.registration_number
+        ).execution_options(skip_region_scope=True).all()  # Contrôle national, quelle que soit la région de l'agent
+        found = dict(rows)
+        for plate in missing:
+            end_dates[plate] = found.get(plate)
+    return end_dates
+
+def ingest_inspections(db: Session, agent, items: List[schemas.InspectionCreate]) -> list:
+    now = datetime.now(timezone.utc)
+    end_dates = get_sticker_end_dates(db, {i.vehicle_registration.strip().upper() for i in items})
+    rows = []
+    for item in items:
+        plate = item.vehicle_registration.strip().upper()
+        controlled_at = as_utc(item.timestamp) if item.timestamp else now
+        if controlled_at > now: controlled_at = now  # Horloge du terminal en avance
+        rows.append({
+            "id": str(uuid.uuid4()), "agent_id": agent.id, "region": getattr(agent, "region", None), "vehicle_registration": plate,
+            "status_at_control": sticker_status(end_dates[plate], controlled_at),
+            "latitude": item.latitude, "longitude": item.longitude, "notes": item.notes,
+            "geocell": geocell_for(item.latitude, item.longitude), "timestamp": controlled_at,
+        })
+    bulk_insert(db, models.Inspection.__table__, rows)
+    record_cell_stats(db, rows)
+    db.commit()
+    return rows
+
+@api_router.post("/inspections", response_model=schemas.InspectionResponse)
+def create_inspection(data: schemas.InspectionCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if current_user.role not in INSPECTION_ROLES: raise HTTPException(status_code=403, detail="Interdit")
+    return ingest_inspections(db, current_user, [data])[0]
+
+@api_router.post("/inspections/batch", response_model=schemas.InspectionBatchResult)
+def create_inspections_batch(data: schemas.InspectionBatch, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if current_user.role not in INSPECTION_ROLES: raise HTTPException(status_code=403, detail="Interdit")
+    return {"accepted": len(ingest_inspections(db, current_user, data.inspections))}
+
+@api_router.get("/inspections", response_model=List[schemas.InspectionResponse])
+def get_inspections(limit: int = Query(50, ge=1, le=500), db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    if current_user.role not in INSPECTION_ROLES: raise HTTPException(status_code=403, detail="Interdit")
+    query = db.query(models.Inspection)
+    if current_user.role == "agent":
+        query = query.filter(models.Inspection.agent_id == current_user.id)
+    return query.order_by(desc(models.Inspection.timestamp)).limit(limit).all()
+
+@api_router.get("/admin/inspections/heatmap", response_model=List[schemas.HeatmapCell])
+def get_inspections_heatmap(
+    start: Optional[datetime] = None, end: Optional[datetime] = None, region: Optional[str] = None,
+    precision: int = Query(5, ge=1, le=GEOCELL_PRECISION),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    if current_user.role not in ["super_admin", "admin", "supervisor"]: raise HTTPException(status_code=403, detail="Interdit")
+    scope_session(db, current_user, region)
+    # Lecture des agrégats horaires : la fenêtre est arrondie à l'heure
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(hours=24)
+    stat = models.InspectionCellStat
+    cell = func.substr(stat.cell, 1, precision)
+    # Agrégats clés par région (RegionScoped) : critère de session comme les autres lectures
+    rows = db.query(cell, func.sum(stat.valid_count), func.sum(stat.invalid_count)).filter(
+        stat.bucket >= start.replace(minute=0, second=0, microsecond=0, tzinfo=None),
+        stat.bucket <= end.replace(tzinfo=None)
+    ).group_by(cell).all()
+    results = []
+    for cell_id, valid, invalid in rows:
+        lat, lon = geohash_decode(cell_id)
+        results.append({"cell": cell_id, "latitude": lat, "longitude": lon, "valid": valid or 0, "invalid": invalid or 0})
+    return results
+
+# ===================== ADMIN =====================
 
 @api_router.get("/admin/users", response_model=List[schemas.UserResponse])
 def get_admin_users(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
@@ -271,6 +560,7 @@ def get_admin_users(db: Session = Depends(get_db), current_user = Depends(get_cu
 @api_router.post("/admin/users", response_model=schemas.UserResponse)
 def create_admin_user(data: schemas.AdminUserCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if current_user.role not in ["super_admin", "admin"]: raise HTTPException(status_code=403, detail="Interdit")
+    if data.role in SCOPED_ROLES and not data.region: raise HTTPException(status_code=400, detail="Région requise pour ce rôle")
     if db.query(models.AdminUser).filter(models.AdminUser.username == data.username).first():
         raise HTTPException(status_code=400, detail="Nom d'utilisateur pris")
 
@@ -289,29 +579,305 @@ def create_admin_user(data: schemas.AdminUserCreate, db: Session = Depends(get_d
     }
 
 @api_router.get("/admin/dashboard", response_model=schemas.DashboardStats)
-def get_admin_dashboard(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_admin_dashboard(region: Optional[str] = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if current_user.role not in ["super_admin", "admin", "supervisor"]: raise HTTPException(status_code=403, detail="Interdit")
+    region = scope_session(db, current_user, region)
     
-    total_vehicles = db.query(models.Vehicle).count()
-    active_stickers = db.query(models.Sticker).filter(models.Sticker.status == "valid", models.Sticker.end_date > datetime.now(timezone.utc)).count()
-    revenue = db.query(func.sum(models.Payment.amount)).scalar() or 0.0
+    total_vehicles = db.query(func.count(models.Vehicle.id)).scalar()
+    active_stickers = db.query(func.count(models.Sticker.id)).filter(models.STICKER_ACTIVE, models.Sticker.end_date > datetime.now(timezone.utc)).scalar()
+    # Cumul depuis l'origine : l'archive (archive.py) en fait partie, même filtre régional que le rapport
+    archived = select(func.sum(models.PaymentArchive.c.amount))
+    if region: archived = archived.where(models.PaymentArchive.c.region == region)
+    revenue = (db.query(func.sum(models.Payment.amount)).scalar() or 0.0) + (db.execute(archived).scalar() or 0.0)
     daily = db.query(func.sum(models.Payment.amount)).filter(models.Payment.created_at >= datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)).scalar() or 0.0
     
     return {
         "total_vehicles": total_vehicles, "active_stickers": active_stickers,
-        "total_revenue": revenue, "daily_revenue": daily
+        "total_revenue": revenue, "daily_revenue": daily, "region": region
     }
 
+def ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+@api_router.post("/admin/events/ticket", response_model=schemas.StreamTicketResponse)
+def issue_stream_ticket(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Ticket à usage unique pour /admin/events : EventSource ne peut pas poser d'en-tête,
+    et un JWT dans l'URL finirait dans les journaux d'accès et l'historique."""
+    if current_user.role not in ["super_admin", "admin", "supervisor"]: raise HTTPException(status_code=403, detail="Interdit")
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.query(models.StreamTicket).filter(models.StreamTicket.expires_at <= now).delete(synchronize_session=False)
+    ticket = secrets.token_urlsafe(32)
+    db.add(models.StreamTicket(id=ticket_hash(ticket), admin_id=current_user.id, expires_at=now + timedelta(seconds=STREAM_TICKET_TTL)))
+    db.commit()
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL}
+
+def admin_from_ticket(db: Session, ticket: str):
+    """AdminUser du ticket, consommé atomiquement (un second usage échoue), détaché de `db`."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    ticket_id = ticket_hash(ticket)
+    admin_id = db.query(models.StreamTicket.admin_id).filter(
+        models.StreamTicket.id == ticket_id, models.StreamTicket.expires_at > now
+    ).scalar()
+    consumed = admin_id is not None and db.query(models.StreamTicket).filter(
+        models.StreamTicket.id == ticket_id
+    ).delete(synchronize_session=False) == 1
+    db.commit()
+    admin = db.get(models.AdminUser, admin_id) if consumed else None
+    if not admin: raise HTTPException(status_code=401, detail="Ticket invalide ou expiré")
+    db.expunge(admin)
+    return admin
+
+def stream_admin(ticket: str):
+    with SessionLocal() as db:  # Session rendue avant le flux : aucune connexion gardée
+        return admin_from_ticket(db, ticket)
+
+@api_router.get("/admin/events")
+async def stream_admin_events(request: Request, ticket: str = Query(...), region: Optional[str] = None):
+    """Deltas du tableau de bord en text/event-stream (cf. events.py)."""
+    async with session_gate.slot():
+        admin = await run_in_threadpool(stream_admin, ticket)
+    if admin.role not in ["super_admin", "admin", "supervisor"]: raise HTTPException(status_code=403, detail="Interdit")
+    if admin.role in SCOPED_ROLES:
+        if not admin.region: raise HTTPException(status_code=403, detail="Compte régional sans région")
+        region = admin.region
+    subscription = events.broadcaster.subscribe(region)
+    return StreamingResponse(
+        events.stream(subscription, request), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/admin/vehicles", response_model=List[schemas.AdminVehicleResponse])
+def get_admin_vehicles(
+    response: Response, region: Optional[str] = None, vehicle_type: Optional[str] = Query(None, alias="type"),
+    status: Optional[str] = Query(None, pattern="^(valid|invalid|revoked|inactive)$"),
+    search: Optional[str] = Query(None, max_length=100),
+    cursor: Optional[str] = None, skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules"),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    if current_user.role not in ["super_admin", "admin", "supervisor"]: raise HTTPException(status_code=403, detail="Interdit")
+    if cursor and skip: raise HTTPException(status_code=400, detail="cursor et skip sont exclusifs")
+    view = ADMIN_VEHICLE_ROWS.only(fields)  # Champs calculés : filtrés après coup
+    region = scope_session(db, current_user, region)
+    vehicle = models.Vehicle
+    query = db.query(vehicle.id)
+    # Région explicite en plus du critère de session : l'estimation du total (EXPLAIN) ne passe pas par l'ORM
+    if region: query = query.filter(vehicle.region == region)
+    if vehicle_type: query = query.filter(vehicle.vehicle_type == vehicle_type)
+    if search and search.strip(): query = query.filter(vehicle_search(db, search))
+    if status:
+        now = datetime.now(timezone.utc)
+        # Même priorité que sticker_status : valide > révoquée > échue > aucune
+        stickers = select(models.Sticker.id).where(models.Sticker.vehicle_id == vehicle.id)
+        kept, revoked = stickers.where(STICKER_NOT_REVOKED), stickers.where(models.Sticker.status == "revoked")
+        current = kept.where(models.Sticker.end_date > now)
+        query = query.filter(
+            current.exists() if status == "valid" else
+            and_(revoked.exists(), ~current.exists()) if status == "revoked" else
+            and_(kept.exists(), ~current.exists(), ~revoked.exists()) if status == "invalid" else ~stickers.exists()
+        )
+    total, approximate = approximate_count(db, query)
+    rows = keyset_page(
+        query.with_entities(*ADMIN_VEHICLE_ROWS.columns, vehicle.created_at, vehicle.id).outerjoin(
+            models.User, models.User.id == vehicle.user_id
+        ), vehicle, cursor, limit
+    ).offset(skip).all()
+    rows = split_page(rows, limit, response.headers)
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Total-Count-Approximate"] = "true" if approximate else "false"
+    now = datetime.now(timezone.utc)
+    items = ADMIN_VEHICLE_ROWS.dicts(rows)
+    for item in items:
+        first_name, last_name = item.pop("first_name"), item.pop("last_name")
+        item["owner_name"] = f"{first_name} {last_name}" if first_name else None
+        item["sticker_status"] = sticker_status(item["valid_until"], now, bool(item.pop("revoked")))
+    if view.partial:
+        items = [{name: item[name] for name in view.fields} for item in items]
+    return respond(items, view.partial, response.headers)
+
+@api_router.get("/admin/stickers", response_model=List[schemas.AdminStickerResponse])
+def get_admin_stickers(
+    response: Response, region: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(valid|expired|revoked)$"), payment_method: Optional[str] = None,
+    search: Optional[str] = Query(None, max_length=100),
+    cursor: Optional[str] = None, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500),
+    fields: Optional[str] = Query(None, description="Champs à renvoyer, séparés par des virgules"),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    if current_user.role not in ["super_admin", "admin", "supervisor"]: raise HTTPException(status_code=403, detail="Interdit")
+    if cursor and skip: raise HTTPException(status_code=400, detail="cursor et skip sont exclusifs")
+    view = ADMIN_STICKER_ROWS.only(fields)
+    region = scope_session(db, current_user, region)
+    sticker = models.Sticker
+    query = db.query(sticker.id)
+    if region: query = query.filter(sticker.region == region)
+    if status:
+        # Vignette échue que le job d'expiration n'a pas encore vue : "expired", pas "valid"
+        now = datetime.now(timezone.utc)
+        due = and_(models.STICKER_ACTIVE, sticker.end_date <= now)
+        query = query.filter(
+            and_(models.STICKER_ACTIVE, sticker.end_date > now) if status == "valid" else
+            or_(sticker.status == "expired", due) if status == "expired" else sticker.status == status
+        )
+    if payment_method: query = query.filter(sticker.payment_method == payment_method)
+    if search and search.strip(): query = query.filter(sticker_search(search))
+    total, approximate = approximate_count(db, query)
+    rows = keyset_page(
+        query.with_entities(*view.columns, sticker.created_at, sticker.id), sticker, cursor, limit
+    ).offset(skip).all()
+    rows = split_page(rows, limit, response.headers)
+    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Total-Count-Approximate"] = "true" if approximate else "false"
+    return respond(view.dicts(rows), view.partial, response.headers)
+
+@api_router.post("/admin/stickers/{sticker_id}/revoke", response_model=schemas.AdminStickerResponse)
+def revoke_sticker(sticker_id: str, data: schemas.StickerRevocation, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Révoque une vignette : /verify la dit invalide, le filtre de révocation des terminaux l'inclut."""
+    if current_user.role not in ["super_admin", "admin"]: raise HTTPException(status_code=403, detail="Interdit")
+    scope_session(db, current_user)
+    sticker = db.query(models.Sticker).filter(models.Sticker.id == sticker_id).first()
+    if not sticker: raise HTTPException(status_code=404, detail="Vignette non trouvée")
+    if sticker.status == "revoked": raise HTTPException(status_code=400, detail="Vignette déjà révoquée")
+
+    was_active = sticker.status == "valid" and as_utc(sticker.end_date) > datetime.now(timezone.utc)
+    sticker.status = "revoked"
+    db.query(models.User).filter(models.User.id == sticker.user_id).update(
+        {models.User.data_version: models.User.data_version + 1}, synchronize_session=False
+    )
+    if was_active:
+        events.publish_after_commit(db, sticker.region, active_stickers=-1)
+    db.commit()
+    db.refresh(sticker)
+    revocation_cache.clear()
+    verification_cache.pop(sticker.registration_number)
+    log_audit(db, current_user.id, "REVOKE", "stickers", {"sticker_id": sticker.id, "reason": data.reason})
+    return sticker
+
+def report_payments_select(table, start: Optional[datetime], end: Optional[datetime], region: Optional[str]):
+    query = select(
+        table.c.id, table.c.transaction_ref, table.c.amount, table.c.payment_method,
+        table.c.status, table.c.region, table.c.created_at
+    )
+    if start: query = query.where(table.c.created_at >= start)
+    if end: query = query.where(table.c.created_at < end)
+    if region: query = query.where(table.c.region == region)
+    return query
+
+@api_router.get("/admin/reports/payments", response_model=schemas.PaymentReport)
+def get_payments_report(
+    start_date: Optional[date] = None, end_date: Optional[date] = None, region: Optional[str] = None,
+    limit: int = Query(1000, ge=0, le=10000), db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    if current_user.role not in ["super_admin", "admin", "supervisor"]: raise HTTPException(status_code=403, detail="Interdit")
+    region = scope_session(db, current_user, region)
+    start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None
+    # L'archive n'est lue que si la période commence avant sa date la plus récente
+    watermark = archive_watermark(db, models.PaymentArchive, "created_at")
+    includes_archive = watermark is not None and (start is None or start <= watermark)
+    source = report_payments_select(models.Payment.__table__, start, end, region)
+    if includes_archive:
+        source = union_all(source, report_payments_select(models.PaymentArchive, start, end, region))
+    payments = source.subquery()
+
+    by_method = db.execute(
+        select(payments.c.payment_method, func.count(), func.sum(payments.c.amount))
+        .where(payments.c.status == "completed").group_by(payments.c.payment_method)
+    ).all()
+    transactions = db.execute(select(payments).order_by(desc(payments.c.created_at)).limit(limit)).mappings().all()
+    return {
+        "region": region or "Toutes les régions", "start_date": start_date, "end_date": end_date,
+        "total_amount": sum(total or 0.0 for _, _, total in by_method),
+        "total_transactions": sum(count for _, count, _ in by_method),
+        "by_payment_method": {method or "inconnu": {"count": count, "total": total or 0.0} for method, count, total in by_method},
+        "transactions": transactions, "includes_archive": includes_archive,
+    }
+
+@api_router.post("/admin/reconciliation", response_model=schemas.ReconciliationRunResponse)
+def upload_settlement(
+    file: UploadFile = File(...), payment_method: Optional[str] = Form(None),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    if current_user.role not in ["super_admin", "admin"]: raise HTTPException(status_code=403, detail="Interdit")
+    # Lecture en flux du fichier reçu (spoolé sur disque par Starlette au-delà de 1 Mo)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        run = reconcile(db, stream, file.filename, payment_method)
+    except (SettlementFormatError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Relevé illisible : {e}")
+    finally:
+        stream.detach()
+    log_audit(db, current_user.id, "RECONCILE", "payments", {"run_id": run.id, "issues": run.issues})
+    return run
+
+@api_router.get("/admin/reconciliation/{run_id}/issues", response_model=List[schemas.ReconciliationIssueResponse])
+def get_reconciliation_issues(
+    run_id: str, kind: Optional[str] = None, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db), current_user = Depends(get_current_user)
+):
+    if current_user.role not in ["super_admin", "admin"]: raise HTTPException(status_code=403, detail="Interdit")
+    if not db.get(models.ReconciliationRun, run_id): raise HTTPException(status_code=404, detail="Rapprochement non trouvé")
+    query = db.query(models.ReconciliationIssue).filter(models.ReconciliationIssue.run_id == run_id)
+    if kind: query = query.filter(models.ReconciliationIssue.kind == kind)
+    return query.order_by(models.ReconciliationIssue.line).offset(skip).limit(limit).all()
+
 @api_router.get("/admin/tax-configs", response_model=List[schemas.TaxConfigResponse])
-def get_tax_configs(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_tax_configs(response: Response, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     if current_user.role not in ["super_admin", "admin"]: raise HTTPException(status_code=403, detail="Interdit")
+    response.headers["Cache-Control"] = f"private, max-age={TAX_CONFIG_MAX_AGE}"
     return db.query(models.TaxConfig).all()
 
+@api_router.post("/admin/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=MAX_SECONDS), interval_ms: float = Query(10, ge=1, le=1000),
+    current_user = Depends(get_current_user),
+):
+    """Échantillonne le worker qui reçoit la requête ; sortie au format collapsed stacks."""
+    if not PROFILER_ENABLED: raise HTTPException(status_code=404, detail="Not Found")
+    if current_user.role != "super_admin": raise HTTPException(status_code=403, detail="Interdit")
+    endpoints = {r.endpoint.__code__: r.path for r in [*api_router.routes, *app.routes] if hasattr(r, "endpoint")}
+    try:
+        profiler.start(interval_ms / 1000, endpoints)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="Profilage déjà en cours")
+    except ProfilerCoolingDown as e:
+        raise HTTPException(status_code=429, detail="Profilage trop rapproché", headers={"Retry-After": str(int(e.retry_after) + 1)})
+    try:
+        # Handler async : ne bloque ni la boucle ni un thread du pool pendant la capture
+        await asyncio.sleep(seconds)
+    finally:
+        samples = profiler.stop()
+    logger.info(f"Profilage par {current_user.username} : {sum(samples.values())} échantillons en {seconds} s")
+    return PlainTextResponse(collapsed(samples))
+
 app.include_router(api_router)
+# Sous CORS : les 429/503 restent lisibles par le frontend
+app.add_middleware(RateLimitMiddleware, secret_key=SECRET_KEY, algorithm=ALGORITHM, shedder=LoadShedder(session_gate))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag", "X-Next-Cursor", "X-Total-Count", "X-Total-Count-Approximate"],
 )
+app.add_middleware(CompressionMiddleware)
+# Ajouté en dernier : le plus externe, il mesure toute la requête
+app.add_middleware(InstrumentationMiddleware)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health/ready")
+async def health_ready():
+    try:
+        async with session_gate.slot():  # Connexion du pool : même file que les requêtes
+            ready = await run_in_threadpool(check_ready)
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {e}")
+        ready = False
+    if not ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready"})
+    return {"status": "ready"}
+
 @app.get("/")
 def root(): return {"message": "Niger Digital Vehicle Sticker API - Windows PostgreSQL Ready"}
\ No newline at end of file
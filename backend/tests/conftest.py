@@ -0,0 +1,86 @@
+"""
+Harnais de tests en processus (TestClient, sans serveur ni réseau).
+
+- Base modèle : un fichier SQLite par processus (donc par worker xdist),
+  schéma créé une seule fois par session de tests.
+- Chaque test s'exécute dans une transaction jamais validée : les commits
+  de l'application deviennent des SAVEPOINT (join_transaction_mode), tout
+  est annulé à la fin du test.
+- `factory` crée des lignes de chaque modèle avec des valeurs par défaut ;
+  `auth` fabrique l'en-tête Authorization d'un citoyen ou d'un admin.
+
+Depuis backend/ :
+  python -m pytest tests -q           # tests en processus (test_rbac.py : BASE_URL requis)
+  python -m pytest tests -q -n auto   # en parallèle (pytest-xdist)
+"""
+import os
+import sys
+import tempfile
+
+# Avant tout import de l'application : moteur, limites et caches en dépendent
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='vignette-tests-')}/template.db"
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import models
+import server
+from database import SessionLocal, engine, get_db
+from factories import Factory
+
+@event.listens_for(engine, "connect")
+def _sqlite_manual_transactions(dbapi_connection, connection_record):
+    # pysqlite gère lui-même BEGIN et casse les SAVEPOINT : on reprend la main
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine, "begin")
+def _sqlite_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+@pytest.fixture(scope="session")
+def template_db():
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(template_db):
+    connection = template_db.connect()
+    transaction = connection.begin()
+    session = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+
+    def override_get_db():
+        try:
+            yield session
+        finally:
+            # Une session par test, partagée par ses requêtes : rien ne doit fuir de l'une à l'autre
+            session.info.pop("region_scope", None)
+
+    server.app.dependency_overrides[get_db] = override_get_db
+    yield session
+    server.app.dependency_overrides.pop(get_db, None)
+    session.close()
+    transaction.rollback()
+    connection.close()
+    for cache in (server.verification_cache, server.revocation_cache):
+        cache.clear()
+
+@pytest.fixture
+def client(db):
+    return TestClient(server.app)
+
+@pytest.fixture
+def factory(db):
+    return Factory(db)
+
+@pytest.fixture
+def auth():
+    def headers(principal) -> dict:
+        claims = {"sub": principal.id, "role": principal.role}
+        if isinstance(principal, models.AdminUser):
+            claims["region"] = principal.region
+        return {"Authorization": f"Bearer {server.create_token(claims)}"}
+    return headers
@@ -0,0 +1,165 @@
+"""
+Fabriques de lignes pour les tests : une méthode par modèle, valeurs par
+défaut cohérentes, tout champ surchargeable par mot-clé. Les lignes sont
+flushées (visibles des requêtes suivantes), jamais validées.
+"""
+import itertools
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from sqlalchemy import event
+
+import models
+from database import engine
+from geo import GEOCELL_PRECISION, geohash_encode
+from plates import normalize_plate
+
+PASSWORD = "secret123"
+
+@lru_cache(maxsize=None)
+def password_hash() -> str:
+    # bcrypt coûte ~0,2 s : un seul hachage pour tous les comptes de test
+    from server import hash_password
+    return hash_password(PASSWORD)
+
+def now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def query_count(response) -> int:
+    """Requêtes SQL de la requête HTTP, lues dans l'en-tête Server-Timing."""
+    timing = response.headers["server-timing"]
+    return int(timing.split('desc="', 1)[1].split(" ", 1)[0])
+
+@contextmanager
+def captured_sql():
+    """Texte SQL des requêtes émises dans le bloc (liste remplie au fil de l'eau)."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+class Factory:
+    def __init__(self, db):
+        self.db = db
+        self._seq = itertools.count(1)
+
+    def _add(self, model, defaults: dict, overrides: dict):
+        row = model(**{**defaults, **overrides})
+        self.db.add(row)
+        self.db.flush()
+        return row
+
+    def user(self, **kw) -> models.User:
+        n = next(self._seq)
+        return self._add(models.User, {
+            "id": str(uuid.uuid4()), "phone": f"+2279{n:07d}", "hashed_password": password_hash(),
+            "first_name": f"Prenom{n}", "last_name": f"Nom{n}", "role": "citizen", "language": "fr",
+            "loyalty_points": 0, "data_version": 0, "created_at": now(),
+        }, kw)
+
+    def admin(self, role: str = "super_admin", region: str = None, **kw) -> models.AdminUser:
+        n = next(self._seq)
+        return self._add(models.AdminUser, {
+            "id": str(uuid.uuid4()), "username": f"{role}{n}", "hashed_password": password_hash(),
+            "role": role, "region": region, "first_name": "Admin", "last_name": f"N{n}", "created_at": now(),
+        }, kw)
+
+    def vehicle(self, owner: models.User = None, **kw) -> models.Vehicle:
+        n = next(self._seq)
+        owner = owner or self.user()
+        plate = kw.pop("registration_number", f"NY-{n:04d}-AB")
+        return self._add(models.Vehicle, {
+            "id": str(uuid.uuid4()), "registration_number": plate, "plate_normalized": normalize_plate(plate),
+            "user_id": owner.id, "vehicle_type": "car", "make": "Toyota", "model": "Corolla",
+            "energy_type": "gasoline", "engine_power": 8, "chassis_number": f"CH{n:09d}",
+            "year_of_manufacture": 2018, "region": "Niamey", "created_at": now(),
+        }, kw)
+
+    def sticker(self, vehicle: models.Vehicle = None, **kw) -> models.Sticker:
+        vehicle = vehicle or self.vehicle()
+        start = kw.pop("start_date", now())
+        return self._add(models.Sticker, {
+            "id": str(uuid.uuid4()), "vehicle_id": vehicle.id, "user_id": vehicle.user_id,
+            "registration_number": vehicle.registration_number, "status": "valid", "start_date": start,
+            "end_date": start + timedelta(days=365), "amount_paid": 25000.0, "payment_method": "mobile_money",
+            "transaction_id": f"TXN-TEST{next(self._seq):08d}", "qr_code": "", "loyalty_points": 25,
+            "region": vehicle.region, "created_at": start,
+        }, kw)
+
+    def payment(self, sticker: models.Sticker = None, **kw) -> models.Payment:
+        sticker = sticker or self.sticker()
+        return self._add(models.Payment, {
+            "id": str(uuid.uuid4()), "user_id": sticker.user_id, "sticker_id": sticker.id,
+            "amount": sticker.amount_paid, "payment_method": sticker.payment_method, "status": "completed",
+            "transaction_ref": sticker.transaction_id, "region": sticker.region, "created_at": sticker.created_at,
+        }, kw)
+
+    def loyalty_entry(self, user: models.User = None, **kw) -> models.LoyaltyEntry:
+        return self._add(models.LoyaltyEntry, {
+            "id": str(uuid.uuid4()), "user_id": (user or self.user()).id, "kind": "adjust", "points": 10,
+            "reason": "test", "created_at": now(),
+        }, kw)
+
+    def tax_config(self, **kw) -> models.TaxConfig:
+        return self._add(models.TaxConfig, {
+            "id": str(uuid.uuid4()), "vehicle_category": "car", "engine_power_min": 0, "engine_power_max": 10,
+            "base_amount": 25000.0, "multi_year_discount": 0.1, "status": "active", "effective_date": now(),
+        }, kw)
+
+    def inspection(self, agent: models.AdminUser = None, **kw) -> models.Inspection:
+        agent = agent or self.admin("agent", "Niamey")
+        return self._add(models.Inspection, {
+            "id": str(uuid.uuid4()), "agent_id": agent.id, "vehicle_registration": "NY-0000-AB",
+            "status_at_control": "valid", "latitude": 13.51, "longitude": 2.11, "geocell": None,
+            "region": agent.region, "timestamp": now(),
+        }, kw)
+
+    def audit_log(self, **kw) -> models.AuditLog:
+        return self._add(models.AuditLog, {
+            "id": str(uuid.uuid4()), "user_id": None, "action": "CREATE", "module": "vehicles",
+            "details": "{}", "timestamp": now(),
+        }, kw)
+
+    def notification_log(self, sticker: models.Sticker = None, **kw) -> models.NotificationLog:
+        sticker = sticker or self.sticker()
+        return self._add(models.NotificationLog, {
+            "id": str(uuid.uuid4()), "user_id": sticker.user_id, "sticker_id": sticker.id, "type": "expiry",
+            "channel": "sms", "recipient": "+22790000000", "status": "sent", "sent_at": now(),
+        }, kw)
+
+    def reconciliation_run(self, **kw) -> models.ReconciliationRun:
+        return self._add(models.ReconciliationRun, {
+            "id": str(uuid.uuid4()), "filename": "releve.csv", "status": "done", "lines": 0, "matched": 0,
+            "issues": 0, "started_at": now(),
+        }, kw)
+
+    def reconciliation_issue(self, run: models.ReconciliationRun = None, **kw) -> models.ReconciliationIssue:
+        return self._add(models.ReconciliationIssue, {
+            "id": str(uuid.uuid4()), "run_id": (run or self.reconciliation_run()).id, "kind": "unknown_reference",
+            "transaction_ref": f"TXN-TEST{next(self._seq):08d}", "settlement_amount": 25000.0,
+            "settlement_date": now(), "line": 2, "created_at": now(),
+        }, kw)
+
+    def stream_ticket(self, admin: models.AdminUser = None, ticket: str = None, **kw) -> models.StreamTicket:
+        """`ticket` en clair (défaut : généré) ; seule son empreinte est stockée, comme en production."""
+        from server import STREAM_TICKET_TTL, ticket_hash
+        ticket = ticket or f"ticket-{next(self._seq)}"
+        return self._add(models.StreamTicket, {
+            "id": ticket_hash(ticket), "admin_id": (admin or self.admin()).id,
+            "expires_at": now() + timedelta(seconds=STREAM_TICKET_TTL),
+        }, kw)
+
+    def inspection_cell_stat(self, **kw) -> models.InspectionCellStat:
+        return self._add(models.InspectionCellStat, {
+            "bucket": now().replace(minute=0, second=0, microsecond=0),
+            "cell": geohash_encode(13.5137, 2.1098, GEOCELL_PRECISION), "region": "Niamey",
+            "valid_count": 1, "invalid_count": 0,
+        }, kw)
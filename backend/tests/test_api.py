@@ -0,0 +1,661 @@
+"""
+In-process API tests (TestClient, per-test rollback, see conftest.py).
+Run from backend/: python -m pytest tests -q
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import archive
+import events
+import lifecycle
+import loyalty
+import models
+import server
+from bulk import _increment_each
+from compression import CompressionMiddleware
+from database import SessionGate
+from factories import captured_sql, query_count
+from geo import geohash_encode
+from plates import normalize_plate
+from ratelimit import LoadShedder, MemoryBackend, RateLimitMiddleware
+
+class TestAccessControl:
+    """Role checks and regional scoping, without a deployed server"""
+
+    def test_agent_cannot_list_admin_data(self, client, factory, auth):
+        """Agents only verify and inspect: admin lists are forbidden"""
+        agent = factory.admin("agent", "Niamey")
+        for path in ("/api/admin/vehicles", "/api/admin/stickers", "/api/admin/users"):
+            assert client.get(path, headers=auth(agent)).status_code == 403, path
+
+    def test_citizen_cannot_adjust_loyalty(self, client, factory, auth):
+        user = factory.user()
+        response = client.post("/api/admin/loyalty/adjust", json={"user_id": user.id, "points": 100, "reason": "x"},
+                               headers=auth(user))
+        assert response.status_code == 403
+
+    def test_supervisor_sees_only_their_region(self, client, factory, auth):
+        """A supervisor's region wins over the ?region= parameter"""
+        factory.sticker(factory.vehicle(region="Niamey"))
+        factory.sticker(factory.vehicle(region="Zinder"))
+        supervisor = factory.admin("supervisor", "Niamey")
+        for path in ("/api/admin/vehicles?region=Zinder", "/api/admin/stickers"):
+            rows = client.get(path, headers=auth(supervisor)).json()
+            assert [row["region"] for row in rows] == ["Niamey"], path
+
+    def test_regionless_scoped_account_gets_nothing(self, client, factory, auth):
+        """A supervisor or agent without a region is refused, never widened to national access"""
+        for role in ("supervisor", "agent"):
+            headers = auth(factory.admin(role, None))
+            for path in ("/api/admin/dashboard", "/api/admin/dashboard?region=Zinder", "/api/auth/me"):
+                assert client.get(path, headers=headers).status_code == 403, (role, path)
+
+    def test_scoped_account_needs_a_region(self, client, factory, auth):
+        response = client.post("/api/admin/users", headers=auth(factory.admin()), json={
+            "username": "sup_sans_region", "password": "secret123", "role": "supervisor",
+            "first_name": "A", "last_name": "B",
+        })
+        assert response.status_code == 400
+
+    def test_super_admin_filters_by_region(self, client, factory, auth):
+        factory.vehicle(region="Niamey")
+        factory.vehicle(region="Zinder")
+        rows = client.get("/api/admin/vehicles?region=Zinder", headers=auth(factory.admin())).json()
+        assert [row["region"] for row in rows] == ["Zinder"]
+
+    def test_missing_token_is_rejected(self, client):
+        assert client.get("/api/vehicles").status_code in (401, 403)
+
+class TestCitizenFlow:
+    """Register a vehicle, buy its sticker, verify it"""
+
+    def test_purchase_then_verify(self, client, factory, auth, db):
+        user = factory.user()
+        vehicle = client.post("/api/vehicles", headers=auth(user), json={
+            "registration_number": "ny-1234-ab", "vehicle_type": "car", "make": "Toyota", "model": "Hilux",
+            "energy_type": "diesel", "engine_power": 9, "chassis_number": "CH1", "year_of_manufacture": 2020,
+        }).json()
+        assert vehicle["registration_number"] == "NY-1234-AB"
+
+        sticker = client.post("/api/stickers/purchase", headers=auth(user), json={
+            "vehicle_id": vehicle["id"], "payment_method": "mobile_money", "validity_years": 1,
+        })
+        assert sticker.status_code == 200, sticker.text
+        assert sticker.json()["amount_paid"] == 25000
+
+        verified = client.get("/api/verify/NY 1234 AB").json()
+        assert (verified["registration_number"], verified["status"]) == ("NY-1234-AB", "valid")
+
+        balance = client.get("/api/loyalty/points", headers=auth(user)).json()
+        assert balance["points"] == 25
+        assert [entry["kind"] for entry in balance["entries"]] == ["earn"]
+        assert db.query(models.Payment).filter(models.Payment.user_id == user.id).count() == 1
+
+    def test_second_purchase_is_refused_while_valid(self, client, factory, auth):
+        user = factory.user()
+        vehicle = factory.vehicle(user)
+        factory.sticker(vehicle)
+        response = client.post("/api/stickers/purchase", headers=auth(user), json={
+            "vehicle_id": vehicle.id, "payment_method": "mobile_money", "validity_years": 1,
+        })
+        assert response.status_code == 400
+
+    def test_unchanged_list_answers_304(self, client, factory, auth):
+        user = factory.user()
+        factory.vehicle(user)
+        first = client.get("/api/vehicles", headers=auth(user))
+        assert len(first.json()) == 1
+        again = client.get("/api/vehicles", headers={**auth(user), "If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304
+
+class TestIsolation:
+    """Each test starts from the empty template: nothing leaks between tests"""
+
+    @pytest.mark.parametrize("run", [1, 2])
+    def test_rows_are_rolled_back(self, db, factory, run):
+        assert db.query(models.Vehicle).count() == 0
+        factory.vehicle(registration_number="NY-0001-AB")
+        assert db.query(models.Vehicle).count() == 1
+
+class TestQueryBudget:
+    """Admin lists run a fixed number of SQL queries, whatever the page size (no N+1)"""
+
+    @pytest.mark.parametrize("path, make", [
+        ("/api/admin/vehicles", lambda factory: factory.sticker()),
+        ("/api/admin/stickers", lambda factory: factory.sticker()),
+        ("/api/admin/users", lambda factory: factory.admin("agent", "Maradi")),
+    ])
+    def test_query_count_does_not_grow_with_rows(self, client, factory, auth, path, make):
+        headers = auth(factory.admin())
+        make(factory)
+        few = client.get(path, headers=headers)
+        for _ in range(20):
+            make(factory)
+        many = client.get(path, headers=headers)
+        assert len(many.json()) == len(few.json()) + 20
+        assert query_count(many) == query_count(few)
+
+class TestAdminSearch:
+    """Filters, free-text search and keyset pagination of the admin lists"""
+
+    def test_keyset_pages_cover_every_row_once(self, client, factory, auth):
+        headers = auth(factory.admin())
+        created = {factory.vehicle().id for _ in range(7)}
+        seen, cursor = [], None
+        while True:
+            response = client.get("/api/admin/vehicles", params={"limit": 3, **({"cursor": cursor} if cursor else {})},
+                                  headers=headers)
+            seen += [row["id"] for row in response.json()]
+            assert response.headers["x-total-count"] == "7"
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        assert len(seen) == 7 and set(seen) == created
+
+    def test_invalid_cursor_is_rejected(self, client, factory, auth):
+        response = client.get("/api/admin/stickers?cursor=not-a-cursor", headers=auth(factory.admin()))
+        assert response.status_code == 400
+
+    def test_vehicle_search_matches_plate_make_and_owner(self, client, factory, auth):
+        headers = auth(factory.admin())
+        owner = factory.user(first_name="Aissata", last_name="Moussa")
+        target = factory.vehicle(owner, registration_number="NY-4321-ZB", make="Peugeot", model="504")
+        factory.vehicle(make="Toyota")
+        for term in ("ny 4321", "peug", "aissata mou"):
+            rows = client.get("/api/admin/vehicles", params={"search": term}, headers=headers).json()
+            assert [row["id"] for row in rows] == [target.id], term
+
+    def test_vehicle_filters(self, client, factory, auth, db):
+        headers = auth(factory.admin())
+        valid = factory.sticker(factory.vehicle(vehicle_type="truck")).vehicle_id
+        expired = factory.sticker(factory.vehicle(), start_date=datetime(2020, 1, 1)).vehicle_id
+        inactive = factory.vehicle().id
+        revoked = factory.sticker(factory.vehicle(), status="revoked").vehicle_id
+        for status, expected in (("valid", valid), ("invalid", expired), ("inactive", inactive), ("revoked", revoked)):
+            rows = client.get("/api/admin/vehicles", params={"status": status}, headers=headers).json()
+            assert [row["id"] for row in rows] == [expected], status
+            assert rows[0]["sticker_status"] == status
+        rows = client.get("/api/admin/vehicles", params={"type": "truck"}, headers=headers).json()
+        assert [row["id"] for row in rows] == [valid]
+
+    def test_sticker_search_and_filters(self, client, factory, auth):
+        headers = auth(factory.admin())
+        sticker = factory.sticker(factory.vehicle(registration_number="AG-7788-CD"))
+        factory.sticker(status="revoked")
+        for params in ({"search": sticker.transaction_id.lower()}, {"search": "ag7788"}, {"status": "valid"}):
+            rows = client.get("/api/admin/stickers", params=params, headers=headers).json()
+            assert [row["id"] for row in rows] == [sticker.id], params
+
+    def test_sticker_status_filter_uses_the_end_date(self, client, factory, auth):
+        headers = auth(factory.admin())
+        current = factory.sticker()
+        overdue = factory.sticker(start_date=datetime(2020, 1, 1))  # Pas encore vue par le job d'expiration
+        expired = factory.sticker(start_date=datetime(2020, 1, 1), status="expired")
+        for status, expected in (("valid", {current.id}), ("expired", {overdue.id, expired.id})):
+            rows = client.get("/api/admin/stickers", params={"status": status}, headers=headers).json()
+            assert {row["id"] for row in rows} == expected, status
+
+    def test_revoked_sticker_never_makes_a_vehicle_valid(self, client, factory, auth):
+        vehicle = factory.vehicle()
+        factory.sticker(vehicle, status="revoked")
+        rows = client.get("/api/admin/vehicles", params={"status": "valid"}, headers=auth(factory.admin())).json()
+        assert rows == []
+        agent = factory.admin(role="agent", region="Niamey")
+        response = client.post("/api/inspections", headers=auth(agent), json={"vehicle_registration": vehicle.registration_number})
+        assert response.json()["status_at_control"] != "valid"
+
+    def test_skip_and_cursor_are_exclusive(self, client, factory, auth):
+        headers = auth(factory.admin())
+        for path in ("/api/admin/vehicles", "/api/admin/stickers"):
+            response = client.get(path, params={"cursor": "abc", "skip": 10}, headers=headers)
+            assert response.status_code == 400, path
+
+class TestInspections:
+    """Batched ingestion: the server recomputes each control's status"""
+
+    def test_batch_status_is_computed_server_side(self, client, factory, auth, db):
+        agent = factory.admin("agent", "Niamey")
+        factory.sticker(factory.vehicle(registration_number="NY-1111-AA"))
+        factory.sticker(factory.vehicle(registration_number="NY-2222-AA"), start_date=datetime(2020, 1, 1))
+        response = client.post("/api/inspections/batch", headers=auth(agent), json={"inspections": [
+            {"vehicle_registration": plate, "status_at_control": "valid", "latitude": 13.51, "longitude": 2.11}
+            for plate in ("ny-1111-aa", "NY-2222-AA", "NY-9999-ZZ")
+        ]})
+        assert response.json() == {"accepted": 3}
+        rows = db.query(models.Inspection.vehicle_registration, models.Inspection.status_at_control,
+                        models.Inspection.region).order_by(models.Inspection.vehicle_registration).all()
+        assert rows == [("NY-1111-AA", "valid", "Niamey"), ("NY-2222-AA", "invalid", "Niamey"),
+                        ("NY-9999-ZZ", "inactive", "Niamey")]
+
+    def test_citizen_cannot_report_inspections(self, client, factory, auth):
+        response = client.post("/api/inspections", headers=auth(factory.user()), json={"vehicle_registration": "NY-1"})
+        assert response.status_code == 403
+
+    def test_counter_upsert_without_on_conflict(self, db):
+        """Generic fallback of bulk.increment_counters (engines other than PostgreSQL/SQLite)"""
+        table, bucket = models.InspectionCellStat.__table__, datetime(2026, 1, 1, 8)
+        row = {"bucket": bucket, "cell": "s1e2f3", "valid_count": 2, "invalid_count": 1}
+        _increment_each(db.connection(), table, ["bucket", "cell"], ["valid_count", "invalid_count"], [row])
+        _increment_each(db.connection(), table, ["bucket", "cell"], ["valid_count", "invalid_count"], [row])
+        assert db.query(models.InspectionCellStat.valid_count, models.InspectionCellStat.invalid_count).one() == (4, 2)
+
+class TestHeatmap:
+    """Heatmaps are read from the hourly (cell, bucket) aggregates filled at ingestion"""
+
+    def ingest(self, client, auth, agent, *controls):
+        response = client.post("/api/inspections/batch", headers=auth(agent), json={"inspections": [
+            {"vehicle_registration": plate, "latitude": lat, "longitude": lon, **({"timestamp": ts} if ts else {})}
+            for plate, lat, lon, ts in controls
+        ]})
+        assert response.status_code == 200, response.text
+
+    def test_counts_per_cell_and_precision(self, client, factory, auth):
+        factory.sticker(factory.vehicle(registration_number="NY-1111-AA"))
+        agent = factory.admin("agent", "Niamey")
+        self.ingest(client, auth, agent, ("NY-1111-AA", 13.5137, 2.1098, None), ("NY-1111-AA", 13.5138, 2.1099, None),
+                    ("NY-0000-ZZ", 13.5137, 2.1098, None), ("NY-0000-ZZ", 14.2, 1.45, None),
+                    ("NY-0000-ZZ", 13.5137, 2.1098, "2020-01-01T10:00:00"))  # Hors fenêtre
+        headers = auth(factory.admin())
+        cells = client.get("/api/admin/inspections/heatmap", params={"precision": 6}, headers=headers).json()
+        counts = sorted((cell["cell"], cell["valid"], cell["invalid"]) for cell in cells)
+        assert counts == [(geohash_encode(13.5137, 2.1098), 2, 1), (geohash_encode(14.2, 1.45), 0, 1)]
+        coarse = client.get("/api/admin/inspections/heatmap", params={"precision": 1}, headers=headers).json()
+        assert [(cell["cell"], cell["valid"], cell["invalid"]) for cell in coarse] == [("s", 2, 2)]
+
+    def test_window_reads_older_buckets(self, client, factory, auth):
+        self.ingest(client, auth, factory.admin("agent", "Niamey"), ("NY-0000-ZZ", 13.5137, 2.1098, "2020-01-01T10:20:00"))
+        cells = client.get("/api/admin/inspections/heatmap", headers=auth(factory.admin()), params={
+            "start": "2020-01-01T10:00:00", "end": "2020-01-01T11:00:00",
+        }).json()
+        assert [(cell["valid"], cell["invalid"]) for cell in cells] == [(0, 1)]
+
+    def test_agent_cannot_read_heatmap(self, client, factory, auth):
+        response = client.get("/api/admin/inspections/heatmap", headers=auth(factory.admin("agent", "Niamey")))
+        assert response.status_code == 403
+
+    def test_reads_stored_aggregates(self, client, factory, auth):
+        """The endpoint sums the hourly aggregates, within the principal's region"""
+        factory.inspection_cell_stat(valid_count=4, invalid_count=1)
+        factory.inspection_cell_stat(region="Zinder", valid_count=0, invalid_count=2)
+        cells = client.get("/api/admin/inspections/heatmap", headers=auth(factory.admin("supervisor", "Niamey"))).json()
+        assert [(cell["valid"], cell["invalid"]) for cell in cells] == [(4, 1)]
+
+    def test_supervisor_reads_only_their_region(self, client, factory, auth):
+        """Aggregates are keyed by region: national counts never reach a regional supervisor"""
+        self.ingest(client, auth, factory.admin("agent", "Niamey"), ("NY-0000-ZZ", 13.5137, 2.1098, None))
+        self.ingest(client, auth, factory.admin("agent", "Zinder"), ("NY-0000-ZZ", 13.5137, 2.1098, None),
+                    ("NY-0000-ZZ", 13.8, 8.98, None))
+        cells = client.get("/api/admin/inspections/heatmap", params={"region": "Zinder"},
+                           headers=auth(factory.admin("supervisor", "Niamey"))).json()
+        assert [(cell["cell"], cell["invalid"]) for cell in cells] == [(geohash_encode(13.5137, 2.1098)[:5], 1)]
+        national = client.get("/api/admin/inspections/heatmap", headers=auth(factory.admin())).json()
+        assert sum(cell["invalid"] for cell in national) == 3
+        zinder = client.get("/api/admin/inspections/heatmap", params={"region": "Zinder"}, headers=auth(factory.admin())).json()
+        assert sum(cell["invalid"] for cell in zinder) == 2
+
+class TestProjections:
+    """Hot paths select only the columns they return; heavy columns are deferred"""
+
+    def test_verify_reads_no_password_or_qr_code(self, client, factory):
+        factory.sticker(factory.vehicle(registration_number="NY-5555-AA"))
+        with captured_sql() as statements:
+            assert client.get("/api/verify/NY-5555-AA").json()["status"] == "valid"
+        assert statements and not [sql for sql in statements if "hashed_password" in sql or "qr_code" in sql]
+
+    def test_lists_skip_qr_code(self, client, factory, auth):
+        factory.sticker()
+        with captured_sql() as statements:
+            rows = client.get("/api/admin/stickers", headers=auth(factory.admin())).json()
+        assert len(rows) == 1 and "qr_code" not in rows[0]
+        assert not [sql for sql in statements if "qr_code" in sql]
+
+    def test_heavy_columns_load_on_access_only(self, factory, db):
+        sticker_id, log_id = factory.sticker(qr_code="iVBORw0KGgo=").id, factory.audit_log(details="{'a': 1}").id
+        db.expunge_all()
+        sticker, log = db.get(models.Sticker, sticker_id), db.get(models.AuditLog, log_id)
+        assert "qr_code" not in sticker.__dict__ and "details" not in log.__dict__
+        assert (sticker.qr_code, log.details) == ("iVBORw0KGgo=", "{'a': 1}")
+
+    def test_purchase_returns_the_qr_code(self, client, factory, auth):
+        user = factory.user()
+        vehicle = factory.vehicle(user)
+        response = client.post("/api/stickers/purchase", headers=auth(user), json={
+            "vehicle_id": vehicle.id, "payment_method": "card", "validity_years": 1,
+        })
+        assert response.json()["qr_code"].startswith("iVBOR")  # PNG en base64
+
+class TestConditionalGet:
+    """Citizen reads carry a data-version ETag; any write to their data changes it"""
+
+    def test_purchase_changes_the_etag(self, client, factory, auth):
+        user = factory.user()
+        vehicle = factory.vehicle(user)
+        first = client.get("/api/stickers", headers=auth(user))
+        assert first.json() == [] and first.headers["etag"].startswith('W/"')
+        client.post("/api/stickers/purchase", headers=auth(user), json={
+            "vehicle_id": vehicle.id, "payment_method": "card", "validity_years": 1,
+        })
+        stale = client.get("/api/stickers", headers={**auth(user), "If-None-Match": first.headers["etag"]})
+        assert stale.status_code == 200 and len(stale.json()) == 1
+        assert stale.headers["etag"] != first.headers["etag"]
+        fresh = client.get("/api/stickers", headers={**auth(user), "If-None-Match": stale.headers["etag"]})
+        assert fresh.status_code == 304 and fresh.headers["etag"] == stale.headers["etag"]
+
+    def test_compressed_list_revalidates(self, client, factory, auth):
+        user = factory.user()
+        for _ in range(12):
+            factory.vehicle(user)
+        first = client.get("/api/vehicles", headers={**auth(user), "Accept-Encoding": "gzip"})
+        assert first.headers["content-encoding"] == "gzip" and first.headers["etag"].startswith('W/"')
+        again = client.get("/api/vehicles", headers={**auth(user), "Accept-Encoding": "identity",
+                                                     "If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304
+
+    def test_admin_reads_are_not_cached(self, client, factory, auth):
+        assert "etag" not in client.get("/api/auth/me", headers=auth(factory.admin())).headers
+
+    def test_strong_etag_is_weakened_when_compressing(self):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"application/json"), (b"etag", b'"v1"')]})
+            await send({"type": "http.response.body", "body": b"[" + b"0," * 1000 + b"0]"})
+        response = TestClient(CompressionMiddleware(app)).get("/", headers={"Accept-Encoding": "gzip"})
+        assert (response.headers["content-encoding"], response.headers["etag"]) == ("gzip", 'W/"v1"')
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+class StuckGate:
+    waiting = 3
+
+    def wait_seconds(self) -> float:
+        return 2.0
+
+def limited(shedder=None) -> TestClient:
+    return TestClient(RateLimitMiddleware(ok_app, server.SECRET_KEY, server.ALGORITHM, backend=MemoryBackend(),
+                                          shedder=shedder, enabled=True))
+
+class TestRateLimit:
+    """Token buckets per client IP, per principal for field agents; shedding spares priority roles"""
+
+    def test_login_burst_is_throttled(self):
+        client = limited()
+        statuses = [client.post("/api/auth/login").status_code for _ in range(6)]
+        assert statuses == [200] * 5 + [429]
+        assert int(client.post("/api/auth/login").headers["retry-after"]) >= 1
+
+    def test_agents_get_their_own_bucket(self, factory, auth):
+        client = limited()
+        for _ in range(30):
+            client.get("/api/verify/NE-1")
+        assert client.get("/api/verify/NE-1").status_code == 429
+        assert client.get("/api/verify/NE-1", headers=auth(factory.admin(role="agent", region="Niamey"))).status_code == 200
+
+    def test_citizen_tokens_share_the_ip_bucket(self, factory, auth):
+        client = limited()
+        for _ in range(30):
+            client.get("/api/verify/NE-1", headers=auth(factory.user()))
+        assert client.get("/api/verify/NE-1", headers=auth(factory.user())).status_code == 429
+
+    def test_db_wait_sheds_citizens_but_not_agents(self, factory, auth):
+        client = limited(LoadShedder(StuckGate()))
+        assert client.get("/api/stickers").status_code == 503
+        assert client.get("/api/stickers", headers=auth(factory.user())).status_code == 503
+        assert client.get("/api/verify/NE-1", headers=auth(factory.admin(role="agent", region="Niamey"))).status_code == 200
+
+    def test_busy_pool_without_waiting_is_not_overloaded(self):
+        assert not LoadShedder(SessionGate(5)).overloaded()
+
+    def test_gate_measures_the_wait_for_a_session(self):
+        hold = 0.05
+        gate = SessionGate(1)
+        gate.HALF_LIFE = float("inf")  # Pas de décroissance : la mesure ne dépend pas de la charge
+
+        async def scenario():
+            release = asyncio.Event()
+            async def holder():
+                async with gate.slot():
+                    await release.wait()
+            async def waiter():
+                async with gate.slot():
+                    pass
+            tasks = [asyncio.create_task(holder()), asyncio.create_task(waiter())]
+            await asyncio.sleep(0)  # Le premier tient la place, le second est en file
+            await asyncio.sleep(hold)
+            queued = (gate.waiting, gate.wait_seconds())
+            release.set()
+            await asyncio.gather(*tasks)
+            return queued
+        waiting, in_queue = asyncio.run(scenario())
+        assert waiting == 1 and in_queue >= hold
+        assert gate.waiting == 0 and hold <= gate.wait_seconds() < 30
+
+class TestStickerQR:
+    """Signed QR payloads verify offline; an admin revocation reaches /verify and the revocation filter"""
+
+    def scan(self, client, payload: str) -> dict:
+        return client.post("/api/qr/verify", json={"payloads": [payload]}).json()[0]
+
+    def test_signed_payload_round_trips(self, client, factory):
+        sticker = factory.sticker()
+        payload = server.qr_signer.sign(sticker.id, sticker.registration_number, sticker.end_date.date())
+        result = self.scan(client, payload)
+        assert (result["status"], result["sticker_id"]) == ("valid", sticker.id)
+        assert result["registration_number"] == sticker.registration_number
+
+    def test_tampered_payload_is_invalid(self, client, factory):
+        sticker = factory.sticker()
+        payload = server.qr_signer.sign(sticker.id, sticker.registration_number, sticker.end_date.date())
+        tampered = payload[:-1] + ("A" if payload[-1] != "A" else "B")
+        assert self.scan(client, tampered)["status"] == "invalid"
+        assert self.scan(client, "NIGER-VIGNETTE|NE-1234")["status"] == "legacy"
+
+    def test_revocation_is_audited_and_seen_everywhere(self, client, factory, auth, db):
+        admin, sticker = factory.admin(), factory.sticker()
+        owner = db.get(models.User, sticker.user_id)
+        version = owner.data_version or 0
+        assert client.get(f"/api/verify/{sticker.registration_number}").json()["status"] == "valid"
+
+        response = client.post(f"/api/admin/stickers/{sticker.id}/revoke", headers=auth(admin), json={"reason": "Fraude"})
+        assert response.status_code == 200 and response.json()["status"] == "revoked"
+        db.refresh(owner)
+        assert owner.data_version == version + 1
+        assert db.query(models.AuditLog).filter_by(user_id=admin.id, action="REVOKE").count() == 1
+
+        assert client.get(f"/api/verify/{sticker.registration_number}").json()["status"] == "invalid"
+        payload = server.qr_signer.sign(sticker.id, sticker.registration_number, sticker.end_date.date())
+        assert self.scan(client, payload)["status"] == "revoked"
+        again = client.post(f"/api/admin/stickers/{sticker.id}/revoke", headers=auth(admin), json={"reason": "Fraude"})
+        assert again.status_code == 400
+
+    def test_only_admins_revoke(self, client, factory, auth):
+        sticker = factory.sticker()
+        for principal in (factory.admin(role="agent", region="Niamey"), factory.admin(role="supervisor", region=sticker.region)):
+            response = client.post(f"/api/admin/stickers/{sticker.id}/revoke", headers=auth(principal), json={"reason": "x"})
+            assert response.status_code == 403
+
+class TestLifecycle:
+    """The expiry job flips past-due valid stickers and invalidates their owners' ETags"""
+
+    def test_expires_only_past_due_stickers(self, db, factory):
+        now = datetime.utcnow()
+        due = factory.sticker(start_date=now - timedelta(days=400))
+        current = factory.sticker(start_date=now - timedelta(days=10))
+        revoked = factory.sticker(start_date=now - timedelta(days=400), status="revoked")
+        owner = db.get(models.User, due.user_id)
+        version = owner.data_version or 0
+
+        assert lifecycle.expire_stickers(db, now, chunk=1) == 1
+        for sticker in (due, current, revoked):
+            db.refresh(sticker)
+        assert (due.status, current.status, revoked.status) == ("expired", "valid", "revoked")
+        db.refresh(owner)
+        assert owner.data_version == version + 1
+        assert lifecycle.expire_stickers(db, now) == 0
+
+class TestPlates:
+    """Plates match on a normalized key; near misses get ranked suggestions for field roles"""
+
+    def test_normalization_folds_separators_and_confusables(self):
+        assert normalize_plate(" ab-12 3o ") == normalize_plate("AB1230") == "AB1230"
+        assert normalize_plate("ni.2i") == "N121"
+        assert normalize_plate(None) is None
+
+    def test_verify_accepts_an_unambiguous_variant(self, client, factory):
+        factory.sticker(factory.vehicle(registration_number="NI-2024-OA"))
+        result = client.get("/api/verify/n1 2024 0a").json()
+        assert (result["registration_number"], result["status"]) == ("NI-2024-OA", "valid")
+
+    def test_suggestions_rank_the_closest_plate_first(self, client, factory, auth):
+        factory.vehicle(registration_number="ZR-7781-KM")
+        factory.vehicle(registration_number="ZR-7789-QT")
+        factory.vehicle(registration_number="TA-0000-XX")
+        agent = factory.admin(role="agent", region="Niamey")
+        response = client.get("/api/verify/ZR7781KN/suggestions", headers=auth(agent))
+        plates = [s["registration_number"] for s in response.json()]
+        assert plates[0] == "ZR-7781-KM" and "TA-0000-XX" not in plates
+        assert response.json()[0]["similarity"] >= 0.3
+
+    def test_suggestions_are_national(self, client, factory, auth):
+        """Like /verify, a checkpoint agent gets suggestions for cars registered in another region"""
+        factory.vehicle(registration_number="ZR-7781-KM", region="Niamey")
+        response = client.get("/api/verify/ZR7781KN/suggestions", headers=auth(factory.admin("agent", "Zinder")))
+        assert [s["registration_number"] for s in response.json()] == ["ZR-7781-KM"]
+
+    def test_suggestions_are_for_field_roles(self, client, factory, auth):
+        response = client.get("/api/verify/ZR7781/suggestions", headers=auth(factory.user()))
+        assert response.status_code == 403
+
+class TestLoyalty:
+    """Balance moves are atomic; a missing citizen is not reported as an insufficient balance"""
+
+    def test_unknown_user_is_distinct_from_insufficient_points(self, db, factory):
+        user, admin = factory.user(), factory.admin()
+        with pytest.raises(loyalty.InsufficientPoints):
+            loyalty.redeem(db, user.id, 10, "Test")
+        for user_id in (admin.id, "missing"):
+            with pytest.raises(loyalty.UnknownUser):
+                loyalty.earn(db, user_id, 25, sticker_id="s", payment_id="p")
+            with pytest.raises(loyalty.UnknownUser):
+                loyalty.redeem(db, user_id, 10, "Test")
+
+    def test_admin_purchase_earns_no_points(self, client, factory, auth, db):
+        admin = factory.admin()
+        vehicle = factory.vehicle(user_id=admin.id)
+        response = client.post("/api/stickers/purchase", headers=auth(admin), json={
+            "vehicle_id": vehicle.id, "payment_method": "card", "validity_years": 1,
+        })
+        assert response.status_code == 200
+        assert db.query(models.LoyaltyEntry).filter_by(user_id=admin.id).count() == 0
+
+    def test_adjust_below_zero_is_rejected(self, client, factory, auth):
+        response = client.post("/api/admin/loyalty/adjust", headers=auth(factory.admin()), json={
+            "user_id": factory.user().id, "points": -5, "reason": "Correction",
+        })
+        assert response.status_code == 400
+
+class TestArchive:
+    """Archiving moves superseded stickers out of the hot table and changes their owners' ETags"""
+
+    def test_archived_sticker_bumps_owner_version(self, client, db, factory, auth):
+        now = datetime.utcnow()
+        vehicle = factory.vehicle()
+        old_id = factory.sticker(vehicle, start_date=now - timedelta(days=1000), status="expired").id
+        factory.sticker(vehicle, start_date=now - timedelta(days=10))
+        owner = db.get(models.User, vehicle.user_id)
+        before = client.get("/api/stickers", headers=auth(owner))
+        assert len(before.json()) == 2
+
+        target = next(t for t in archive.TARGETS if t.hot is models.Sticker.__table__)
+        assert archive.archive_target(db, target, now - timedelta(days=300)) == 1
+        assert db.query(models.StickerArchive).filter(models.StickerArchive.c.id == old_id).count() == 1
+        after = client.get("/api/stickers", headers={**auth(owner), "If-None-Match": before.headers["etag"]})
+        assert after.status_code == 200 and len(after.json()) == 1
+
+    def test_dashboard_revenue_includes_archived_payments(self, client, db, factory, auth):
+        headers = auth(factory.admin())
+        factory.payment(factory.sticker(start_date=datetime.utcnow() - timedelta(days=1000)), amount=5000.0)
+        before = client.get("/api/admin/dashboard", headers=headers).json()["total_revenue"]
+        moved = archive.archive_all(db)
+        assert moved["payments"] == 1
+        assert client.get("/api/admin/dashboard", headers=headers).json()["total_revenue"] == before == 5000.0
+        assert client.get("/api/admin/dashboard", params={"region": "Agadez"}, headers=headers).json()["total_revenue"] == 0.0
+
+class TestReconciliationIssues:
+    """Issues of a run are listed line by line, filterable by kind, for admins only"""
+
+    def test_issues_are_filtered_and_ordered_by_line(self, client, factory, auth):
+        run = factory.reconciliation_run(issues=3)
+        factory.reconciliation_issue(run, line=5)
+        factory.reconciliation_issue(run, kind="amount_mismatch", line=3, payment_amount=10000.0)
+        factory.reconciliation_issue(run, line=2)
+        factory.reconciliation_issue()  # Autre rapprochement
+        url = f"/api/admin/reconciliation/{run.id}/issues"
+        issues = client.get(url, params={"kind": "unknown_reference"}, headers=auth(factory.admin())).json()
+        assert [issue["line"] for issue in issues] == [2, 5]
+        assert client.get(url, headers=auth(factory.admin("supervisor", "Niamey"))).status_code == 403
+
+class TestEventStream:
+    """The dashboard stream is opened with a short-lived, single-use ticket instead of a JWT in the URL"""
+
+    def test_ticket_is_single_use(self, client, db, factory, auth):
+        admin = factory.admin()
+        response = client.post("/api/admin/events/ticket", headers=auth(admin))
+        ticket = response.json()["ticket"]
+        assert response.json()["expires_in"] == server.STREAM_TICKET_TTL
+        assert db.query(models.StreamTicket).filter_by(id=ticket).count() == 0  # Stocké haché
+        assert server.admin_from_ticket(db, ticket).id == admin.id
+        with pytest.raises(HTTPException) as error:
+            server.admin_from_ticket(db, ticket)
+        assert error.value.status_code == 401
+
+    def test_expired_ticket_is_refused_and_purged(self, client, db, factory, auth):
+        admin = factory.admin()
+        factory.stream_ticket(admin, "stale", expires_at=datetime.utcnow() - timedelta(seconds=1))
+        with pytest.raises(HTTPException):
+            server.admin_from_ticket(db, "stale")
+        client.post("/api/admin/events/ticket", headers=auth(admin))
+        assert db.query(models.StreamTicket).count() == 1
+
+    def test_stream_requires_a_ticket(self, client, factory, auth):
+        assert client.post("/api/admin/events/ticket", headers=auth(factory.admin(role="agent", region="Niamey"))).status_code == 403
+        assert client.get("/api/admin/events", params={"ticket": "forged"}).status_code == 401
+        assert client.get("/api/admin/events", params={"token": "jwt"}).status_code == 422
+
+    def test_expiry_job_publishes_active_sticker_decrements(self, db, factory, monkeypatch):
+        now = datetime.utcnow()
+        factory.sticker(start_date=now - timedelta(days=400))
+        published = []
+        monkeypatch.setattr(events.broadcaster, "publish", lambda region, delta: published.append((region, delta)))
+        lifecycle.expire_stickers(db, now)
+        assert published == [("Niamey", {"active_stickers": -1})]
+
+class TestSessionGate:
+    """Every pool checkout made for a request waits in the same per-worker queue"""
+
+    def test_semaphore_is_created_in_the_using_process(self):
+        gate = SessionGate(1)
+        assert gate._semaphore is None  # Rien à hériter d'un maître préchargé
+
+        async def use():
+            async with gate.slot():
+                pass
+        asyncio.run(use())
+        assert gate._semaphore is not None and gate.waiting == 0
+
+    def test_readiness_probe_goes_through_the_gate(self, client, monkeypatch):
+        gate = SessionGate(1)
+        monkeypatch.setattr(server, "session_gate", gate)
+        assert client.get("/health/ready").json() == {"status": "ready"}
+        assert gate._semaphore is not None
+
+    def test_stream_ticket_lookup_goes_through_the_gate(self, client, monkeypatch):
+        gate = SessionGate(1)
+        monkeypatch.setattr(server, "session_gate", gate)
+        assert client.get("/api/admin/events", params={"ticket": "forged"}).status_code == 401
+        assert gate._semaphore is not None
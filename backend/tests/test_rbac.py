@@ -8,6 +8,9 @@ import os
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
+# Tests contre un déploiement réel : ignorés sans URL (voir test_api.py pour les tests en processus)
+pytestmark = pytest.mark.skipif(not BASE_URL, reason="REACT_APP_BACKEND_URL non défini")
+
 class TestAdminAuthentication:
     """Test admin login for all roles"""
     
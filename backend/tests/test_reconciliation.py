@@ -0,0 +1,124 @@
+"""
+Reconciliation engine tests against local settlement fixtures (tests/fixtures/).
+Runs in-process on an in-memory SQLite database: python -m pytest tests/test_reconciliation.py
+"""
+import io
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import archive
+import models
+from reconciliation import reconcile, SettlementFormatError
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+PAYMENTS = [
+    ("TXN-AAA111", 25000, datetime(2026, 3, 1, 9, 15), "completed", "mobile_money"),
+    ("TXN-BBB222", 10000, datetime(2026, 3, 1, 10, 40), "completed", "mobile_money"),
+    ("TXN-CCC333", 50000, datetime(2026, 3, 2, 8, 5), "completed", "mobile_money"),
+    ("TXN-FFF666", 25000, datetime(2026, 3, 2, 14, 0), "completed", "mobile_money"),
+    ("TXN-GGG777", 25000, datetime(2026, 3, 2, 10, 0), "completed", "mobile_money"),
+    ("TXN-HHH888", 25000, datetime(2026, 3, 2, 10, 0), "completed", "card"),
+]
+
+SETTLEMENT_ISSUES = [
+    ("amount_mismatch", "TXN-BBB222"),
+    ("date_mismatch", "TXN-CCC333"),
+    ("duplicate", "TXN-AAA111"),
+    ("invalid_line", "TXN-EEE555"),
+    ("missing_settlement", "TXN-GGG777"),
+    ("status_mismatch", "TXN-FFF666"),
+    ("unknown_reference", "TXN-ZZZ999"),
+]
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for i, (ref, amount, created_at, status, method) in enumerate(PAYMENTS):
+            session.add(models.Payment(
+                id=f"pay-{i}", user_id="user-1", amount=amount, payment_method=method,
+                status=status, transaction_ref=ref, created_at=created_at
+            ))
+        session.commit()
+        yield session
+    engine.dispose()
+
+def run_fixture(db, name, **kwargs):
+    with open(os.path.join(FIXTURES, name), newline="", encoding="utf-8-sig") as stream:
+        return reconcile(db, stream, name, **kwargs)
+
+def issues_by_ref(db, run):
+    rows = db.query(models.ReconciliationIssue).filter(models.ReconciliationIssue.run_id == run.id)
+    return sorted((issue.kind, issue.transaction_ref) for issue in rows)
+
+class TestReconciliation:
+    """Matching on transaction_ref plus amount/date window"""
+
+    def test_clean_settlement_has_no_issues(self, db):
+        """Every settlement line matches (timezone offsets normalized to UTC)"""
+        run = run_fixture(db, "settlement_clean.csv", payment_method="mobile_money")
+        assert (run.status, run.lines, run.matched, run.issues) == ("done", 3, 3, 0)
+        assert db.get(models.Payment, "pay-0").reconciliation_run_id == run.id
+
+    @pytest.mark.parametrize("chunk", [2, 5000])
+    def test_mismatches_are_flagged(self, db, chunk):
+        """Each kind of discrepancy is recorded, whatever the chunk boundaries"""
+        run = run_fixture(db, "settlement_issues.csv", payment_method="mobile_money", chunk=chunk)
+        assert (run.status, run.lines, run.matched) == ("done", 7, 4)
+        assert issues_by_ref(db, run) == SETTLEMENT_ISSUES
+        assert run.issues == 7
+
+    def test_missing_settlement_without_operator_filter_expects_all_methods(self, db):
+        """Without an operator filter, card payments of the period are expected too"""
+        run = run_fixture(db, "settlement_issues.csv")
+        missing = [ref for kind, ref in issues_by_ref(db, run) if kind == "missing_settlement"]
+        assert missing == ["TXN-GGG777", "TXN-HHH888"]
+
+    def test_issue_line_numbers(self, db):
+        """Issues point back to the settlement file line (header is line 1)"""
+        run = run_fixture(db, "settlement_issues.csv", payment_method="mobile_money")
+        lines = {
+            issue.kind: issue.line
+            for issue in db.query(models.ReconciliationIssue).filter(models.ReconciliationIssue.run_id == run.id)
+        }
+        assert lines["amount_mismatch"] == 3
+        assert lines["duplicate"] == 6
+        assert lines["missing_settlement"] is None
+
+    def test_missing_columns_fail_the_run(self, db):
+        """A file without reference/amount/date columns is rejected and the run marked failed"""
+        with pytest.raises(SettlementFormatError):
+            reconcile(db, io.StringIO("foo,bar\n1,2\n"), "bad.csv")
+        run = db.query(models.ReconciliationRun).one()
+        assert run.status == "failed"
+        assert run.finished_at is not None
+
+class TestArchivedPayments:
+    """Payments moved to payments_archive are still matched, not reported as unknown"""
+
+    def archive_before(self, db, cutoff):
+        target = next(t for t in archive.TARGETS if t.hot is models.Payment.__table__)
+        return archive.archive_target(db, target, cutoff)
+
+    def test_archived_payment_is_matched_in_the_archive(self, db):
+        """The match is recorded on the archived row"""
+        assert self.archive_before(db, datetime(2026, 3, 1, 10, 0)) == 1
+        run = run_fixture(db, "settlement_clean.csv", payment_method="mobile_money")
+        assert (run.matched, run.issues) == (3, 0)
+        row = db.execute(
+            models.PaymentArchive.select().where(models.PaymentArchive.c.id == "pay-0")
+        ).mappings().one()
+        assert row["reconciliation_run_id"] == run.id
+
+    def test_issues_are_unchanged_by_archiving(self, db):
+        """Duplicates, mismatches and missing settlements are found in the archive too"""
+        assert self.archive_before(db, datetime(2026, 3, 2, 10, 1)) == 5
+        run = run_fixture(db, "settlement_issues.csv", payment_method="mobile_money")
+        assert (run.matched, issues_by_ref(db, run)) == (4, SETTLEMENT_ISSUES)
@@ -80,6 +80,7 @@ const translations = {
     valid: "Valide",
     invalid: "Expiré",
     inactive: "Inactif",
+    revoked: "Révoquée",
     validity_period: "Période de Validité",
     one_year: "1 An",
     two_years: "2 Ans",
@@ -233,6 +234,7 @@ const translations = {
     valid: "Valid",
     invalid: "Expired",
     inactive: "Inactive",
+    revoked: "Revoked",
     validity_period: "Validity Period",
     one_year: "1 Year",
     two_years: "2 Years",
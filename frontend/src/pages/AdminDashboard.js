@@ -41,6 +41,55 @@ export default function AdminDashboard() {
     fetchStats();
   }, [selectedRegion]);
 
+  // Deltas en direct (SSE) appliqués aux compteurs chargés ci-dessus.
+  // Ticket à usage unique (le JWT ne passe pas dans l'URL) : chaque reconnexion en demande un nouveau.
+  useEffect(() => {
+    if (!localStorage.getItem('token')) return;
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    const reconnect = () => {
+      clearTimeout(retry);
+      if (source) source.close();
+      if (!closed) retry = setTimeout(connect, 5000);
+    };
+
+    const connect = async () => {
+      try {
+        const { data } = await axios.post(`${API}/admin/events/ticket`);
+        if (closed) return;
+        const params = new URLSearchParams({ ticket: data.ticket });
+        if (selectedRegion && selectedRegion !== 'all') params.append('region', selectedRegion);
+        source = new EventSource(`${API}/admin/events?${params.toString()}`);
+      } catch (err) {
+        reconnect();
+        return;
+      }
+      source.addEventListener('delta', (e) => {
+        const { delta } = JSON.parse(e.data);
+        setStats((prev) => {
+          if (!prev) return prev;
+          const next = { ...prev };
+          Object.entries(delta).forEach(([key, value]) => { next[key] = (next[key] || 0) + value; });
+          return next;
+        });
+      });
+      source.addEventListener('resync', () => {
+        fetchStats();
+        reconnect();
+      });
+      source.onerror = reconnect;
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) source.close();
+    };
+  }, [selectedRegion]);
+
   const fetchStats = async () => {
     try {
       const params = selectedRegion && selectedRegion !== 'all' ? `?region=${selectedRegion}` : '';
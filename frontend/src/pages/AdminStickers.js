@@ -30,13 +30,22 @@ export default function AdminStickers() {
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
 
+  const [search, setSearch] = useState('');
+
+  useEffect(() => {
+    const timer = setTimeout(() => setSearch(searchTerm.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   useEffect(() => {
     fetchStickers();
-  }, []);
+  }, [search]);
 
   const fetchStickers = async () => {
     try {
-      const res = await axios.get(`${API}/admin/stickers?limit=100`);
+      const params = new URLSearchParams({ limit: 100 });
+      if (search) params.append('search', search);
+      const res = await axios.get(`${API}/admin/stickers?${params.toString()}`);
       setStickers(res.data);
     } catch (err) {
       console.error('Failed to fetch stickers:', err);
@@ -45,11 +54,6 @@ export default function AdminStickers() {
     }
   };
 
-  const filteredStickers = stickers.filter(s => 
-    s.registration_number?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    s.transaction_id?.toLowerCase().includes(searchTerm.toLowerCase())
-  );
-
   const statusColors = {
     valid: 'bg-emerald-100 text-emerald-700',
     invalid: 'bg-orange-100 text-orange-700',
@@ -118,7 +122,7 @@ export default function AdminStickers() {
                   </TableRow>
                 </TableHeader>
                 <TableBody>
-                  {filteredStickers.map((sticker) => (
+                  {stickers.map((sticker) => (
                     <TableRow key={sticker.id}>
                       <TableCell className="font-mono text-sm">
                         {sticker.transaction_id}
@@ -150,7 +154,7 @@ export default function AdminStickers() {
               </Table>
             )}
 
-            {filteredStickers.length === 0 && !loading && (
+            {stickers.length === 0 && !loading && (
               <div className="text-center py-12 text-slate-500">
                 Aucune vignette trouvée
               </div>
@@ -51,21 +51,47 @@ export default function AdminVehicles() {
   const [selectedVehicle, setSelectedVehicle] = useState(null);
   const [selectedRegion, setSelectedRegion] = useState(userRegion || 'all');
   const [page, setPage] = useState(0);
+  // Curseur de chaque page visitée (X-Next-Cursor) : pagination keyset côté serveur
+  const [cursors, setCursors] = useState([null]);
+  const [total, setTotal] = useState(null);
+  const [search, setSearch] = useState('');
   const limit = 20;
 
+  // Nouveau filtre : retour à la première page (mises à jour groupées en un seul rendu)
+  const resetPages = () => {
+    setPage(0);
+    setCursors([null]);
+  };
+
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      setSearch(searchTerm.trim());
+      resetPages();
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   useEffect(() => {
     fetchVehicles();
-  }, [page, selectedRegion]);
+  }, [page, selectedRegion, search]);
 
   const fetchVehicles = async () => {
     try {
       const params = new URLSearchParams();
-      params.append('skip', page * limit);
       params.append('limit', limit);
+      if (cursors[page]) params.append('cursor', cursors[page]);
       if (selectedRegion && selectedRegion !== 'all') params.append('region', selectedRegion);
+      if (search) params.append('search', search);
       
       const res = await axios.get(`${API}/admin/vehicles?${params.toString()}`);
       setVehicles(res.data);
+      const next = res.headers['x-next-cursor'];
+      setCursors(prev => {
+        const known = prev.slice(0, page + 1);
+        return next ? [...known, next] : known;
+      });
+      const count = res.headers['x-total-count'];
+      setTotal(count ? `${res.headers['x-total-count-approximate'] === 'true' ? '≈ ' : ''}${count}` : null);
     } catch (err) {
       console.error('Failed to fetch vehicles:', err);
     } finally {
@@ -73,17 +99,10 @@ export default function AdminVehicles() {
     }
   };
 
-  //const filteredVehicles = vehicles.filter(v => 
-    //v.registration_number.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    //v.owner_name?.toLowerCase().includes(searchTerm.toLowerCase())
-  //);
-const filteredVehicles = vehicles.filter(v => 
-  v.registration_number?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-  v.owner_name?.toLowerCase().includes(searchTerm.toLowerCase())
-);
   const statusColors = {
     valid: 'bg-emerald-100 text-emerald-700',
     invalid: 'bg-orange-100 text-orange-700',
+    revoked: 'bg-red-100 text-red-700',
     inactive: 'bg-slate-100 text-slate-700'
   };
 
@@ -114,7 +133,7 @@ const filteredVehicles = vehicles.filter(v =>
           
           {/* Region Filter for admin/super_admin */}
           {canViewAllRegions && (
-            <Select value={selectedRegion} onValueChange={setSelectedRegion}>
+            <Select value={selectedRegion} onValueChange={(region) => { setSelectedRegion(region); resetPages(); }}>
               <SelectTrigger className="w-48 bg-white">
                 <SelectValue placeholder="Toutes les régions" />
               </SelectTrigger>
@@ -174,7 +193,7 @@ const filteredVehicles = vehicles.filter(v =>
                     </TableRow>
                   </TableHeader>
                   <TableBody>
-                    {filteredVehicles.map((vehicle) => (
+                    {vehicles.map((vehicle) => (
                       <TableRow key={vehicle.id}>
                         <TableCell className="font-mono font-bold">
                           {vehicle.registration_number}
@@ -213,7 +232,7 @@ const filteredVehicles = vehicles.filter(v =>
                   </TableBody>
                 </Table>
 
-                {filteredVehicles.length === 0 && (
+                {vehicles.length === 0 && (
                   <div className="text-center py-12 text-slate-500">
                     Aucun véhicule trouvé
                   </div>
@@ -222,7 +241,7 @@ const filteredVehicles = vehicles.filter(v =>
                 {/* Pagination */}
                 <div className="flex items-center justify-between mt-6 pt-4 border-t">
                   <p className="text-sm text-slate-500">
-                    Affichage de {filteredVehicles.length} véhicules
+                    Affichage de {vehicles.length} véhicules{total !== null && ` sur ${total}`}
                   </p>
                   <div className="flex items-center gap-2">
                     <Button
@@ -238,7 +257,7 @@ const filteredVehicles = vehicles.filter(v =>
                       variant="outline"
                       size="sm"
                       onClick={() => setPage(page + 1)}
-                      disabled={vehicles.length < limit}
+                      disabled={!cursors[page + 1]}
                     >
                       <ChevronRight className="w-4 h-4" />
                     </Button>